@@ -1,37 +1,58 @@
 """
 AI Story Backend - AI API Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+import asyncio
+import json
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.websockets import WebSocketState
+
+from app.core.config import settings as app_settings
 
-from app.db import get_db
+from app.db import get_async_db, get_db, get_write_db
 from app.models import StageType
-from app.schemas import AIGenerateRequest, AIGenerateResponse, AIStreamMessage
-from app.services import ProjectService, AIService
+from app.schemas import (
+    AIGenerateRequest, AIGenerateResponse, AIPreviewRequest, AIPreviewResponse,
+    AIStreamMessage, GenerationJobResponse,
+    PipelineRequest, TelemetrySummaryResponse,
+)
+from app.services import (
+    ProjectService, AIService, JobService, PipelineService, TelemetryService, job_workers,
+)
+from app.utils.generation_cache import get_generation_cache
+from app.utils.provider_limiter import limiter_stats
+from app.utils.resilience import circuit_states
+from app.utils.ws_batcher import TokenFrameBatcher
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
 
 @router.post("/generate", response_model=AIGenerateResponse)
-async def generate_content(data: AIGenerateRequest, db: Session = Depends(get_db)):
+async def generate_content(data: AIGenerateRequest, db: AsyncSession = Depends(get_async_db)):
     """Generate content for a stage using AI."""
     project_service = ProjectService(db)
     ai_service = AIService(db)
     
     # Get project and stage
-    project = project_service.get_project(data.project_id)
+    project = await project_service.aget_project(data.project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    stage = project_service.get_stage(data.project_id, data.stage_type)
+    stage = await project_service.aget_stage(data.project_id, data.stage_type)
     if not stage:
         raise HTTPException(status_code=404, detail="Stage not found")
     
     # Get AI settings
     if data.settings_id:
-        settings = ai_service.get_settings(data.settings_id)
+        settings = await ai_service.aget_settings(data.settings_id)
     else:
-        settings = ai_service.get_default_settings()
+        settings = await ai_service.aget_default_settings()
     
     if not settings:
         raise HTTPException(
@@ -40,10 +61,9 @@ async def generate_content(data: AIGenerateRequest, db: Session = Depends(get_db
         )
     
     # Get context from previous stages
-    context = project_service.get_stage_context(data.project_id, data.stage_type)
-    
-    # Store model name before generation (session commit invalidates the object)
-    model_name = settings.model
+    context = await project_service.aget_stage_context(
+        data.project_id, data.stage_type, data.custom_prompt
+    )
 
     # Generate content
     try:
@@ -54,19 +74,184 @@ async def generate_content(data: AIGenerateRequest, db: Session = Depends(get_db
             custom_prompt=data.custom_prompt,
             temperature=data.temperature,
             max_tokens=data.max_tokens,
+            use_cache=not data.bypass_cache,
         )
         
         return AIGenerateResponse(
             content=content,
-            model=model_name,
-            stage_type=data.stage_type
+            model=ai_service.last_model,
+            stage_type=data.stage_type,
+            tokens_used=ai_service.last_usage.total_tokens if ai_service.last_usage else None,
+            cached=ai_service.last_cached,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
 
+@router.post("/preview", response_model=AIPreviewResponse)
+def preview_generation(data: AIPreviewRequest, db: Session = Depends(get_db)):
+    """Build the prompt for a stage without calling the provider.
+    
+    Returns the rendered prompt, its size per section, an offline token
+    estimate and the projected cost for the selected AI settings.
+    """
+    project_service = ProjectService(db)
+    ai_service = AIService(db)
+    
+    if not project_service.get_project(data.project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    if data.settings_id:
+        settings = ai_service.get_settings(data.settings_id)
+        if not settings:
+            raise HTTPException(status_code=404, detail="AI settings not found")
+    else:
+        # Without any settings the preview still works, just without a cost
+        settings = ai_service.get_default_settings()
+    
+    context = project_service.get_stage_context(
+        data.project_id, data.stage_type, data.custom_prompt
+    )
+    try:
+        preview = ai_service.preview_prompt(
+            data.stage_type,
+            context,
+            settings=settings,
+            custom_prompt=data.custom_prompt,
+            max_tokens=data.max_tokens,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not data.include_prompt:
+        preview["prompt"] = None
+    return preview
+
+
+@router.post("/jobs", response_model=GenerationJobResponse, status_code=202)
+def create_generation_job(data: AIGenerateRequest, db: Session = Depends(get_write_db)):
+    """Queue a generation to run in the background worker pool."""
+    project_service = ProjectService(db)
+    
+    if not project_service.get_project(data.project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    if not project_service.get_stage(data.project_id, data.stage_type):
+        raise HTTPException(status_code=404, detail="Stage not found")
+    
+    job = JobService(db).create_job(
+        project_id=data.project_id,
+        stage_type=data.stage_type,
+        settings_id=data.settings_id,
+        params=data.model_dump(exclude={"project_id", "stage_type", "settings_id"}),
+    )
+    job_workers.notify()
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=GenerationJobResponse)
+def get_generation_job(job_id: int, db: Session = Depends(get_db)):
+    """Get the status of a background generation job."""
+    job = JobService(db).get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=GenerationJobResponse)
+def cancel_generation_job(job_id: int, db: Session = Depends(get_write_db)):
+    """Cancel a queued or running background generation job."""
+    job = JobService(db).cancel_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # Stop it right away if it runs in this process (otherwise its worker polls the flag)
+    job_workers.cancel(job_id)
+    return job
+
+
+@router.post("/pipeline")
+async def run_pipeline(data: PipelineRequest, db: AsyncSession = Depends(get_async_db)):
+    """Generate several stages, running independent stages concurrently.
+    
+    Streams newline-delimited JSON progress events: plan, stage_started,
+    stage_completed / stage_failed / stage_skipped and a final done.
+    """
+    project_service = ProjectService(db)
+    ai_service = AIService(db)
+    pipeline = PipelineService(db)
+    
+    if not await project_service.aget_project(data.project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    if data.settings_id:
+        settings = await ai_service.aget_settings(data.settings_id)
+    else:
+        settings = await ai_service.aget_default_settings()
+    
+    if not settings:
+        raise HTTPException(
+            status_code=400, 
+            detail="No AI settings configured. Please add AI settings first."
+        )
+    
+    stage_types = await pipeline.aresolve_stages(
+        data.project_id, data.stages, data.include_missing_dependencies
+    )
+    settings_id = settings.id
+    
+    async def events():
+        async for event in pipeline.run(
+            data.project_id,
+            stage_types,
+            settings_id,
+            temperature=data.temperature,
+            max_tokens=data.max_tokens,
+            use_cache=not data.bypass_cache,
+            max_concurrency=data.max_concurrency,
+        ):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.get("/telemetry/summary", response_model=TelemetrySummaryResponse)
+def get_telemetry_summary(days: int = Query(7, ge=1, le=365), db: Session = Depends(get_db)):
+    """Get p50/p95 latency and token spend by model and stage."""
+    items = TelemetryService(db).summarize(days)
+    return TelemetrySummaryResponse(days=days, items=items)
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Get generation cache hit/miss counters."""
+    cache = get_generation_cache()
+    if not cache:
+        return {"enabled": False}
+    return cache.stats()
+
+
+@router.delete("/cache")
+def clear_cache():
+    """Drop every cached generation."""
+    cache = get_generation_cache()
+    if cache:
+        cache.clear()
+    return {"message": "Cache cleared"}
+
+
+@router.get("/circuits")
+def get_circuit_states():
+    """Get circuit breaker state per AI settings ID."""
+    return circuit_states()
+
+
+@router.get("/limits")
+def get_limiter_stats():
+    """Get outbound rate limiter queue depth and wait times per AI settings ID."""
+    return limiter_stats()
+
+
 @router.websocket("/ws/generate")
-async def websocket_generate(websocket: WebSocket, db: Session = Depends(get_db)):
+async def websocket_generate(websocket: WebSocket, db: AsyncSession = Depends(get_async_db)):
     """WebSocket endpoint for streaming AI generation."""
     await websocket.accept()
     
@@ -80,13 +265,13 @@ async def websocket_generate(websocket: WebSocket, db: Session = Depends(get_db)
         request = AIGenerateRequest(**data)
         
         # Validate
-        project = project_service.get_project(request.project_id)
+        project = await project_service.aget_project(request.project_id)
         if not project:
             await websocket.send_json({"type": "error", "error": "Project not found"})
             await websocket.close()
             return
         
-        stage = project_service.get_stage(request.project_id, request.stage_type)
+        stage = await project_service.aget_stage(request.project_id, request.stage_type)
         if not stage:
             await websocket.send_json({"type": "error", "error": "Stage not found"})
             await websocket.close()
@@ -94,9 +279,9 @@ async def websocket_generate(websocket: WebSocket, db: Session = Depends(get_db)
         
         # Get settings
         if request.settings_id:
-            settings = ai_service.get_settings(request.settings_id)
+            settings = await ai_service.aget_settings(request.settings_id)
         else:
-            settings = ai_service.get_default_settings()
+            settings = await ai_service.aget_default_settings()
         
         if not settings:
             await websocket.send_json({
@@ -107,22 +292,98 @@ async def websocket_generate(websocket: WebSocket, db: Session = Depends(get_db)
             return
         
         # Get context
-        context = project_service.get_stage_context(request.project_id, request.stage_type)
+        context = await project_service.aget_stage_context(
+            request.project_id, request.stage_type, request.custom_prompt
+        )
         
-        # Stream generation
-        async for token in ai_service.stream_generate(
-            stage=stage,
-            context=context,
-            settings=settings,
-            custom_prompt=request.custom_prompt,
-        ):
-            await websocket.send_json({"type": "token", "content": token})
+        resume_from = None
+        if request.resume_version_id:
+            version = await ai_service.aget_partial_version(stage, request.resume_version_id)
+            if not version:
+                await websocket.send_json({"type": "error", "error": "Partial version not found"})
+                await websocket.close()
+                return
+            resume_from = version.content
+        
+        # Batcher and heartbeat share the socket; never interleave their sends
+        send_lock = asyncio.Lock()
         
-        await websocket.send_json({"type": "done"})
+        async def send(message: dict):
+            async with send_lock:
+                await websocket.send_json(message)
+        
+        async def stream():
+            # Stream generation, coalescing deltas into fewer frames
+            async with TokenFrameBatcher(send) as batcher:
+                try:
+                    async for token in ai_service.stream_generate(
+                        stage=stage,
+                        context=context,
+                        settings=settings,
+                        custom_prompt=request.custom_prompt,
+                        resume_from=resume_from,
+                    ):
+                        await batcher.add(token)
+                finally:
+                    await batcher.close()
+        
+        # Watch the client while streaming so a disconnect or stop request
+        # cancels the upstream call right away instead of at the next send
+        stream_task = asyncio.create_task(stream())
+        watch_task = asyncio.create_task(_watch_client(websocket))
+        heartbeat_task = asyncio.create_task(_heartbeat(send))
+        try:
+            done, _ = await asyncio.wait(
+                {stream_task, watch_task, heartbeat_task},
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            for task in (stream_task, watch_task, heartbeat_task):
+                task.cancel()
+            await asyncio.gather(stream_task, watch_task, heartbeat_task, return_exceptions=True)
+        
+        if stream_task in done:
+            stream_task.result()  # Surface generation errors
+            await websocket.send_json({"type": "done"})
+        elif watch_task in done and watch_task.result() == "stop":
+            logger.info(f"Generation for stage {request.stage_type.value} stopped by client")
+            await websocket.send_json({"type": "done", "stopped": True})
+        else:
+            logger.info(f"Client disconnected; cancelled generation for stage {request.stage_type.value}")
         
     except WebSocketDisconnect:
         pass
     except Exception as e:
         await websocket.send_json({"type": "error", "error": str(e)})
     finally:
-        await websocket.close()
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
+
+
+async def _watch_client(websocket: WebSocket) -> str:
+    """Wait for the client to disconnect ("disconnect") or send {"type": "stop"} ("stop")."""
+    while True:
+        try:
+            message = await websocket.receive_json()
+        except WebSocketDisconnect:
+            return "disconnect"
+        except RuntimeError:
+            # Socket already closed
+            return "disconnect"
+        except ValueError:
+            continue  # Ignore frames that are not JSON
+        if isinstance(message, dict) and message.get("type") == "stop":
+            return "stop"
+
+
+async def _heartbeat(send) -> None:
+    """Ping the client periodically; returns when a ping cannot be delivered."""
+    interval = app_settings.ws_heartbeat_seconds
+    if interval <= 0:
+        await asyncio.Event().wait()  # Disabled: never completes
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await send({"type": "ping"})
+        except Exception:
+            return
@@ -2,10 +2,11 @@
 AI Story Backend - Export API Routes
 """
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import Response
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
+from app.db import get_async_db
 from app.models import StageType
 from app.services import ProjectService
 from app.services.export_service import ExportService
@@ -19,14 +20,14 @@ from urllib.parse import quote
 async def export_script(
     project_id: int,
     format: str = "pdf",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Export script as PDF or Word document."""
     try:
         project_service = ProjectService(db)
         export_service = ExportService()
         
-        project = project_service.get_project(project_id)
+        project = await project_service.aget_project(project_id)
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         
@@ -34,14 +35,14 @@ async def export_script(
         quoted_name = quote(project.name)
         
         if format == "pdf":
-            content = export_service.export_script_pdf(project, stages)
+            content = await run_in_threadpool(export_service.export_script_pdf, project, stages)
             return Response(
                 content=content,
                 media_type="application/pdf",
                 headers={"Content-Disposition": f"attachment; filename*=utf-8''{quoted_name}_script.pdf"}
             )
         elif format == "docx":
-            content = export_service.export_script_docx(project, stages)
+            content = await run_in_threadpool(export_service.export_script_docx, project, stages)
             return Response(
                 content=content,
                 media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
@@ -49,7 +50,9 @@ async def export_script(
             )
         elif format == "fountain":
             script_stage = next((s for s in stages if s.stage_type == StageType.SCRIPT), None)
-            content = export_service.export_fountain(project, script_stage)
+            content = await run_in_threadpool(
+                export_service.export_fountain, project, script_stage
+            )
             return Response(
                 content=content.encode('utf-8'),
                 media_type="text/plain",
@@ -66,12 +69,12 @@ async def export_script(
 
 
 @router.post("/storyboard/{project_id}")
-async def export_storyboard(project_id: int, db: Session = Depends(get_db)):
+async def export_storyboard(project_id: int, db: AsyncSession = Depends(get_async_db)):
     """Export storyboard as Excel spreadsheet."""
     project_service = ProjectService(db)
     export_service = ExportService()
     
-    project = project_service.get_project(project_id)
+    project = await project_service.aget_project(project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
@@ -80,7 +83,9 @@ async def export_storyboard(project_id: int, db: Session = Depends(get_db)):
         None
     )
     
-    content = export_service.export_storyboard_excel(project, storyboard_stage)
+    content = await run_in_threadpool(
+        export_service.export_storyboard_excel, project, storyboard_stage
+    )
     quoted_name = quote(project.name)
     return Response(
         content=content,
@@ -90,12 +95,12 @@ async def export_storyboard(project_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/prompts/{project_id}")
-async def export_prompts(project_id: int, db: Session = Depends(get_db)):
+async def export_prompts(project_id: int, db: AsyncSession = Depends(get_async_db)):
     """Export AI prompts as text file."""
     project_service = ProjectService(db)
     export_service = ExportService()
     
-    project = project_service.get_project(project_id)
+    project = await project_service.aget_project(project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
@@ -108,7 +113,9 @@ async def export_prompts(project_id: int, db: Session = Depends(get_db)):
         None
     )
     
-    content = export_service.export_prompts_txt(project, image_stage, motion_stage)
+    content = await run_in_threadpool(
+        export_service.export_prompts_txt, project, image_stage, motion_stage
+    )
     quoted_name = quote(project.name)
     return Response(
         content=content.encode('utf-8'),
@@ -118,17 +125,17 @@ async def export_prompts(project_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/complete/{project_id}")
-async def export_complete(project_id: int, db: Session = Depends(get_db)):
+async def export_complete(project_id: int, db: AsyncSession = Depends(get_async_db)):
     """Export complete project as ZIP archive."""
     project_service = ProjectService(db)
     export_service = ExportService()
     
-    project = project_service.get_project(project_id)
+    project = await project_service.aget_project(project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
     stages = list(project.stages)
-    content = export_service.export_complete_zip(project, stages)
+    content = await run_in_threadpool(export_service.export_complete_zip, project, stages)
     
     quoted_name = quote(project.name)
     return Response(
@@ -2,14 +2,15 @@
 AI Story Backend - Projects API Routes
 """
 import json
-from typing import Optional
+from typing import Literal, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app.core.limiter import rate_limit_exempt
+from app.db import get_read_db, get_write_db, write_queue
 from app.models import StageType, StageStatus, Stage, StageVersion
 from app.schemas import (
-    ProjectCreate, ProjectUpdate, ProjectResponse, ProjectListResponse,
+    ProjectCreate, ProjectUpdate, ProjectResponse, ProjectListResponse, ProjectProgress,
     StageUpdate, StageResponse, StageVersionResponse, StageVersionListResponse,
     RestoreVersionRequest,
 )
@@ -19,7 +20,7 @@ router = APIRouter(prefix="/projects", tags=["Projects"])
 
 
 @router.post("", response_model=ProjectResponse)
-def create_project(data: ProjectCreate, db: Session = Depends(get_db)):
+def create_project(data: ProjectCreate, db: Session = Depends(get_write_db)):
     """Create a new project."""
     service = ProjectService(db)
     project = service.create_project(data)
@@ -31,25 +32,35 @@ def list_projects(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: Literal["exact", "cached"] = Query("exact", description="Exact or recently cached total"),
+    include_progress: bool = Query(False, description="Add each project's per-stage progress"),
+    db: Session = Depends(get_read_db)
 ):
     """List all projects with pagination."""
     service = ProjectService(db)
-    projects, total = service.list_projects(page, page_size, search)
+    try:
+        projects, total, next_cursor = service.list_projects(
+            page, page_size, search, cursor, cached_total=count == "cached"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
+    progress = service.get_stage_progress([p.id for p in projects]) if include_progress else {}
     total_pages = (total + page_size - 1) // page_size
     
     return ProjectListResponse(
-        items=[_project_to_response(p) for p in projects],
+        items=[_project_to_response(p, progress.get(p.id)) for p in projects],
         total=total,
         page=page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
     )
 
 
 @router.get("/{project_id}", response_model=ProjectResponse)
-def get_project(project_id: int, db: Session = Depends(get_db)):
+def get_project(project_id: int, db: Session = Depends(get_read_db)):
     """Get a project by ID."""
     service = ProjectService(db)
     project = service.get_project(project_id)
@@ -59,7 +70,7 @@ def get_project(project_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{project_id}", response_model=ProjectResponse)
-def update_project(project_id: int, data: ProjectUpdate, db: Session = Depends(get_db)):
+def update_project(project_id: int, data: ProjectUpdate, db: Session = Depends(get_write_db)):
     """Update a project."""
     service = ProjectService(db)
     project = service.update_project(project_id, data)
@@ -69,7 +80,7 @@ def update_project(project_id: int, data: ProjectUpdate, db: Session = Depends(g
 
 
 @router.delete("/{project_id}")
-def delete_project(project_id: int, db: Session = Depends(get_db)):
+def delete_project(project_id: int, db: Session = Depends(get_write_db)):
     """Delete a project (soft delete)."""
     service = ProjectService(db)
     if not service.delete_project(project_id):
@@ -79,7 +90,7 @@ def delete_project(project_id: int, db: Session = Depends(get_db)):
 
 # Stage routes
 @router.get("/{project_id}/stages/{stage_type}", response_model=StageResponse)
-def get_stage(project_id: int, stage_type: StageType, db: Session = Depends(get_db)):
+def get_stage(project_id: int, stage_type: StageType, db: Session = Depends(get_read_db)):
     """Get a specific stage."""
     service = ProjectService(db)
     stage = service.get_stage(project_id, stage_type)
@@ -89,40 +100,22 @@ def get_stage(project_id: int, stage_type: StageType, db: Session = Depends(get_
 
 
 @router.put("/{project_id}/stages/{stage_type}", response_model=StageResponse)
-def update_stage(
+@rate_limit_exempt
+async def update_stage(
     project_id: int, 
     stage_type: StageType, 
     data: StageUpdate,
-    db: Session = Depends(get_db)
 ):
     """Update stage content."""
-    service = ProjectService(db)
-    stage = service.get_stage(project_id, stage_type)
-    if not stage:
-        raise HTTPException(status_code=404, detail="Stage not found")
-    
-    # Save version if content changed
-    if stage.content != data.content:
-        _save_manual_version(db, stage, data.content)
-    
-    stage.content = data.content
-    if data.status:
-        stage.status = data.status
-    elif not stage.content:
-        stage.status = StageStatus.UNLOCKED
-    else:
-        stage.status = StageStatus.IN_PROGRESS
-    
-    db.commit()
-    db.refresh(stage)
-    return _stage_to_response(stage)
+    # Autosaves arrive often and concurrently; they go through the write queue
+    return await write_queue.submit(_update_stage, project_id, stage_type, data)
 
 
 @router.get("/{project_id}/stages/{stage_type}/versions", response_model=StageVersionListResponse)
 def get_stage_versions(
     project_id: int, 
     stage_type: StageType,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get version history for a stage."""
     service = ProjectService(db)
@@ -143,7 +136,7 @@ def restore_version(
     project_id: int,
     stage_type: StageType,
     data: RestoreVersionRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_write_db)
 ):
     """Restore a stage to a previous version."""
     service = ProjectService(db)
@@ -178,7 +171,7 @@ def rename_version(
     stage_type: StageType,
     version_id: int,
     data: dict,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_write_db)
 ):
     """Rename a version with a custom label."""
     service = ProjectService(db)
@@ -207,7 +200,7 @@ def delete_version(
     project_id: int,
     stage_type: StageType,
     version_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_write_db)
 ):
     """Delete a version."""
     service = ProjectService(db)
@@ -230,7 +223,7 @@ def delete_version(
     return {"message": "Version deleted successfully"}
 
 
-def _project_to_response(project) -> ProjectResponse:
+def _project_to_response(project, progress: Optional[ProjectProgress] = None) -> ProjectResponse:
     """Convert project model to response."""
     return ProjectResponse(
         id=project.id,
@@ -240,7 +233,8 @@ def _project_to_response(project) -> ProjectResponse:
         tags=json.loads(project.tags) if project.tags else [],
         created_at=project.created_at,
         updated_at=project.updated_at,
-        is_deleted=project.is_deleted
+        is_deleted=project.is_deleted,
+        progress=progress
     )
 
 
@@ -274,6 +268,32 @@ def _version_to_response(version: StageVersion) -> StageVersionResponse:
     )
 
 
+def _update_stage(
+    db: Session, project_id: int, stage_type: StageType, data: StageUpdate
+) -> StageResponse:
+    """Apply a stage update (runs in the write queue)."""
+    service = ProjectService(db)
+    stage = service.get_stage(project_id, stage_type)
+    if not stage:
+        raise HTTPException(status_code=404, detail="Stage not found")
+    
+    # Save version if content changed
+    if stage.content != data.content:
+        _save_manual_version(db, stage, data.content)
+    
+    stage.content = data.content
+    if data.status:
+        stage.status = data.status
+    elif not stage.content:
+        stage.status = StageStatus.UNLOCKED
+    else:
+        stage.status = StageStatus.IN_PROGRESS
+    
+    db.commit()
+    db.refresh(stage)
+    return _stage_to_response(stage)
+
+
 def _save_manual_version(db: Session, stage: Stage, content: str, source: str = "manual"):
     """Save a manual version."""
     from sqlalchemy import select, func
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 
-from app.db import get_db
+from app.db import get_db, get_write_db
 from app.models import SystemPrompt
 from app.models.enums import StageType, STAGE_NAMES
 from app.schemas.system_prompt import (
@@ -13,7 +13,7 @@ from app.schemas.system_prompt import (
     SystemPromptUpdate, 
     SystemPromptResponse
 )
-from app.services.prompt_service import load_default_prompts
+from app.services.prompt_service import prompt_registry
 
 router = APIRouter(prefix="/prompts", tags=["Prompts"])
 
@@ -26,7 +26,7 @@ def list_prompts(db: Session = Depends(get_db)):
     
     # Initialize if empty
     if not prompts:
-        default_prompts = load_default_prompts()
+        default_prompts = prompt_registry.defaults
         initial_prompts = []
         for stage, content in default_prompts.items():
             db_prompt = SystemPrompt(stage=stage.value, content=content)
@@ -48,7 +48,7 @@ def get_prompt(stage: StageType, db: Session = Depends(get_db)):
     
     if not prompt:
         # If not found but exists in defaults, create it
-        default_prompts = load_default_prompts()
+        default_prompts = prompt_registry.defaults
         if stage in default_prompts:
             prompt = SystemPrompt(stage=stage.value, content=default_prompts[stage])
             db.add(prompt)
@@ -64,41 +64,16 @@ def get_prompt(stage: StageType, db: Session = Depends(get_db)):
 def update_prompt(
     stage: StageType, 
     data: SystemPromptUpdate, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_write_db)
 ):
     """Update system prompt for a stage."""
-    stmt = select(SystemPrompt).where(SystemPrompt.stage == stage.value)
-    prompt = db.execute(stmt).scalar_one_or_none()
-    
-    if prompt:
-        prompt.content = data.content
-    else:
-        prompt = SystemPrompt(stage=stage.value, content=data.content)
-        db.add(prompt)
-    
-    db.commit()
-    db.refresh(prompt)
-    return prompt
+    return prompt_registry.save(db, stage, data.content)
 
 
 @router.post("/{stage}/reset", response_model=SystemPromptResponse)
-def reset_prompt(stage: StageType, db: Session = Depends(get_db)):
+def reset_prompt(stage: StageType, db: Session = Depends(get_write_db)):
     """Reset system prompt to default."""
-    default_prompts = load_default_prompts()
-    if stage not in default_prompts:
+    if stage not in prompt_registry.defaults:
         raise HTTPException(status_code=400, detail="No default prompt for this stage")
-        
-    stmt = select(SystemPrompt).where(SystemPrompt.stage == stage.value)
-    prompt = db.execute(stmt).scalar_one_or_none()
-    
-    default_content = default_prompts[stage]
     
-    if prompt:
-        prompt.content = default_content
-    else:
-        prompt = SystemPrompt(stage=stage.value, content=default_content)
-        db.add(prompt)
-        
-    db.commit()
-    db.refresh(prompt)
-    return prompt
+    return prompt_registry.reset(db, stage)
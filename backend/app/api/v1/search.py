@@ -0,0 +1,36 @@
+"""
+AI Story Backend - Search API Routes
+"""
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.db import get_read_db, search_index
+from app.models import StageType
+from app.schemas import SearchResponse
+from app.services import SearchService
+from app.services.search_service import SearchScope
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get("", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    project_id: Optional[int] = None,
+    stage_type: Optional[StageType] = None,
+    scope: SearchScope = "all",
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    db: Session = Depends(get_read_db)
+):
+    """Search stage content and version history, best matches first."""
+    start = time.perf_counter()
+    hits = SearchService(db).search(q, project_id, stage_type, scope, limit, offset)
+    return SearchResponse(
+        query=q,
+        items=hits,
+        full_text=search_index.available,
+        took_ms=round((time.perf_counter() - start) * 1000, 2),
+    )
@@ -6,9 +6,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from pydantic import BaseModel
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from app.db import get_db
+from app.db import get_db, get_write_db
 from app.models import AISettings
 from app.schemas import (
     AISettingsCreate, AISettingsUpdate, AISettingsResponse, 
@@ -16,6 +17,7 @@ from app.schemas import (
 )
 from app.services import SettingsService
 from app.utils.ai_client import create_ai_client
+from app.utils.model_list_cache import model_list_cache
 
 router = APIRouter(prefix="/settings", tags=["Settings"])
 
@@ -23,6 +25,8 @@ router = APIRouter(prefix="/settings", tags=["Settings"])
 class FetchModelsRequest(BaseModel):
     api_key: str
     base_url: str
+    # Bypass the cached list and fetch from the provider now
+    refresh: bool = False
 
 
 class ModelInfo(BaseModel):
@@ -32,51 +36,69 @@ class ModelInfo(BaseModel):
 
 class FetchModelsResponse(BaseModel):
     models: List[ModelInfo]
+    cached: bool = False
+    fetched_at: Optional[datetime] = None
+
+
+async def _fetch_models_upstream(base_url: str, api_key: str) -> List[dict]:
+    """Call the provider's /models endpoint and normalize the result."""
+    # Call the /models endpoint (OpenAI-compatible API). The endpoint and key
+    # are arbitrary user input, often never saved, so no pooled client is kept
+    async with httpx.AsyncClient(timeout=30) as client:
+        response = await client.get(
+            f"{base_url.rstrip('/')}/models",
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+    response.raise_for_status()
+    result = response.json()
+    
+    models = []
+    # OpenAI format: {"data": [{"id": "model-id", ...}, ...]}
+    if "data" in result:
+        for model in result["data"]:
+            model_id = model.get("id", "")
+            models.append({"id": model_id, "name": model.get("name", model_id)})
+    # Some APIs return {"models": [...]}
+    elif "models" in result:
+        for model in result["models"]:
+            if isinstance(model, str):
+                models.append({"id": model, "name": model})
+            else:
+                model_id = model.get("id", model.get("name", ""))
+                models.append({"id": model_id, "name": model.get("name", model_id)})
+    
+    # Sort by id
+    models.sort(key=lambda m: m["id"])
+    return models
 
 
 @router.post("/ai/models", response_model=FetchModelsResponse)
 async def fetch_available_models(data: FetchModelsRequest):
-    """Fetch available models from the given base URL."""
+    """Fetch available models from the given base URL (cached per endpoint and key)."""
     try:
-        # Call the /models endpoint (OpenAI-compatible API)
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(
-                f"{data.base_url.rstrip('/')}/models",
-                headers={"Authorization": f"Bearer {data.api_key}"}
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            models = []
-            # OpenAI format: {"data": [{"id": "model-id", ...}, ...]}
-            if "data" in result:
-                for model in result["data"]:
-                    model_id = model.get("id", "")
-                    models.append(ModelInfo(
-                        id=model_id,
-                        name=model.get("name", model_id)
-                    ))
-            # Some APIs return {"models": [...]}
-            elif "models" in result:
-                for model in result["models"]:
-                    if isinstance(model, str):
-                        models.append(ModelInfo(id=model, name=model))
-                    else:
-                        model_id = model.get("id", model.get("name", ""))
-                        models.append(ModelInfo(
-                            id=model_id,
-                            name=model.get("name", model_id)
-                        ))
-            
-            # Sort by id
-            models.sort(key=lambda m: m.id)
-            return FetchModelsResponse(models=models)
+        entry, cached = await model_list_cache.get(
+            data.base_url,
+            data.api_key,
+            lambda: _fetch_models_upstream(data.base_url, data.api_key),
+            refresh=data.refresh,
+        )
+        return FetchModelsResponse(
+            models=[ModelInfo(**m) for m in entry.models],
+            cached=cached,
+            fetched_at=datetime.utcfromtimestamp(entry.fetched_at),
+        )
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=f"API 錯誤: {e.response.text}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"獲取模型列表失敗: {str(e)}")
 
 
+@router.get("/ai/models/cache")
+def get_model_list_cache_stats():
+    """Model list cache hit/refresh counters."""
+    return model_list_cache.stats()
+
+
 @router.get("/ai/{settings_id}/key")
 def get_api_key(settings_id: int, db: Session = Depends(get_db)):
     """Get decrypted API key for editing purposes."""
@@ -107,7 +129,7 @@ def list_ai_settings(db: Session = Depends(get_db)):
 
 
 @router.post("/ai", response_model=AISettingsResponse)
-def create_ai_settings(data: AISettingsCreate, db: Session = Depends(get_db)):
+def create_ai_settings(data: AISettingsCreate, db: Session = Depends(get_write_db)):
     """Create new AI settings."""
     service = SettingsService(db)
     settings = service.create_settings(data.model_dump())
@@ -131,7 +153,7 @@ def get_ai_settings(settings_id: int, db: Session = Depends(get_db)):
 def update_ai_settings(
     settings_id: int, 
     data: AISettingsUpdate, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_write_db)
 ):
     """Update AI settings."""
     service = SettingsService(db)
@@ -144,7 +166,7 @@ def update_ai_settings(
 
 
 @router.delete("/ai/{settings_id}")
-def delete_ai_settings(settings_id: int, db: Session = Depends(get_db)):
+def delete_ai_settings(settings_id: int, db: Session = Depends(get_write_db)):
     """Delete AI settings."""
     service = SettingsService(db)
     if not service.delete_settings(settings_id):
@@ -0,0 +1,40 @@
+"""
+AI Story Backend - Maintenance Commands
+
+Usage:
+    python -m app.cli rebuild-search
+"""
+import argparse
+import logging
+import time
+
+from app.db.base import Base, engine
+from app.db.fts import search_index
+
+
+def rebuild_search(args: argparse.Namespace):
+    """Rebuild the full-text indexes from projects, stages and versions."""
+    Base.metadata.create_all(bind=engine)
+    if engine.dialect.name != "sqlite":
+        print(f"Full-text search needs SQLite; {engine.dialect.name} uses LIKE queries")
+        return
+    start = time.perf_counter()
+    counts = search_index.rebuild(engine)
+    for name, rows in counts.items():
+        print(f"{name:<22}{rows:>8} rows")
+    print(f"Rebuilt in {time.perf_counter() - start:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="AI Story maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "rebuild-search", help=rebuild_search.__doc__
+    ).set_defaults(func=rebuild_search)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
 """Core module initialization."""
 from .config import settings
 from .security import encrypt_api_key, decrypt_api_key
+from .credentials import ClientConfig, credential_cache, get_client_config
 
-__all__ = ["settings", "encrypt_api_key", "decrypt_api_key"]
+__all__ = [
+    "settings",
+    "encrypt_api_key",
+    "decrypt_api_key",
+    "ClientConfig",
+    "credential_cache",
+    "get_client_config",
+]
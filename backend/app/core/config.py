@@ -22,6 +22,20 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./ai_story.db"
+    # Async routes use the async driver for the same database (sqlite+aiosqlite,
+    # postgresql+asyncpg, ...); set this only to override the derived URL
+    async_database_url: str = ""
+    # SQLite production profile: WAL journal and tuned pragmas, a pool of
+    # read-only connections and one batched write queue (no SQL echo)
+    sqlite_production: bool = False
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kb: int = 64 * 1024  # Page cache per connection
+    sqlite_mmap_size_mb: int = 256
+    sqlite_read_pool_size: int = 8
+    write_queue_batch_size: int = 64  # Queued writes committed in one transaction
+    
+    # Project listing: reuse counts this recent when the client asks for a cached total
+    project_count_cache_seconds: float = 30.0
     
     # Security
     secret_key: str = secrets.token_urlsafe(32)
@@ -31,12 +45,90 @@ class Settings(BaseSettings):
     openai_base_url: str = "https://api.openai.com/v1"
     openai_model: str = "gpt-4"
     
+    # Outbound HTTP connection pool (shared by all AI clients)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 60.0
+    http2_enabled: bool = True
+    http_max_clients: int = 64  # Pooled clients (one per endpoint and key), LRU
+    
+    # WebSocket streaming: coalesce token deltas into one frame per window
+    ws_token_flush_interval_ms: int = 50
+    ws_token_flush_bytes: int = 4096
+    ws_heartbeat_seconds: float = 15.0  # Ping while streaming to detect dead clients (0 = off)
+    
+    # Generation cache (on-disk LRU keyed by prompt + sampling params)
+    generation_cache_enabled: bool = False
+    generation_cache_path: str = "./.cache/generation_cache.db"
+    generation_cache_max_entries: int = 500
+    generation_cache_max_bytes: int = 50 * 1024 * 1024
+    generation_cache_ttl_seconds: int = 7 * 24 * 3600
+    
+    # Provider /models list cache (stale-while-revalidate)
+    model_list_cache_ttl_seconds: int = 600
+    model_list_cache_max_stale_seconds: int = 24 * 3600
+    model_list_cache_max_entries: int = 32
+    
+    # Decrypted AI credentials kept in memory (per AISettings row)
+    credential_cache_max_entries: int = 64
+    
+    # System prompts are cached in memory; check for edits by other workers this often
+    prompt_registry_check_seconds: float = 5.0
+    
     # CORS
     cors_origins: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
     
+    # AI resilience: retries, circuit breaker, failover and hedging
+    ai_retry_max_attempts: int = 3
+    ai_retry_base_delay: float = 0.5
+    ai_retry_max_delay: float = 20.0
+    ai_circuit_failure_threshold: int = 5
+    ai_circuit_reset_seconds: float = 30.0
+    ai_failover_enabled: bool = True
+    ai_hedge_after_seconds: float = 0.0  # 0 disables hedged requests
+    
+    # Multi-stage pipeline: independent stages generated at the same time
+    pipeline_max_concurrency: int = 3
+    
+    # Background generation jobs (0 workers disables the pool)
+    job_worker_count: int = 2
+    job_max_attempts: int = 3
+    job_poll_interval_seconds: float = 2.0
+    job_retry_base_delay: float = 5.0
+    # Running jobs whose worker has not sent a heartbeat for this long are re-queued
+    job_stale_after_seconds: float = 60.0
+    
+    # Request a usage chunk at the end of streams (stream_options.include_usage)
+    ai_stream_include_usage: bool = True
+    
+    # Streamed generations are checkpointed to a draft version every N tokens / seconds
+    stream_checkpoint_tokens: int = 200
+    stream_checkpoint_seconds: float = 10.0
+    # Drafts not checkpointed for this long are left over from a dead process;
+    # startup turns them into resumable partial versions
+    stale_draft_seconds: float = 300.0
+    
+    # Context compaction: dependency stages that would overflow the model window
+    # are replaced by AI summaries, cached per content hash
+    context_compaction_enabled: bool = True
+    context_default_window: int = 32768  # Models without an entry in model_prices.yaml
+    context_max_prompt_tokens: int = 0  # Optional cap below the window; 0 = window only
+    context_summary_tokens: int = 1200  # Target size of one summary
+    
+    # Anthropic Messages API adapter (provider "anthropic", or "claude" on anthropic.com)
+    anthropic_version: str = "2023-06-01"
+    anthropic_beta: str = ""  # Optional anthropic-beta header value
+    anthropic_prompt_caching: bool = True
+    
     # Rate Limiting
-    rate_limit_per_minute: int = 60
-    ai_rate_limit_per_minute: int = 10
+    rate_limit_enabled: bool = False  # Inbound limit; opt-in for shared deployments
+    rate_limit_per_minute: int = 60  # Inbound, per client IP (writes only)
+    # Outbound, per AI settings: set to the provider plan's requests per minute.
+    # A full pipeline makes ~8 stage calls plus context summaries
+    ai_rate_limit_per_minute: int = 60
+    ai_rate_limit_burst: int = 10
+    ai_max_concurrent_per_provider: int = 4
+    ai_limiter_max_wait_seconds: float = 120.0
 
 
 settings = Settings()
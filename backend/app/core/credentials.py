@@ -0,0 +1,92 @@
+"""
+AI Story Backend - Decrypted Credential Cache
+"""
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+from .config import settings as app_settings
+from .security import decrypt_api_key
+
+logger = logging.getLogger(__name__)
+
+
+class ClientConfig:
+    """Ready-to-use client configuration for one AISettings row, key decrypted."""
+
+    __slots__ = (
+        "api_key", "provider", "base_url", "model",
+        "temperature", "top_p", "max_tokens",
+    )
+
+    def __init__(self, ai_settings, api_key: str):
+        self.api_key = api_key
+        self.provider = ai_settings.provider
+        self.base_url = ai_settings.base_url.rstrip("/")
+        self.model = ai_settings.model
+        self.temperature = ai_settings.temperature
+        self.top_p = ai_settings.top_p
+        self.max_tokens = ai_settings.max_tokens
+
+    def __repr__(self) -> str:
+        return f"<ClientConfig(provider='{self.provider}', model='{self.model}')>"
+
+
+class CredentialCache:
+    """Bounded LRU of ClientConfig keyed by AISettings id and updated_at.
+
+    Any edit to an AISettings row bumps `updated_at`, so stale entries are
+    never served; `invalidate` additionally drops them right away.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[int, Tuple[datetime, ClientConfig]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ai_settings) -> ClientConfig:
+        """Get the client configuration for an AISettings, decrypting only on a miss."""
+        settings_id = ai_settings.id
+        version = ai_settings.updated_at
+        if settings_id is None or version is None:
+            # Transient (unsaved) settings: nothing stable to key on
+            return ClientConfig(ai_settings, decrypt_api_key(ai_settings.api_key_encrypted))
+
+        with self._lock:
+            entry = self._entries.get(settings_id)
+            if entry and entry[0] == version:
+                self.hits += 1
+                self._entries.move_to_end(settings_id)
+                return entry[1]
+
+        self.misses += 1
+        config = ClientConfig(ai_settings, decrypt_api_key(ai_settings.api_key_encrypted))
+        with self._lock:
+            self._entries.pop(settings_id, None)
+            self._entries[settings_id] = (version, config)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return config
+
+    def invalidate(self, settings_id: Optional[int] = None):
+        """Drop one AISettings entry, or all of them."""
+        with self._lock:
+            if settings_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(settings_id, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+credential_cache = CredentialCache(max_entries=app_settings.credential_cache_max_entries)
+
+
+def get_client_config(ai_settings) -> ClientConfig:
+    """Cached client configuration (with decrypted API key) for an AISettings."""
+    return credential_cache.get(ai_settings)
@@ -0,0 +1,50 @@
+"""
+AI Story Backend - Inbound API Rate Limiting
+"""
+import time
+from typing import Callable, Set
+
+from fastapi import HTTPException
+from limits import parse
+from limits.storage import MemoryStorage
+from limits.strategies import MovingWindowRateLimiter
+from slowapi.util import get_remote_address
+from starlette.requests import HTTPConnection
+
+from .config import settings
+
+_api_limit = parse(f"{settings.rate_limit_per_minute}/minute")
+_limiter = MovingWindowRateLimiter(MemoryStorage())
+
+# Reads and polls cost little and the editor sends them constantly
+_EXEMPT_METHODS = {"GET", "HEAD", "OPTIONS"}
+_exempt_endpoints: Set[Callable] = set()
+
+
+def rate_limit_exempt(endpoint: Callable) -> Callable:
+    """Route decorator: never count requests to this endpoint (e.g. autosaves)."""
+    _exempt_endpoints.add(endpoint)
+    return endpoint
+
+
+async def enforce_rate_limit(connection: HTTPConnection):
+    """Per-client request limit for the HTTP API routes (opt-in, RATE_LIMIT_ENABLED).
+
+    WebSockets, reads and endpoints marked with rate_limit_exempt are not limited.
+    """
+    if not settings.rate_limit_enabled or connection.scope["type"] != "http":
+        return
+    if (
+        connection.scope["method"] in _EXEMPT_METHODS
+        or connection.scope.get("endpoint") in _exempt_endpoints
+    ):
+        return
+    key = get_remote_address(connection)
+    if not _limiter.hit(_api_limit, key):
+        reset_at, _ = _limiter.get_window_stats(_api_limit, key)
+        retry_after = max(1, int(reset_at - time.time()))
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded: {settings.rate_limit_per_minute} per minute",
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -3,10 +3,12 @@ AI Story Backend - Security Utilities
 """
 import base64
 import os
+from functools import lru_cache
 from cryptography.fernet import Fernet
 from .config import settings
 
 
+@lru_cache(maxsize=1)
 def get_encryption_key() -> bytes:
     """Get or generate the encryption key from secret_key."""
     # Use the first 32 bytes of the secret key as the Fernet key
@@ -14,12 +16,17 @@ def get_encryption_key() -> bytes:
     return base64.urlsafe_b64encode(key_bytes)
 
 
+@lru_cache(maxsize=1)
+def get_fernet() -> Fernet:
+    """Shared Fernet instance (the key never changes at runtime)."""
+    return Fernet(get_encryption_key())
+
+
 def encrypt_api_key(api_key: str) -> str:
     """Encrypt an API key for secure storage."""
     if not api_key:
         return ""
-    fernet = Fernet(get_encryption_key())
-    encrypted = fernet.encrypt(api_key.encode())
+    encrypted = get_fernet().encrypt(api_key.encode())
     return encrypted.decode()
 
 
@@ -28,8 +35,7 @@ def decrypt_api_key(encrypted_key: str) -> str:
     if not encrypted_key:
         return ""
     try:
-        fernet = Fernet(get_encryption_key())
-        decrypted = fernet.decrypt(encrypted_key.encode())
+        decrypted = get_fernet().decrypt(encrypted_key.encode())
         return decrypted.decode()
     except Exception:
         return ""
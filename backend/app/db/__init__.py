@@ -1,5 +1,48 @@
 """Database module initialization."""
-from .base import Base, engine, SessionLocal
-from .session import get_db
+from .base import (
+    Base,
+    engine,
+    SessionLocal,
+    read_engine,
+    ReadSessionLocal,
+    crud_engine,
+    WriteSessionLocal,
+    get_async_engine,
+    dispose_async_engine,
+    AsyncSessionLocal,
+    get_write_engine,
+    dispose_write_engine,
+)
+from .fts import FTSIndex, SearchIndex, fts_query, search_index
+from .session import (
+    AnySession, get_db, get_read_db, get_write_db, get_async_db, split_session, run_sync,
+)
+from .write_queue import WriteQueue, write_queue
 
-__all__ = ["Base", "engine", "SessionLocal", "get_db"]
+__all__ = [
+    "Base",
+    "engine",
+    "SessionLocal",
+    "read_engine",
+    "ReadSessionLocal",
+    "crud_engine",
+    "WriteSessionLocal",
+    "get_async_engine",
+    "dispose_async_engine",
+    "AsyncSessionLocal",
+    "get_write_engine",
+    "dispose_write_engine",
+    "WriteQueue",
+    "write_queue",
+    "FTSIndex",
+    "SearchIndex",
+    "fts_query",
+    "search_index",
+    "AnySession",
+    "get_db",
+    "get_read_db",
+    "get_write_db",
+    "get_async_db",
+    "split_session",
+    "run_sync",
+]
@@ -1,7 +1,11 @@
 """
 AI Story Backend - Database Base Configuration
 """
-from sqlalchemy import create_engine
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from app.core.config import settings
@@ -12,10 +16,180 @@ class Base(DeclarativeBase):
     pass
 
 
+_sqlite = make_url(settings.database_url).get_backend_name() == "sqlite"
+# The production profile only applies to SQLite databases
+sqlite_production = settings.sqlite_production and _sqlite
+_echo = settings.debug and not sqlite_production
+
+
+def _sqlite_pragmas(writer: bool) -> list[str]:
+    """Per-connection pragmas of the SQLite production profile."""
+    pragmas = [
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size_mb * 1024 * 1024}",
+    ]
+    if writer:
+        # WAL is stored in the database file; readers then never block the writer
+        pragmas += ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"]
+    else:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def _use_sqlite_pragmas(engine: Engine, writer: bool = True):
+    """Run the production pragmas on every new connection of `engine`."""
+    pragmas = _sqlite_pragmas(writer)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def _use_immediate_transactions(engine: Engine):
+    """Take SQLite's write lock when a transaction begins, not at its first write.
+
+    A deferred transaction that later upgrades to a write fails at once with
+    "database is locked" if another connection committed meanwhile; BEGIN
+    IMMEDIATE waits for the lock under busy_timeout instead. The driver's own
+    transaction handling is turned off so SAVEPOINTs also behave.
+    """
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
 engine = create_engine(
     settings.database_url,
     connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {},
-    echo=settings.debug
+    echo=_echo
 )
+if sqlite_production:
+    _use_sqlite_pragmas(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Read-only routes; a separate pool of query_only connections in the SQLite
+# production profile, the main engine otherwise
+if sqlite_production:
+    read_engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},
+        pool_size=settings.sqlite_read_pool_size,
+        echo=_echo
+    )
+    _use_sqlite_pragmas(read_engine, writer=False)
+else:
+    read_engine = engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Short sync write routes (CRUD outside the write queue). In the SQLite
+# production profile their transactions begin IMMEDIATE, so they wait for the
+# write lock under busy_timeout instead of failing when a read upgrades to a
+# write; routes that await I/O mid-session keep the deferred main engine.
+if sqlite_production:
+    crud_engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},
+        echo=_echo
+    )
+    _use_sqlite_pragmas(crud_engine)
+    _use_immediate_transactions(crud_engine)
+else:
+    crud_engine = engine
+
+WriteSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=crud_engine)
+
+# Async drivers for the sync URL schemes we support
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_database_url(url: str) -> str:
+    """The async-driver form of a database URL (sqlite:// -> sqlite+aiosqlite://)."""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver known for database URL: {parsed.drivername}")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+# Used by async routes so database I/O does not block the event loop. Created
+# on first use: a deployment without the async driver for its database still
+# starts, and only what needs the async engine reports the missing driver.
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """The async engine for DATABASE_URL (or ASYNC_DATABASE_URL), created on first use."""
+    global _async_engine
+    if _async_engine is None:
+        url = settings.async_database_url or async_database_url(settings.database_url)
+        try:
+            async_engine = create_async_engine(url, echo=_echo)
+        except ImportError as e:
+            raise RuntimeError(
+                f"The async database driver for {make_url(url).drivername} is not installed: {e}"
+            ) from e
+        if sqlite_production:
+            _use_sqlite_pragmas(async_engine.sync_engine)
+        _async_engine = async_engine
+    return _async_engine
+
+
+async def dispose_async_engine():
+    """Close the async engine's pooled connections, if it was ever created."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
+class _LazyAsyncSessionMaker(async_sessionmaker):
+    """async_sessionmaker that binds to get_async_engine() when the first session is made."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_async_engine())
+        return super().__call__(**local_kw)
+
+
+# expire_on_commit=False: attributes of committed objects stay readable
+# outside the session's greenlet (an expired attribute would need I/O)
+AsyncSessionLocal = _LazyAsyncSessionMaker(autoflush=False, expire_on_commit=False)
+
+# Single connection behind the write queue (app.db.write_queue) in the SQLite
+# production profile; SQLite allows one writer at a time anyway. Created on
+# first use, like the async engine.
+_write_engine: Optional[AsyncEngine] = None
+
+
+def get_write_engine() -> Optional[AsyncEngine]:
+    """The write queue's engine (None outside the SQLite production profile)."""
+    global _write_engine
+    if _write_engine is None and sqlite_production:
+        write_engine = create_async_engine(
+            settings.async_database_url or async_database_url(settings.database_url),
+            pool_size=1,
+            max_overflow=0,
+            echo=_echo,
+        )
+        _use_sqlite_pragmas(write_engine.sync_engine)
+        _use_immediate_transactions(write_engine.sync_engine)
+        _write_engine = write_engine
+    return _write_engine
+
+
+async def dispose_write_engine():
+    """Close the write queue's connection, if it was ever opened."""
+    if _write_engine is not None:
+        await _write_engine.dispose()
@@ -0,0 +1,212 @@
+"""
+AI Story Backend - SQLite FTS5 Search Index
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import column, event, inspect, literal_column, select, table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import ColumnElement, Select, TableClause
+
+from app.db.base import Base
+from app.utils.cjk import bigrams, cjk_bigrams, cjk_runs
+
+logger = logging.getLogger(__name__)
+
+_FILL_BATCH = 2000  # Source rows read per query when filling an index
+
+
+def fts_query(search: str) -> Optional[str]:
+    """FTS5 MATCH expression for a user search string (None if it has no words).
+
+    Every word must match: a CJK run as the phrase of its bigrams (which is a
+    substring match), any other word as a prefix.
+    """
+    phrases = []
+    for cjk, word in cjk_runs(search):
+        if len(cjk) > 1:
+            phrases.append('"' + " ".join(bigrams(cjk)[:-1]) + '"')
+        else:
+            phrases.append(f'"{cjk or word}"*')
+    return " AND ".join(phrases) or None
+
+
+@dataclass(frozen=True)
+class FTSIndex:
+    """An FTS5 table mirroring text columns of `source`.
+
+    Rows share the source row's id as rowid and hold the `cjk_bigrams` form
+    of each column, tokenized by unicode61. The bigram text is computed in
+    Python when the application writes (see SearchIndex), so the schema
+    itself has no triggers or custom SQL functions.
+    """
+
+    name: str
+    source: str
+    columns: Tuple[str, ...]
+
+    def ddl(self) -> str:
+        # prefix='1': one-character searches (a prefix query) use a prefix index
+        return (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} USING fts5("
+            f"{', '.join(self.columns)}, "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='1')"
+        )
+
+    def drop_legacy_triggers(self, conn: Connection):
+        """Drop the sync triggers of earlier versions (they called cjk_bigrams in SQL)."""
+        for suffix in ("ai", "ad", "au"):
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {self.name}_{suffix}")
+
+    def write(self, conn: Connection, rows: Sequence[Tuple]):
+        """Index `(id, *column values)` rows, replacing what was indexed for those ids."""
+        if not rows:
+            return
+        self.delete(conn, [row[0] for row in rows])
+        columns = ", ".join(self.columns)
+        params = ", ".join(f":{c}" for c in self.columns)
+        conn.execute(
+            text(f"INSERT INTO {self.name}(rowid, {columns}) VALUES (:rowid, {params})"),
+            [
+                {"rowid": row[0], **{
+                    c: cjk_bigrams(value) for c, value in zip(self.columns, row[1:])
+                }}
+                for row in rows
+            ],
+        )
+
+    def row(self, obj) -> Tuple:
+        """The `(id, *column values)` row of an ORM object of the source table."""
+        return (obj.id, *(getattr(obj, c) for c in self.columns))
+
+    def delete(self, conn: Connection, ids: Iterable[int]):
+        conn.execute(
+            text(f"DELETE FROM {self.name} WHERE rowid = :rowid"),
+            [{"rowid": row_id} for row_id in ids],
+        )
+
+    def fill(self, conn: Connection) -> int:
+        """Index every source row from scratch; returns the rows indexed."""
+        conn.exec_driver_sql(f"DELETE FROM {self.name}")
+        stmt = text(
+            f"SELECT id, {', '.join(self.columns)} FROM {self.source} "
+            f"WHERE id > :after ORDER BY id LIMIT {_FILL_BATCH}"
+        )
+        count, after = 0, 0
+        while True:
+            rows = [tuple(row) for row in conn.execute(stmt, {"after": after})]
+            if not rows:
+                return count
+            self.write(conn, rows)
+            count += len(rows)
+            after = rows[-1][0]
+
+    @property
+    def table(self) -> TableClause:
+        """The FTS table: `rowid` (the source row's id) and `rank` (bm25; lower is better)."""
+        return table(self.name, column("rowid"), column("rank"))
+
+    def matches(self, match: str) -> ColumnElement[bool]:
+        """WHERE clause: the indexed text matches the MATCH expression `match`."""
+        return literal_column(self.name).op("MATCH")(match)
+
+    def match_ids(self, match: str) -> Select:
+        """SELECT of the source ids whose indexed text matches `match`."""
+        return select(self.table.c.rowid).where(self.matches(match))
+
+
+class SearchIndex:
+    """The FTS5 indexes of the database (SQLite only).
+
+    `ensure` creates missing indexes at startup and fills new ones from their
+    source tables. Afterwards every ORM flush that inserts, edits or deletes
+    an indexed row updates its index in the same transaction. Writes made
+    outside the application (SQL shells, migrations) are not indexed until
+    `python -m app.cli rebuild-search`. `available` is False on other
+    databases or SQLite builds without FTS5, and callers then fall back to
+    LIKE queries.
+    """
+
+    def __init__(self, indexes: List[FTSIndex]):
+        self.indexes = {index.name: index for index in indexes}
+        self._by_source = {index.source: index for index in indexes}
+        self.available = False
+
+    def __getitem__(self, name: str) -> FTSIndex:
+        return self.indexes[name]
+
+    def ensure(self, engine: Engine) -> bool:
+        """Create missing indexes; returns whether FTS5 search is available."""
+        if engine.dialect.name != "sqlite":
+            self.available = False
+            return False
+        try:
+            with engine.begin() as conn:
+                existing = set(conn.execute(text(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                )).scalars())
+                for index in self.indexes.values():
+                    index.drop_legacy_triggers(conn)
+                    conn.exec_driver_sql(index.ddl())
+                    if index.name not in existing:
+                        logger.info(f"Building search index {index.name}")
+                        index.fill(conn)
+        except OperationalError as e:
+            logger.warning(f"Full-text search unavailable, using LIKE queries: {e}")
+            self.available = False
+            return False
+        self.available = True
+        return True
+
+    def rebuild(self, engine: Engine) -> Dict[str, int]:
+        """Refill every index from its source table; returns the rows indexed per index."""
+        counts = {}
+        with engine.begin() as conn:
+            for index in self.indexes.values():
+                index.drop_legacy_triggers(conn)
+                # Recreated so changes to the table options (tokenizer, prefix) apply
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS {index.name}")
+                conn.exec_driver_sql(index.ddl())
+                counts[index.name] = index.fill(conn)
+                # Merge the index into one b-tree for the fastest queries
+                conn.exec_driver_sql(f"INSERT INTO {index.name}({index.name}) VALUES ('optimize')")
+        self.available = True
+        return counts
+
+    def _indexed(self, target) -> Optional[FTSIndex]:
+        if not self.available:
+            return None
+        return self._by_source.get(target.__tablename__)
+
+    def _on_insert(self, mapper, connection: Connection, target):
+        """Index a row the ORM inserted, in the flush's transaction."""
+        index = self._indexed(target)
+        if index is not None and connection.dialect.name == "sqlite":
+            index.write(connection, [index.row(target)])
+
+    def _on_update(self, mapper, connection: Connection, target):
+        index = self._indexed(target)
+        if index is None or connection.dialect.name != "sqlite":
+            return
+        state = inspect(target)
+        if any(state.attrs[c].history.has_changes() for c in index.columns):
+            index.write(connection, [index.row(target)])
+
+    def _on_delete(self, mapper, connection: Connection, target):
+        index = self._indexed(target)
+        if index is not None and connection.dialect.name == "sqlite":
+            index.delete(connection, [target.id])
+
+
+PROJECTS_FTS = FTSIndex("projects_fts", "projects", ("name", "description"))
+STAGES_FTS = FTSIndex("stages_fts", "stages", ("content",))
+STAGE_VERSIONS_FTS = FTSIndex("stage_versions_fts", "stage_versions", ("content",))
+
+search_index = SearchIndex([PROJECTS_FTS, STAGES_FTS, STAGE_VERSIONS_FTS])
+
+# Every ORM insert, update and delete (cascades included) of an indexed row
+event.listen(Base, "after_insert", search_index._on_insert, propagate=True)
+event.listen(Base, "after_update", search_index._on_update, propagate=True)
+event.listen(Base, "after_delete", search_index._on_delete, propagate=True)
@@ -1,10 +1,14 @@
 """
 AI Story Backend - Database Session Management
 """
-from typing import Generator
+from typing import Any, AsyncGenerator, Callable, Generator, Optional, Tuple, Union
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .base import SessionLocal
+from .base import AsyncSessionLocal, ReadSessionLocal, SessionLocal, WriteSessionLocal
+
+# Services accept either kind of session
+AnySession = Union[Session, AsyncSession]
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -14,3 +18,45 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """Get a session for read-only routes (read-only pool in the SQLite production profile)."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_write_db() -> Generator[Session, None, None]:
+    """Get a session for short sync write routes (BEGIN IMMEDIATE in the SQLite production profile)."""
+    db = WriteSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Get async database session dependency for FastAPI (async routes)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def split_session(db: AnySession) -> Tuple[Session, Optional[AsyncSession]]:
+    """The sync Session to run ORM code on, and the AsyncSession behind it (if any)."""
+    if isinstance(db, AsyncSession):
+        return db.sync_session, db
+    return db, None
+
+
+async def run_sync(async_db: Optional[AsyncSession], fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Call sync ORM code that uses the session from `split_session`.
+    
+    With an AsyncSession the call runs through its async driver, so the
+    event loop is not blocked on database I/O; otherwise it runs directly.
+    """
+    if async_db is None:
+        return fn(*args, **kwargs)
+    return await async_db.run_sync(lambda _session: fn(*args, **kwargs))
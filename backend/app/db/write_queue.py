@@ -0,0 +1,132 @@
+"""
+AI Story Backend - Database Write Queue
+"""
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from .base import AsyncSessionLocal, get_write_engine, sqlite_production
+
+logger = logging.getLogger(__name__)
+
+# (fn, args, kwargs, future) of one submitted write
+_Write = Tuple[Callable[..., Any], tuple, dict, asyncio.Future]
+
+
+class WriteQueue:
+    """Serialize small write transactions onto one connection and group their commits.
+
+    Callers submit `fn(db, *args)` and await its return value. A single worker
+    drains the queue: every write already waiting (up to `batch_size`) runs in
+    one database transaction, each in a SAVEPOINT of its own, so `db.commit()`
+    inside `fn` only releases its savepoint and a failing write rolls back
+    alone. Futures resolve once the shared transaction has committed.
+
+    Only used in the SQLite production profile; otherwise each write runs in
+    a short session of its own, as before.
+    """
+
+    def __init__(
+        self, engine: Callable[[], Optional[AsyncEngine]], enabled: bool, batch_size: int
+    ):
+        self._engine = engine  # Called when the first batch commits
+        self.enabled = enabled
+        self.batch_size = max(1, batch_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.batches = 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "writes": self.writes,
+            "batches": self.batches,
+        }
+
+    async def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(db, *args, **kwargs)` in a write transaction and return its result."""
+        if not self.enabled:
+            async with AsyncSessionLocal() as db:
+                return await db.run_sync(fn, *args, **kwargs)
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_worker().put_nowait((fn, args, kwargs, future))
+        # A caller that goes away does not cancel its write
+        return await asyncio.shield(future)
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        return self._queue
+
+    async def close(self):
+        """Finish queued writes and stop the worker."""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._commit(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, batch: List[_Write]):
+        try:
+            async with self._engine().begin() as conn:
+                results = await conn.run_sync(self._apply, batch)
+        except Exception as e:
+            logger.error(f"Write batch of {len(batch)} failed: {e}")
+            results = [(False, e)] * len(batch)
+        self.writes += len(batch)
+        self.batches += 1
+        for (_, _, _, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    @staticmethod
+    def _apply(conn: Connection, batch: List[_Write]) -> List[Tuple[bool, Any]]:
+        results = []
+        for fn, args, kwargs, _ in batch:
+            with Session(
+                bind=conn,
+                join_transaction_mode="create_savepoint",
+                autoflush=False,
+                expire_on_commit=False,
+            ) as db:
+                try:
+                    result = fn(db, *args, **kwargs)
+                    db.commit()
+                    results.append((True, result))
+                except Exception as e:
+                    db.rollback()
+                    results.append((False, e))
+        return results
+
+
+write_queue = WriteQueue(
+    get_write_engine, sqlite_production, settings.write_queue_batch_size
+)
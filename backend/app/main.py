@@ -4,10 +4,23 @@ AI Story Backend - Main Application
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
 
 from app.core.config import settings
-from app.db.base import Base, engine
+from app.db.base import (
+    Base, SessionLocal, crud_engine, dispose_async_engine, dispose_write_engine, engine,
+    read_engine,
+)
+from app.db.fts import search_index
+from app.db.write_queue import write_queue
 from app.api import api_v1_router
+from app.services.ai_service import AIService
+from app.services.prompt_service import prompt_registry
+from app.services.job_service import job_workers
+from app.utils.generation_cache import close_generation_cache
+from app.utils.http_client import http_clients
+from app.utils.model_list_cache import model_list_cache
 
 
 @asynccontextmanager
@@ -16,9 +29,42 @@ async def lifespan(app: FastAPI):
     # Startup
     # Create tables if not exist
     Base.metadata.create_all(bind=engine)
+    # Columns (nullable) and indexes added to models after their table was created
+    existing = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            columns = {c["name"] for c in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    search_index.ensure(engine)
+    db = SessionLocal()
+    try:
+        # Drafts of streams cut off by a restart become resumable partial versions
+        AIService(db).finalize_stale_drafts()
+        # Serve system prompts from memory
+        prompt_registry.load(db)
+    finally:
+        db.close()
+    # Resume queued generation jobs
+    await job_workers.start()
     yield
     # Shutdown
-    pass
+    await job_workers.stop()
+    await model_list_cache.aclose()
+    # Close pooled outbound HTTP connections
+    await http_clients.aclose()
+    # Commit writes still queued
+    await write_queue.close()
+    await dispose_async_engine()
+    await dispose_write_engine()
+    read_engine.dispose()
+    crud_engine.dispose()
+    close_generation_cache()
 
 
 app = FastAPI(
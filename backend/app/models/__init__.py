@@ -1,14 +1,19 @@
 """Models module initialization."""
-from .enums import StageType, StageStatus, STAGE_ORDER, STAGE_DEPENDENCIES, STAGE_NAMES
+from .enums import StageType, StageStatus, JobStatus, STAGE_ORDER, STAGE_DEPENDENCIES, STAGE_NAMES
 from .project import Project
 from .stage import Stage
 from .stage_version import StageVersion
 from .ai_settings import AISettings
 from .system_prompt import SystemPrompt
+from .prompt_registry_state import PromptRegistryState
+from .generation_telemetry import GenerationTelemetry
+from .generation_job import GenerationJob
+from .stage_summary import StageSummary
 
 __all__ = [
     "StageType",
     "StageStatus",
+    "JobStatus",
     "STAGE_ORDER",
     "STAGE_DEPENDENCIES",
     "STAGE_NAMES",
@@ -17,4 +22,8 @@ __all__ = [
     "StageVersion",
     "AISettings",
     "SystemPrompt",
+    "PromptRegistryState",
+    "GenerationTelemetry",
+    "GenerationJob",
+    "StageSummary",
 ]
@@ -17,7 +17,7 @@ class AISettings(Base):
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     
     # API Configuration
-    provider: Mapped[str] = mapped_column(String(50), default="openai")  # openai, claude, custom
+    provider: Mapped[str] = mapped_column(String(50), default="openai")  # openai, anthropic, claude, local, custom
     api_key_encrypted: Mapped[str] = mapped_column(Text, default="")
     base_url: Mapped[str] = mapped_column(String(500), default="https://api.openai.com/v1")
     model: Mapped[str] = mapped_column(String(100), default="gpt-4")
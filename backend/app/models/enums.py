@@ -24,6 +24,15 @@ class StageStatus(str, Enum):
     COMPLETED = "completed"  # Marked as done
 
 
+class JobStatus(str, Enum):
+    """Status of a background generation job."""
+    QUEUED = "queued"  # Waiting for a worker (or for its retry time)
+    RUNNING = "running"  # Claimed by a worker
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"  # Out of attempts
+    CANCELLED = "cancelled"
+
+
 # Stage order for navigation
 STAGE_ORDER = [
     StageType.IDEA,
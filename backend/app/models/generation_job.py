@@ -0,0 +1,53 @@
+"""
+AI Story Backend - Generation Job Model
+"""
+from datetime import datetime
+from sqlalchemy import String, Text, DateTime, Integer, Boolean, ForeignKey, Enum as SQLEnum
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from .enums import StageType, JobStatus
+
+
+class GenerationJob(Base):
+    """GenerationJob model - a queued AI generation run by the background workers."""
+    
+    __tablename__ = "generation_jobs"
+    
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    project_id: Mapped[int] = mapped_column(
+        ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    stage_type: Mapped[StageType] = mapped_column(SQLEnum(StageType), nullable=False)
+    settings_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    params: Mapped[str] = mapped_column(Text, default="{}")  # JSON generation overrides
+    
+    status: Mapped[JobStatus] = mapped_column(
+        SQLEnum(JobStatus), default=JobStatus.QUEUED, index=True
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3)
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, default=False)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    
+    # Result summary (the content itself is saved as a StageVersion)
+    model: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    result_chars: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    tokens_used: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    
+    # Timestamps
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False, index=True
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    
+    # Worker process running the job and the last sign of life from it
+    worker_id: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    
+    def __repr__(self) -> str:
+        return f"<GenerationJob(id={self.id}, stage='{self.stage_type}', status='{self.status}')>"
@@ -0,0 +1,43 @@
+"""
+AI Story Backend - Generation Telemetry Model
+"""
+from datetime import datetime
+from sqlalchemy import String, Text, DateTime, Float, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class GenerationTelemetry(Base):
+    """GenerationTelemetry model - latency and token usage of one AI generation."""
+    
+    __tablename__ = "generation_telemetry"
+    
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    project_id: Mapped[int | None] = mapped_column(Integer, nullable=True, index=True)
+    stage_type: Mapped[str] = mapped_column(String(50), nullable=False, index=True)
+    settings_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    model: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
+    
+    # "blocking", "stream" or "summary"; "success", "error" or "cancelled"
+    mode: Mapped[str] = mapped_column(String(20), default="blocking")
+    status: Mapped[str] = mapped_column(String(20), default="success")
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    
+    # Token usage (None when the provider did not report it)
+    prompt_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    completion_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    total_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    
+    # Timing
+    ttft_ms: Mapped[float | None] = mapped_column(Float, nullable=True)  # Time to first token
+    latency_ms: Mapped[float] = mapped_column(Float, nullable=False)
+    tokens_per_sec: Mapped[float | None] = mapped_column(Float, nullable=True)
+    output_chars: Mapped[int] = mapped_column(Integer, default=0)
+    
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False, index=True
+    )
+    
+    def __repr__(self) -> str:
+        return f"<GenerationTelemetry(id={self.id}, model='{self.model}', {self.latency_ms:.0f}ms)>"
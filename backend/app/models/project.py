@@ -3,7 +3,7 @@ AI Story Backend - Project Model
 """
 from datetime import datetime
 from typing import List, TYPE_CHECKING
-from sqlalchemy import String, Text, DateTime, Boolean
+from sqlalchemy import String, Text, DateTime, Boolean, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -16,6 +16,10 @@ class Project(Base):
     """Project model - represents a story creation project."""
     
     __tablename__ = "projects"
+    __table_args__ = (
+        # Listing order and keyset pagination
+        Index("ix_projects_updated_at_id", "updated_at", "id"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
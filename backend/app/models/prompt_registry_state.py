@@ -0,0 +1,27 @@
+"""
+AI Story Backend - Prompt Registry State Model
+"""
+from datetime import datetime
+from sqlalchemy import DateTime, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class PromptRegistryState(Base):
+    """PromptRegistryState model - single row whose version bumps on every prompt edit.
+    
+    Each worker caches the system prompts in memory and compares this
+    version to detect edits made through another worker.
+    """
+    
+    __tablename__ = "prompt_registry_state"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+    
+    def __repr__(self) -> str:
+        return f"<PromptRegistryState(version={self.version})>"
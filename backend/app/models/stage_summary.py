@@ -0,0 +1,35 @@
+"""
+AI Story Backend - Stage Summary Model
+"""
+from datetime import datetime
+from sqlalchemy import String, Text, DateTime, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class StageSummary(Base):
+    """StageSummary model - AI summary of a stage's content, used to compact prompt context.
+
+    Keyed by a hash of the summarized content (not by stage), so a summary is
+    generated once per distinct text and a changed stage simply misses.
+    """
+
+    __tablename__ = "stage_summaries"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "target_tokens", name="uq_stage_summary_hash_target"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    target_tokens: Mapped[int] = mapped_column(Integer, nullable=False)
+    stage_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    source_chars: Mapped[int] = mapped_column(Integer, nullable=False)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    model: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<StageSummary(stage={self.stage_type}, hash={self.content_hash[:12]})>"
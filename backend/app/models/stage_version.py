@@ -27,7 +27,7 @@ class StageVersion(Base):
     
     # Source info
     source: Mapped[str] = mapped_column(
-        String(20), default="manual"  # "manual" or "ai"
+        String(20), default="manual"  # "manual", "ai", "restore", "draft" or "partial"
     )
     ai_model: Mapped[str | None] = mapped_column(String(100), nullable=True)
     ai_params: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON
@@ -35,10 +35,13 @@ class StageVersion(Base):
     # Custom label for version
     label: Mapped[str | None] = mapped_column(String(100), nullable=True)
     
-    # Timestamp
+    # Timestamps (updated_at: last checkpoint of a streamed draft)
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, nullable=False
     )
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True
+    )
     
     # Relationships
     stage: Mapped["Stage"] = relationship("Stage", back_populates="versions")
@@ -4,6 +4,8 @@ from .project import (
     ProjectUpdate,
     ProjectResponse,
     ProjectListResponse,
+    StageProgress,
+    ProjectProgress,
 )
 from .stage import (
     StageUpdate,
@@ -16,9 +18,18 @@ from .ai import (
     AIGenerateRequest,
     AIGenerateResponse,
     AIStreamMessage,
+    PipelineRequest,
+    AIPreviewRequest,
+    AIPreviewResponse,
+    PromptSection,
+    CostEstimate,
+    GenerationJobResponse,
     AITestRequest,
     AITestResponse,
+    TelemetrySummaryItem,
+    TelemetrySummaryResponse,
 )
+from .search import SearchHit, SearchResponse
 from .settings import (
     AISettingsCreate,
     AISettingsUpdate,
@@ -31,6 +42,8 @@ __all__ = [
     "ProjectUpdate",
     "ProjectResponse",
     "ProjectListResponse",
+    "StageProgress",
+    "ProjectProgress",
     "StageUpdate",
     "StageResponse",
     "StageVersionResponse",
@@ -39,8 +52,18 @@ __all__ = [
     "AIGenerateRequest",
     "AIGenerateResponse",
     "AIStreamMessage",
+    "PipelineRequest",
+    "AIPreviewRequest",
+    "AIPreviewResponse",
+    "PromptSection",
+    "CostEstimate",
+    "GenerationJobResponse",
     "AITestRequest",
     "AITestResponse",
+    "TelemetrySummaryItem",
+    "TelemetrySummaryResponse",
+    "SearchHit",
+    "SearchResponse",
     "AISettingsCreate",
     "AISettingsUpdate",
     "AISettingsResponse",
@@ -1,10 +1,11 @@
 """
 AI Story Backend - AI Schemas
 """
-from typing import Optional, Dict, Any
+from datetime import datetime
+from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 
-from app.models.enums import StageType
+from app.models.enums import StageType, JobStatus
 
 
 class AIGenerateRequest(BaseModel):
@@ -17,6 +18,12 @@ class AIGenerateRequest(BaseModel):
     # Optional parameter overrides
     temperature: Optional[float] = Field(None, ge=0, le=2)
     max_tokens: Optional[int] = Field(None, ge=100, le=16000)
+    
+    # Skip the generation cache and always call the provider
+    bypass_cache: bool = False
+    
+    # Continue a "partial" version left by an interrupted stream (WebSocket only)
+    resume_version_id: Optional[int] = None
 
 
 class AIGenerateResponse(BaseModel):
@@ -25,6 +32,94 @@ class AIGenerateResponse(BaseModel):
     model: str
     tokens_used: Optional[int] = None
     stage_type: StageType
+    cached: bool = False
+
+
+class PipelineRequest(BaseModel):
+    """Schema for generating several stages in dependency order."""
+    project_id: int
+    stages: List[StageType] = Field(..., min_length=1)
+    settings_id: Optional[int] = None  # Use default if not provided
+    
+    # Also generate upstream stages that are still empty
+    include_missing_dependencies: bool = True
+    max_concurrency: Optional[int] = Field(None, ge=1, le=8)
+    
+    # Optional parameter overrides
+    temperature: Optional[float] = Field(None, ge=0, le=2)
+    max_tokens: Optional[int] = Field(None, ge=100, le=16000)
+    bypass_cache: bool = False
+
+
+class AIPreviewRequest(BaseModel):
+    """Schema for a prompt dry run (no provider call)."""
+    project_id: int
+    stage_type: StageType
+    settings_id: Optional[int] = None  # Use default if not provided
+    custom_prompt: Optional[str] = None
+    max_tokens: Optional[int] = Field(None, ge=100, le=16000)
+    
+    # Leave the rendered prompt out of the response (sizes only)
+    include_prompt: bool = True
+
+
+class PromptSection(BaseModel):
+    """Size of one part of a rendered prompt."""
+    name: str  # "template" (the fixed text) or a placeholder name
+    label: str
+    occurrences: int
+    provided: bool
+    chars: int
+    tokens: int
+
+
+class CostEstimate(BaseModel):
+    """Projected cost of a generation in USD."""
+    price_key: str  # Entry of app/config/model_prices.yaml that matched
+    context_window: Optional[int] = None
+    input_cost: float
+    output_cost: float  # Assuming the full output budget is used
+    total_cost: float
+
+
+class AIPreviewResponse(BaseModel):
+    """Schema for a prompt dry run."""
+    stage_type: StageType
+    model: Optional[str] = None
+    prompt: Optional[str] = None
+    prompt_chars: int
+    prompt_tokens: int  # Offline estimate
+    sections: List[PromptSection]
+    missing_placeholders: List[str]
+    max_output_tokens: Optional[int] = None
+    context_window: Optional[int] = None
+    fits_context: Optional[bool] = None
+    cost: Optional[CostEstimate] = None  # None when the model has no price entry
+    
+    # Stages generate_content would replace by summaries to fit the window
+    compact_sections: List[str] = []
+
+
+class GenerationJobResponse(BaseModel):
+    """Schema for a background generation job."""
+    id: int
+    project_id: int
+    stage_type: StageType
+    settings_id: Optional[int] = None
+    status: JobStatus
+    attempts: int
+    max_attempts: int
+    cancel_requested: bool
+    error: Optional[str] = None
+    model: Optional[str] = None
+    result_chars: Optional[int] = None
+    tokens_used: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
 
 
 class AIStreamMessage(BaseModel):
@@ -44,3 +139,27 @@ class AITestResponse(BaseModel):
     success: bool
     message: str
     model: Optional[str] = None
+
+
+class TelemetrySummaryItem(BaseModel):
+    """Latency and token spend for one model/stage pair."""
+    model: str
+    stage_type: str
+    kind: str = "generation"  # "generation", or "summary" for context summaries
+    count: int
+    errors: int
+    cancelled: int
+    latency_p50_ms: Optional[float] = None
+    latency_p95_ms: Optional[float] = None
+    ttft_p50_ms: Optional[float] = None
+    ttft_p95_ms: Optional[float] = None
+    avg_tokens_per_sec: Optional[float] = None
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+
+class TelemetrySummaryResponse(BaseModel):
+    """Schema for generation telemetry aggregates."""
+    days: int
+    items: List[TelemetrySummaryItem]
@@ -5,6 +5,8 @@ from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
+from app.models.enums import StageType, StageStatus
+
 
 class ProjectBase(BaseModel):
     """Base schema for Project."""
@@ -27,12 +29,28 @@ class ProjectUpdate(BaseModel):
     tags: Optional[List[str]] = None
 
 
+class StageProgress(BaseModel):
+    """Compact state of one stage, without its content."""
+    stage_type: StageType
+    status: StageStatus
+    chars: int  # Length of the content
+    last_ai_model: Optional[str] = None
+
+
+class ProjectProgress(BaseModel):
+    """Per-stage progress of a project, for dashboards."""
+    stages: List[StageProgress]
+    completed: int  # Stages marked completed
+    total_chars: int
+
+
 class ProjectResponse(ProjectBase):
     """Schema for project response."""
     id: int
     created_at: datetime
     updated_at: datetime
     is_deleted: bool = False
+    progress: Optional[ProjectProgress] = None  # Only when listing with include_progress
     
     class Config:
         from_attributes = True
@@ -45,3 +63,4 @@ class ProjectListResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None  # Pass as `cursor` to get the next page
@@ -0,0 +1,32 @@
+"""
+AI Story Backend - Search Schemas
+"""
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+from app.models.enums import StageType
+
+
+class SearchHit(BaseModel):
+    """One stage or stage version whose content matches the query."""
+    kind: Literal["stage", "version"]
+    project_id: int
+    project_name: str
+    stage_id: int
+    stage_type: StageType
+    version_id: Optional[int] = None
+    version_number: Optional[int] = None
+    source: Optional[str] = None  # Version source: manual, ai, restore, draft or partial
+    label: Optional[str] = None
+    snippet: str  # HTML-escaped excerpt with matches wrapped in <mark></mark>
+    score: float  # bm25 rank, lower is better (0 without the full-text index)
+    updated_at: datetime
+
+
+class SearchResponse(BaseModel):
+    """Schema for search results."""
+    query: str
+    items: List[SearchHit]
+    full_text: bool  # False when falling back to LIKE queries
+    took_ms: float
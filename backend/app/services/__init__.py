@@ -1,13 +1,28 @@
 """Services module initialization."""
 from .project_service import ProjectService
-from .prompt_service import PromptService
+from .prompt_service import PromptService, prompt_registry
+from .prompt_registry import PromptRegistry
 from .ai_service import AIService, SettingsService
 from .export_service import ExportService
+from .telemetry_service import TelemetryService
+from .summary_service import SummaryService
+from .pipeline_service import PipelineService
+from .search_service import SearchService
+from .job_service import JobService, JobWorkerPool, job_workers
 
 __all__ = [
     "ProjectService",
     "PromptService",
+    "PromptRegistry",
+    "prompt_registry",
     "AIService",
     "SettingsService",
     "ExportService",
+    "TelemetryService",
+    "SummaryService",
+    "PipelineService",
+    "SearchService",
+    "JobService",
+    "JobWorkerPool",
+    "job_workers",
 ]
@@ -1,23 +1,94 @@
 """
 AI Story Backend - AI Service
 """
+import asyncio
 import json
-from typing import Optional, AsyncGenerator
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 
+from app.db.session import AnySession, run_sync, split_session
+from app.db.write_queue import write_queue
 from app.models import AISettings, Stage, StageVersion, StageStatus, StageType
-from app.utils.ai_client import create_ai_client
-from app.services.prompt_service import PromptService
+from app.core.config import settings as app_settings
+from app.utils.resilience import ResilientAIClient, create_resilient_client
+from app.utils.ai_client import TokenUsage
+from app.utils.generation_cache import get_generation_cache, make_cache_key
+from app.utils.single_flight import generation_flights
+from app.utils.token_estimate import estimate_cost, estimate_tokens
+from app.services.prompt_service import PromptService, compile_template
+from app.services.summary_service import SummaryService
+from app.services.telemetry_service import GenerationTimer, TelemetryService
 from app.core.security import encrypt_api_key
+from app.core.credentials import credential_cache
+
+logger = logging.getLogger(__name__)
+
+# Appended to the prompt when continuing an interrupted (partial) generation
+RESUME_PROMPT_SUFFIX = (
+    "\n\n---\n以下是先前中斷的輸出內容，請從中斷處直接接續撰寫，"
+    "不要重複已有的內容：\n\n{partial}"
+)
+
+
+@dataclass(frozen=True)
+class StageRef:
+    """Identity of the stage being generated; usable without a session."""
+    id: int
+    project_id: int
+    stage_type: StageType
+
+
+def detach_settings(settings: AISettings) -> AISettings:
+    """A session-less copy of AI settings (column values only)."""
+    return AISettings(**{
+        column.key: getattr(settings, column.key) for column in AISettings.__table__.columns
+    })
+
+
+@dataclass
+class GenerationSnapshot:
+    """Everything a generation needs from the database, read in one short transaction."""
+    stage: StageRef
+    template: str
+    endpoints: List[AISettings]  # Detached; primary first, then failover
+    summaries: Dict[str, Optional[str]]  # Stage key -> cached summary (None: not yet made)
+    
+    @property
+    def settings(self) -> AISettings:
+        return self.endpoints[0]
+    
+    def create_client(self) -> ResilientAIClient:
+        return create_resilient_client(self.endpoints)
+
+
+@dataclass(frozen=True)
+class GenerationOutcome:
+    """Result of a blocking generation, shared by every caller of its flight."""
+    content: str
+    usage: Optional[TokenUsage] = None
+    cached: bool = False  # Served from the generation cache
+    model: Optional[str] = None  # Model that produced the content (after failover)
 
 
 class AIService:
-    """Service for AI generation."""
+    """Service for AI generation.
     
-    def __init__(self, db: Session):
-        self.db = db
+    Works with a Session or an AsyncSession. With an AsyncSession, use the
+    `a`-prefixed lookups; generation runs its database work through the
+    async driver so a slow commit does not stall other streams.
+    """
+    
+    def __init__(self, db: AnySession):
+        self.db, self.async_db = split_session(db)
         self.prompt_service = PromptService()
+        self.last_cached = False  # Whether the last generate_content hit the cache
+        self.last_usage: Optional[TokenUsage] = None  # Token usage of the last generation
+        self.last_model: Optional[str] = None  # Model that served the last generation
     
     def get_default_settings(self) -> Optional[AISettings]:
         """Get the default AI settings."""
@@ -43,6 +114,31 @@ class AIService:
         result = self.db.execute(stmt)
         return result.scalar_one_or_none()
     
+    async def aget_default_settings(self) -> Optional[AISettings]:
+        """Async version of get_default_settings."""
+        return await run_sync(self.async_db, self.get_default_settings)
+    
+    async def aget_settings(self, settings_id: int) -> Optional[AISettings]:
+        """Async version of get_settings."""
+        return await run_sync(self.async_db, self.get_settings, settings_id)
+    
+    def get_failover_settings(self, primary: AISettings) -> List[AISettings]:
+        """Other active settings to fail over to, default first."""
+        stmt = (
+            select(AISettings)
+            .where(AISettings.is_active == True)
+            .where(AISettings.id != primary.id)
+            .order_by(AISettings.is_default.desc(), AISettings.id)
+        )
+        return list(self.db.execute(stmt).scalars().all())
+    
+    def _create_client(self, settings: AISettings) -> ResilientAIClient:
+        """Create a resilient client for `settings` plus its failover endpoints."""
+        endpoints = [settings]
+        if app_settings.ai_failover_enabled:
+            endpoints += self.get_failover_settings(settings)
+        return create_resilient_client(endpoints)
+    
     async def generate_content(
         self,
         stage: Stage,
@@ -51,45 +147,268 @@ class AIService:
         custom_prompt: Optional[str] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        use_cache: bool = True,
     ) -> str:
-        """Generate content for a stage."""
-        # Build prompt
-        prompt = self.prompt_service.build_prompt(
-            stage.stage_type,
-            context,
-            self.db,
-            custom_prompt
+        """Generate content for a stage.
+        
+        Holds no database connection while waiting on the provider: a short
+        read snapshots what the generation needs (after which the caller's
+        transaction is ended), the provider is called without a session,
+        and the result is saved in a short transaction of its own.
+        """
+        snapshot = await self._snapshot(stage, context, settings, custom_prompt, max_tokens)
+        prompt = await self._render_prompt(snapshot, context)
+        settings = snapshot.settings
+        
+        cache_key = make_cache_key(
+            prompt,
+            model=settings.model,
+            temperature=temperature if temperature is not None else settings.temperature,
+            top_p=settings.top_p,
+            max_tokens=max_tokens if max_tokens is not None else settings.max_tokens,
+            base_url=settings.base_url,
+        )
+        
+        # Identical concurrent requests share one upstream call and version write;
+        # requests bypassing the cache only share with each other
+        key = f"{snapshot.stage.id}:{cache_key}" + ("" if use_cache else ":nocache")
+        outcome = await generation_flights.do(
+            key,
+            lambda: self._generate_and_save(
+                snapshot, prompt, cache_key, temperature, max_tokens, use_cache
+            ),
+            text=lambda outcome: outcome.content,
+        )
+        if isinstance(outcome, str):
+            # Joined a streaming generation of the same prompt
+            outcome = GenerationOutcome(outcome)
+        self.last_usage = outcome.usage
+        self.last_cached = outcome.cached
+        self.last_model = outcome.model or settings.model
+        return outcome.content
+    
+    async def _snapshot(
+        self,
+        stage: Stage,
+        context: dict,
+        settings: AISettings,
+        custom_prompt: Optional[str],
+        max_tokens: Optional[int],
+    ) -> GenerationSnapshot:
+        """Phase 1: read everything the generation needs, then end the caller's transaction."""
+        snapshot = await run_sync(
+            self.async_db, self._read_snapshot, stage, context, settings, custom_prompt, max_tokens
+        )
+        if self.async_db is not None:
+            await self.async_db.commit()
+        else:
+            self.db.commit()
+        return snapshot
+    
+    def _read_snapshot(
+        self,
+        stage: Stage,
+        context: dict,
+        settings: AISettings,
+        custom_prompt: Optional[str],
+        max_tokens: Optional[int],
+    ) -> GenerationSnapshot:
+        endpoints = [settings]
+        if app_settings.ai_failover_enabled:
+            endpoints += self.get_failover_settings(settings)
+        template = self.prompt_service.get_template(stage.stage_type, self.db, custom_prompt)
+        
+        # Plan context compaction and look up the summaries we already have
+        summaries: Dict[str, Optional[str]] = {}
+        if app_settings.context_compaction_enabled:
+            budget = self.prompt_service.context_budget(
+                settings.model, max_tokens if max_tokens is not None else settings.max_tokens
+            )
+            keys = self.prompt_service.plan_compaction(
+                template, context, budget, app_settings.context_summary_tokens
+            )
+            if keys:
+                logger.info(f"Compacting {keys} for {stage.stage_type.value} (budget {budget} tokens)")
+            cache = SummaryService(self.db)
+            for key in keys:
+                summaries[key] = cache.get_cached(context[key], app_settings.context_summary_tokens)
+        
+        return GenerationSnapshot(
+            stage=StageRef(stage.id, stage.project_id, stage.stage_type),
+            template=template,
+            endpoints=[detach_settings(s) for s in endpoints],
+            summaries=summaries,
         )
+    
+    async def _render_prompt(self, snapshot: GenerationSnapshot, context: dict) -> str:
+        """Phase 2 (no session): fill in missing summaries and render the prompt.
         
-        # Create client and generate
-        client = create_ai_client(settings)
+        A failed summary keeps the original text rather than failing the generation.
+        """
+        missing = [key for key, summary in snapshot.summaries.items() if summary is None]
+        if missing:
+            summaries = SummaryService(self.db)
+            results = await asyncio.gather(
+                *(
+                    summaries.generate(
+                        StageType(key), context[key], app_settings.context_summary_tokens,
+                        snapshot.create_client,
+                    )
+                    for key in missing
+                ),
+                return_exceptions=True,
+            )
+            for key, result in zip(missing, results):
+                if isinstance(result, BaseException):
+                    logger.warning(f"Summarizing {key} failed, using full text: {result}")
+                else:
+                    snapshot.summaries[key] = result
         
-        kwargs = {}
-        if temperature is not None:
-            kwargs["temperature"] = temperature
-        if max_tokens is not None:
-            kwargs["max_tokens"] = max_tokens
+        context = {
+            **context,
+            **{key: summary for key, summary in snapshot.summaries.items() if summary},
+        }
+        return compile_template(snapshot.template).render(context)
+    
+    async def _write(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Phase 3: run `fn(db, ...)` in a short write transaction of its own."""
+        return await write_queue.submit(fn, *args, **kwargs)
+    
+    def preview_prompt(
+        self,
+        stage_type: StageType,
+        context: dict,
+        settings: Optional[AISettings] = None,
+        custom_prompt: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> dict:
+        """Dry run: the prompt generate_content would send, with size and cost estimates.
+        
+        Works offline; token counts are estimates, not provider tokenizer output.
+        """
+        template = self.prompt_service.get_template(stage_type, self.db, custom_prompt)
+        prompt, missing, _ = self.prompt_service.render_report(template, context)
+        prompt_tokens = estimate_tokens(prompt)
+        
+        if max_tokens is None and settings:
+            max_tokens = settings.max_tokens
+        model = settings.model if settings else None
+        cost = estimate_cost(model, prompt_tokens, max_tokens or 0)
+        context_window = cost["context_window"] if cost else None
+        compact_sections = []
+        if settings and app_settings.context_compaction_enabled:
+            compact_sections = self.prompt_service.plan_compaction(
+                template,
+                context,
+                self.prompt_service.context_budget(model, max_tokens),
+                app_settings.context_summary_tokens,
+            )
+        
+        return {
+            "stage_type": stage_type,
+            "model": model,
+            "prompt": prompt,
+            "prompt_chars": len(prompt),
+            "prompt_tokens": prompt_tokens,
+            "sections": self.prompt_service.prompt_sections(template, context),
+            "missing_placeholders": sorted(missing),
+            "max_output_tokens": max_tokens,
+            "context_window": context_window,
+            "fits_context": (
+                prompt_tokens + (max_tokens or 0) <= context_window if context_window else None
+            ),
+            "cost": cost,
+            "compact_sections": compact_sections,
+        }
+    
+    async def _generate_and_save(
+        self,
+        snapshot: GenerationSnapshot,
+        prompt: str,
+        cache_key: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        use_cache: bool,
+    ) -> GenerationOutcome:
+        """Generate (or fetch from cache) and persist the result."""
+        settings = snapshot.settings
+        model = settings.model
+        timer = None
+        usage = None
+        
+        # Identical prompt + parameters can be served from the cache
+        cache = get_generation_cache() if use_cache else None
+        content = await cache.aget(cache_key) if cache else None
+        cached = content is not None
+        
+        if content is None:
+            # Create client (with retries/failover) and generate
+            client = snapshot.create_client()
+            
+            kwargs = {}
+            if temperature is not None:
+                kwargs["temperature"] = temperature
+            if max_tokens is not None:
+                kwargs["max_tokens"] = max_tokens
+            
+            timer = GenerationTimer()
+            try:
+                with timer.per_request():
+                    result = await client.generate(prompt, **kwargs)
+            except Exception as e:
+                await self._write(
+                    self._record_telemetry, snapshot.stage, client.served_by or settings,
+                    "blocking", timer, status="error", error=str(e),
+                )
+                raise
+            settings = client.served_by or settings
+            content = result.content
+            usage = result.usage
+            model = result.model or settings.model
+            
+            if cache:
+                await cache.aset(cache_key, content)
         
-        content = await client.generate(prompt, **kwargs)
+        await self._write(
+            self._save_generation, snapshot.stage, content, settings,
+            temperature, max_tokens, timer, usage,
+        )
+        return GenerationOutcome(content, usage, cached, model)
+    
+    def _save_generation(
+        self,
+        db: Session,
+        stage: StageRef,
+        content: str,
+        settings: AISettings,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        timer: Optional[GenerationTimer],
+        usage: Optional[TokenUsage],
+    ):
+        """Save the version, update the stage and unlock the next one."""
+        if timer is not None:
+            self._record_telemetry(
+                db, stage, settings, "blocking", timer, usage, len(content), commit=False
+            )
         
         # Save version
-        self._save_version(stage, content, settings)
+        self._save_version(db, stage, content, settings)
         
         # Update stage
-        stage.content = content
-        stage.status = StageStatus.IN_PROGRESS
-        stage.last_ai_model = settings.model
-        stage.last_ai_params = json.dumps({
+        row = db.get(Stage, stage.id)
+        row.content = content
+        row.status = StageStatus.IN_PROGRESS
+        row.last_ai_model = settings.model
+        row.last_ai_params = json.dumps({
             "temperature": temperature or settings.temperature,
             "max_tokens": max_tokens or settings.max_tokens
         })
         
         # Unlock next stage
-        self._unlock_next_stage(stage)
+        self._unlock_next_stage(db, stage)
         
-        self.db.commit()
-        
-        return content
+        db.commit()
     
     async def stream_generate(
         self,
@@ -97,34 +416,272 @@ class AIService:
         context: dict,
         settings: AISettings,
         custom_prompt: Optional[str] = None,
+        resume_from: Optional[str] = None,
     ) -> AsyncGenerator[str, None]:
-        """Generate content with streaming."""
-        # Build prompt
-        prompt = self.prompt_service.build_prompt(
-            stage.stage_type,
-            context,
-            self.db,
-            custom_prompt
-        )
+        """Generate content with streaming.
         
-        # Create client and stream
-        client = create_ai_client(settings)
+        With `resume_from` (the content of a partial version), the model is
+        asked to continue that text; the partial text is yielded first so the
+        stream (and the saved version) carries the complete content.
         
-        full_content = ""
-        async for token in client.stream_generate(prompt):
-            full_content += token
+        Like generate_content, no database connection is held while the
+        stream runs; checkpoints and the final save are short transactions.
+        """
+        snapshot = await self._snapshot(stage, context, settings, custom_prompt, None)
+        prompt = await self._render_prompt(snapshot, context)
+        if resume_from:
+            prompt += RESUME_PROMPT_SUFFIX.format(partial=resume_from)
+        settings = snapshot.settings
+        
+        cache_key = make_cache_key(
+            prompt,
+            model=settings.model,
+            temperature=settings.temperature,
+            top_p=settings.top_p,
+            max_tokens=settings.max_tokens,
+            base_url=settings.base_url,
+        )
+        
+        # Later identical requests subscribe to the same token stream
+        async for token in generation_flights.stream(
+            f"{snapshot.stage.id}:{cache_key}",
+            lambda: self._stream_and_save(snapshot, prompt, resume_from or ""),
+        ):
             yield token
+    
+    async def _stream_and_save(
+        self,
+        snapshot: GenerationSnapshot,
+        prompt: str,
+        prefix: str = "",
+    ) -> AsyncGenerator[str, None]:
+        """Stream from the provider, checkpointing drafts, and persist the result.
+        
+        The stream can outlive the request that started it (disconnects,
+        single-flight followers), so every write uses a session of its own.
+        """
+        stage = snapshot.stage
+        settings = snapshot.settings
+        # Create client (with retries/failover) and stream
+        client = snapshot.create_client()
+        
+        timer = GenerationTimer()
+        chunks: List[str] = [prefix] if prefix else []
+        generated_chars = 0
+        draft_id: Optional[int] = None
+        tokens_since_checkpoint = 0
+        last_checkpoint = time.monotonic()
+        try:
+            if prefix:
+                yield prefix
+            with timer.per_request():
+                async for token in client.stream_generate(prompt):
+                    timer.mark_first_token()
+                    chunks.append(token)
+                    generated_chars += len(token)
+                    tokens_since_checkpoint += 1
+                    yield token
+                    
+                    if (
+                        tokens_since_checkpoint >= app_settings.stream_checkpoint_tokens
+                        or time.monotonic() - last_checkpoint
+                        >= app_settings.stream_checkpoint_seconds
+                    ):
+                        with timer.paused():
+                            draft_id = await self._write(
+                                self._checkpoint, stage, draft_id, "".join(chunks),
+                                settings,
+                            )
+                        tokens_since_checkpoint = 0
+                        last_checkpoint = time.monotonic()
+        except Exception as e:
+            await self._write(
+                self._save_interrupted, stage, draft_id, chunks, generated_chars,
+                client.served_by or settings, timer, client.last_usage, "error", str(e),
+            )
+            raise
+        except BaseException:
+            # Closed or cancelled before the stream finished
+            await self._write(
+                self._save_interrupted, stage, draft_id, chunks, generated_chars,
+                client.served_by or settings, timer, client.last_usage, "cancelled",
+            )
+            raise
+        await self._write(
+            self._save_stream, stage, draft_id, "".join(chunks), generated_chars,
+            client.served_by or settings, timer, client.last_usage,
+        )
+    
+    def _save_stream(
+        self,
+        db: Session,
+        stage: StageRef,
+        draft_id: Optional[int],
+        full_content: str,
+        generated_chars: int,
+        settings: AISettings,
+        timer: GenerationTimer,
+        usage: Optional[TokenUsage],
+    ):
+        """Record telemetry and persist a completed stream."""
+        self._record_telemetry(
+            db, stage, settings, "stream", timer, usage, generated_chars, commit=False
+        )
+        
+        # Save after streaming completes (the last draft becomes the final version)
+        draft = db.get(StageVersion, draft_id) if draft_id is not None else None
+        if draft is not None:
+            self._update_version(draft, full_content, settings, source="ai")
+        else:
+            self._save_version(db, stage, full_content, settings)
+        row = db.get(Stage, stage.id)
+        row.content = full_content
+        row.status = StageStatus.IN_PROGRESS
+        row.last_ai_model = settings.model
+        
+        self._unlock_next_stage(db, stage)
+        db.commit()
+    
+    def _save_interrupted(
+        self,
+        db: Session,
+        stage: StageRef,
+        draft_id: Optional[int],
+        chunks: List[str],
+        generated_chars: int,
+        settings: AISettings,
+        timer: GenerationTimer,
+        usage: Optional[TokenUsage],
+        status: str,
+        error: Optional[str] = None,
+    ):
+        """Record telemetry and keep the output of a stream that failed or was cancelled."""
+        self._record_telemetry(
+            db, stage, settings, "stream", timer, usage,
+            generated_chars, status=status, error=error, commit=False,
+        )
+        self._save_partial(db, stage, draft_id, chunks, generated_chars, settings)
+    
+    def _checkpoint(
+        self,
+        db: Session,
+        stage: StageRef,
+        draft_id: Optional[int],
+        content: str,
+        settings: AISettings,
+    ) -> Optional[int]:
+        """Persist in-progress streamed content as a draft version; returns the draft's ID.
         
-        # Save after streaming completes
-        self._save_version(stage, full_content, settings)
-        stage.content = full_content
-        stage.status = StageStatus.IN_PROGRESS
-        stage.last_ai_model = settings.model
+        If the write fails, the previous draft's ID is returned so the next
+        checkpoint (or the final save) still updates that draft.
+        """
+        try:
+            draft = db.get(StageVersion, draft_id) if draft_id is not None else None
+            if draft is None:
+                draft = self._save_version(db, stage, content, settings, source="draft")
+            else:
+                self._update_version(draft, content, settings, source="draft")
+            db.commit()
+        except Exception as e:
+            # A failed checkpoint must not break the stream
+            logger.warning(f"Failed to checkpoint streamed content: {e}")
+            db.rollback()
+            return draft_id
+        return draft.id
+    
+    def _save_partial(
+        self,
+        db: Session,
+        stage: StageRef,
+        draft_id: Optional[int],
+        chunks: List[str],
+        generated_chars: int,
+        settings: AISettings,
+    ):
+        """Keep whatever an interrupted stream produced as a resumable version."""
+        try:
+            if generated_chars:
+                content = "".join(chunks)
+                draft = db.get(StageVersion, draft_id) if draft_id is not None else None
+                if draft is not None:
+                    self._update_version(draft, content, settings, source="partial")
+                else:
+                    self._save_version(db, stage, content, settings, source="partial")
+            db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to save partial content: {e}")
+            db.rollback()
+    
+    async def aget_partial_version(self, stage: Stage, version_id: int) -> Optional[StageVersion]:
+        """Async version of get_partial_version."""
+        return await run_sync(self.async_db, self.get_partial_version, stage, version_id)
+    
+    def get_partial_version(self, stage: Stage, version_id: int) -> Optional[StageVersion]:
+        """Get a resumable (partial) version of a stage."""
+        stmt = (
+            select(StageVersion)
+            .where(StageVersion.id == version_id)
+            .where(StageVersion.stage_id == stage.id)
+            .where(StageVersion.source == "partial")
+        )
+        return self.db.execute(stmt).scalar_one_or_none()
+    
+    def finalize_stale_drafts(self) -> int:
+        """Mark drafts left behind by an interrupted process as partial versions.
         
-        self._unlock_next_stage(stage)
+        Only drafts whose last checkpoint is older than stale_draft_seconds:
+        newer ones may still be streaming in another worker process.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=app_settings.stale_draft_seconds)
+        result = self.db.execute(
+            update(StageVersion)
+            .where(StageVersion.source == "draft")
+            .where(func.coalesce(StageVersion.updated_at, StageVersion.created_at) < cutoff)
+            .values(source="partial")
+        )
         self.db.commit()
+        return result.rowcount
     
-    def _save_version(self, stage: Stage, content: str, settings: AISettings):
+    def _record_telemetry(
+        self,
+        db: Session,
+        stage: StageRef,
+        settings: AISettings,
+        mode: str,
+        timer: GenerationTimer,
+        usage: Optional[TokenUsage] = None,
+        output_chars: int = 0,
+        status: str = "success",
+        error: Optional[str] = None,
+        commit: bool = True,
+    ):
+        """Record latency and token usage; never fails the generation."""
+        try:
+            TelemetryService(db).record(
+                project_id=stage.project_id,
+                stage_type=stage.stage_type,
+                settings=settings,
+                mode=mode,
+                timer=timer,
+                usage=usage,
+                output_chars=output_chars,
+                status=status,
+                error=error,
+                commit=commit,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record generation telemetry: {e}")
+            if commit:
+                db.rollback()
+    
+    def _save_version(
+        self,
+        db: Session,
+        stage: StageRef,
+        content: str,
+        settings: AISettings,
+        source: str = "ai",
+    ) -> StageVersion:
         """Save a new version of the stage content."""
         # Get next version number
         stmt = (
@@ -133,7 +690,7 @@ class AIService:
             .order_by(StageVersion.version_number.desc())
             .limit(1)
         )
-        result = self.db.execute(stmt)
+        result = db.execute(stmt)
         last_version = result.scalar_one_or_none()
         next_version = (last_version.version_number + 1) if last_version else 1
         
@@ -141,35 +698,45 @@ class AIService:
             stage_id=stage.id,
             version_number=next_version,
             content=content,
-            source="ai",
+            source=source,
             ai_model=settings.model,
             ai_params=json.dumps({
                 "temperature": settings.temperature,
                 "max_tokens": settings.max_tokens
             })
         )
-        self.db.add(version)
+        db.add(version)
+        return version
+    
+    def _update_version(
+        self,
+        version: StageVersion,
+        content: str,
+        settings: AISettings,
+        source: str,
+    ):
+        """Overwrite a draft version in place."""
+        version.content = content
+        version.source = source
+        version.ai_model = settings.model
     
-    def _unlock_next_stage(self, stage: Stage):
-        """Unlock the next stage if current stage has content."""
+    def _unlock_next_stage(self, db: Session, stage: StageRef):
+        """Unlock the next stage if it is still locked.
+        
+        One conditional UPDATE: stages of a pipeline finish concurrently, and
+        a read-then-write could overwrite a sibling already in progress.
+        """
         from app.models.enums import STAGE_ORDER
         
-        try:
-            current_index = STAGE_ORDER.index(stage.stage_type)
-            if current_index < len(STAGE_ORDER) - 1:
-                next_type = STAGE_ORDER[current_index + 1]
-                # Find next stage
-                stmt = (
-                    select(Stage)
-                    .where(Stage.project_id == stage.project_id)
-                    .where(Stage.stage_type == next_type)
-                )
-                result = self.db.execute(stmt)
-                next_stage = result.scalar_one_or_none()
-                if next_stage and next_stage.status == StageStatus.LOCKED:
-                    next_stage.status = StageStatus.UNLOCKED
-        except ValueError:
-            pass
+        current_index = STAGE_ORDER.index(stage.stage_type)
+        if current_index < len(STAGE_ORDER) - 1:
+            db.execute(
+                update(Stage)
+                .where(Stage.project_id == stage.project_id)
+                .where(Stage.stage_type == STAGE_ORDER[current_index + 1])
+                .where(Stage.status == StageStatus.LOCKED)
+                .values(status=StageStatus.UNLOCKED)
+            )
 
 
 class SettingsService:
@@ -219,6 +786,7 @@ class SettingsService:
         
         self.db.commit()
         self.db.refresh(settings)
+        credential_cache.invalidate(settings.id)
         return settings
     
     def delete_settings(self, settings_id: int) -> bool:
@@ -232,6 +800,7 @@ class SettingsService:
         
         self.db.delete(settings)
         self.db.commit()
+        credential_cache.invalidate(settings_id)
         return True
     
     def _unset_other_defaults(self, exclude_id: Optional[int] = None):
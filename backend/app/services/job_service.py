@@ -0,0 +1,395 @@
+"""
+AI Story Backend - Background Generation Jobs
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings as app_settings
+from app.db.base import AsyncSessionLocal
+from app.models import GenerationJob, JobStatus, StageType
+from app.services.ai_service import AIService
+from app.services.project_service import ProjectService
+from app.utils.ai_client import AIClientError
+
+logger = logging.getLogger(__name__)
+
+# Job parameters forwarded to AIService.generate_content
+JOB_PARAM_KEYS = ("custom_prompt", "temperature", "max_tokens", "bypass_cache")
+
+
+class JobService:
+    """Service for creating and inspecting generation jobs."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_job(
+        self,
+        project_id: int,
+        stage_type: StageType,
+        settings_id: Optional[int] = None,
+        params: Optional[dict] = None,
+    ) -> GenerationJob:
+        """Queue a new generation job."""
+        job = GenerationJob(
+            project_id=project_id,
+            stage_type=stage_type,
+            settings_id=settings_id,
+            params=json.dumps(
+                {k: v for k, v in (params or {}).items() if k in JOB_PARAM_KEYS},
+                ensure_ascii=False,
+            ),
+            status=JobStatus.QUEUED,
+            max_attempts=app_settings.job_max_attempts,
+        )
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+
+    def get_job(self, job_id: int) -> Optional[GenerationJob]:
+        """Get a job by ID."""
+        return self.db.get(GenerationJob, job_id)
+
+    def cancel_job(self, job_id: int) -> Optional[GenerationJob]:
+        """Cancel a queued job, or flag a running one for cancellation."""
+        job = self.get_job(job_id)
+        if not job:
+            return None
+        if job.status == JobStatus.QUEUED:
+            job.status = JobStatus.CANCELLED
+            job.finished_at = datetime.utcnow()
+        elif job.status == JobStatus.RUNNING:
+            job.cancel_requested = True
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+
+    def claim_next(self, worker_id: str) -> Optional[GenerationJob]:
+        """Atomically move the oldest due queued job to running, owned by `worker_id`."""
+        now = datetime.utcnow()
+        stmt = (
+            select(GenerationJob.id)
+            .where(GenerationJob.status == JobStatus.QUEUED)
+            .where(GenerationJob.run_after <= now)
+            .order_by(GenerationJob.run_after, GenerationJob.id)
+            .limit(5)
+        )
+        for job_id in self.db.execute(stmt).scalars().all():
+            # Conditional update: only one worker can win each job
+            result = self.db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id)
+                .where(GenerationJob.status == JobStatus.QUEUED)
+                .values(
+                    status=JobStatus.RUNNING,
+                    attempts=GenerationJob.attempts + 1,
+                    started_at=now,
+                    worker_id=worker_id,
+                    heartbeat_at=now,
+                )
+            )
+            self.db.commit()
+            if result.rowcount == 1:
+                return self.get_job(job_id)
+        return None
+
+    def heartbeat(self, job_id: int, worker_id: str) -> Optional[bool]:
+        """Record that `worker_id` is still running the job.
+        
+        Returns whether cancellation was requested, or None when the job is
+        no longer this worker's (it was re-queued as stale meanwhile).
+        """
+        result = self.db.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == job_id)
+            .where(GenerationJob.status == JobStatus.RUNNING)
+            .where(GenerationJob.worker_id == worker_id)
+            .values(heartbeat_at=datetime.utcnow())
+        )
+        self.db.commit()
+        if result.rowcount != 1:
+            return None
+        stmt = select(GenerationJob.cancel_requested).where(GenerationJob.id == job_id)
+        return bool(self.db.execute(stmt).scalar())
+
+    def requeue_interrupted(self, stale_after: float) -> int:
+        """Put running jobs whose worker went silent back in the queue.
+        
+        Only jobs without a heartbeat for `stale_after` seconds: the others
+        are still running in a live process (this one or another).
+        """
+        now = datetime.utcnow()
+        result = self.db.execute(
+            update(GenerationJob)
+            .where(GenerationJob.status == JobStatus.RUNNING)
+            .where(
+                (GenerationJob.heartbeat_at == None)  # noqa: E711
+                | (GenerationJob.heartbeat_at < now - timedelta(seconds=stale_after))
+            )
+            .values(status=JobStatus.QUEUED, run_after=now, worker_id=None)
+        )
+        self.db.commit()
+        return result.rowcount
+
+
+class JobWorkerPool:
+    """Asyncio workers that claim queued jobs from the database and run them.
+
+    Jobs survive restarts: anything still queued is picked up again. Each
+    pool has its own `worker_id` and heartbeats the jobs it runs; running
+    jobs whose heartbeat is older than `stale_after` seconds (their process
+    died) are re-queued, at startup and periodically, so several processes
+    can share the queue without running a job twice. Attempts that fail
+    with a transient provider error are retried with exponential backoff
+    until `max_attempts`; other errors fail the job at once. Database work
+    goes through async sessions, so polling and bookkeeping never block the
+    event loop.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        poll_interval: float,
+        retry_base_delay: float,
+        stale_after: float = 60.0,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.retry_base_delay = retry_base_delay
+        self.stale_after = stale_after
+        self.session_factory = session_factory
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[int, asyncio.Task] = {}
+        self._cancelled: Set[int] = set()
+        self._wake = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def running_jobs(self) -> List[int]:
+        return list(self._running)
+
+    async def start(self):
+        """Re-queue interrupted jobs and start the workers."""
+        if self._workers or self.concurrency <= 0:
+            return
+        await self.requeue_stale()
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.concurrency)
+        ]
+        self._workers.append(asyncio.create_task(self._reaper()))
+        self._wake.set()
+
+    async def requeue_stale(self) -> int:
+        """Re-queue running jobs whose worker stopped sending heartbeats."""
+        async with self.session_factory() as db:
+            requeued = await db.run_sync(
+                lambda session: JobService(session).requeue_interrupted(self.stale_after)
+            )
+        if requeued:
+            logger.info(f"Re-queued {requeued} interrupted generation jobs")
+            self._wake.set()
+        return requeued
+
+    async def stop(self):
+        """Stop the workers; running jobs go back to the queue for the next start."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def notify(self):
+        """Wake idle workers (a job was just queued). Safe to call from any thread."""
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job running in this process. Safe to call from any thread."""
+        task = self._running.get(job_id)
+        if task is None or self._loop is None:
+            return False
+        self._cancelled.add(job_id)
+        self._loop.call_soon_threadsafe(task.cancel)
+        return True
+
+    async def _reaper(self):
+        while True:
+            await asyncio.sleep(self.stale_after / 2)
+            try:
+                await self.requeue_stale()
+            except Exception as e:
+                logger.warning(f"Failed to re-queue stale jobs: {e}")
+
+    async def _worker(self, index: int):
+        while True:
+            db = self.session_factory()
+            try:
+                job = await db.run_sync(
+                    lambda session: JobService(session).claim_next(self.worker_id)
+                )
+                if job is None:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                # More work may be waiting; let another idle worker look too
+                self._wake.set()
+                await self._run_job(db, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Job worker {index} error: {e}")
+                await asyncio.sleep(self.poll_interval)
+            finally:
+                await db.close()
+
+    async def _run_job(self, db: AsyncSession, job: GenerationJob):
+        job_id = job.id
+        logger.info(f"Running generation job {job_id} (attempt {job.attempts})")
+        task = asyncio.create_task(self._generate(db, job))
+        self._running[job_id] = task
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.poll_interval)
+                # Shielded: a write cut off mid-commit would leave the database locked
+                if not task.done() and await asyncio.shield(self._heartbeat(job_id)):
+                    # Cancelled through the API of another process
+                    self._cancelled.add(job_id)
+                    task.cancel()
+            result = task.result()
+        except asyncio.CancelledError:
+            # Stop the generation (already over when the job itself was cancelled)
+            # before the session it uses is touched
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await db.rollback()
+            if job_id in self._cancelled:
+                await db.run_sync(self._finish, job_id, JobStatus.CANCELLED, error="Cancelled")
+                return
+            # Worker shutdown: leave the job for the next start
+            try:
+                await db.run_sync(self._requeue, job_id, attempts_used=False)
+            except Exception as e:
+                # Its heartbeat stops, so it is re-queued as stale later
+                logger.warning(f"Failed to re-queue job {job_id} on shutdown: {e}")
+            raise
+        except Exception as e:
+            await db.rollback()
+            job = await db.get(GenerationJob, job_id, populate_existing=True)
+            # Only provider errors that may pass (timeouts, 429, 5xx) are retried;
+            # a 4xx, bad settings or a missing stage would fail again
+            retryable = isinstance(e, AIClientError) and e.retryable
+            if job.cancel_requested:
+                await db.run_sync(self._finish, job_id, JobStatus.CANCELLED, error="Cancelled")
+            elif retryable and job.attempts < job.max_attempts:
+                delay = random.uniform(0, self.retry_base_delay * (2 ** (job.attempts - 1)))
+                logger.warning(f"Job {job_id} failed ({e}); retrying in {delay:.1f}s")
+                await db.run_sync(self._requeue, job_id, error=str(e), delay=delay)
+            else:
+                logger.error(f"Job {job_id} failed after {job.attempts} attempt(s): {e}")
+                await db.run_sync(self._finish, job_id, JobStatus.FAILED, error=str(e))
+            return
+        finally:
+            self._running.pop(job_id, None)
+            self._cancelled.discard(job_id)
+        await db.run_sync(self._finish, job_id, JobStatus.SUCCEEDED, **result)
+
+    async def _heartbeat(self, job_id: int) -> bool:
+        """Heartbeat a running job; returns whether it was cancelled through the API."""
+        async with self.session_factory() as db:
+            cancel = await db.run_sync(
+                lambda session: JobService(session).heartbeat(job_id, self.worker_id)
+            )
+        if cancel is None:
+            logger.warning(f"Job {job_id} was re-queued by another worker")
+        return bool(cancel)
+
+    async def _generate(self, db: AsyncSession, job: GenerationJob) -> dict:
+        """Run one job through AIService.generate_content."""
+        params = json.loads(job.params or "{}")
+        project_service = ProjectService(db)
+        ai_service = AIService(db)
+
+        stage = await project_service.aget_stage(job.project_id, job.stage_type)
+        if not stage:
+            raise ValueError("Stage not found")
+        if job.settings_id:
+            settings = await ai_service.aget_settings(job.settings_id)
+        else:
+            settings = await ai_service.aget_default_settings()
+        if not settings:
+            raise ValueError("No AI settings configured")
+
+        context = await project_service.aget_stage_context(
+            job.project_id, job.stage_type, params.get("custom_prompt")
+        )
+        content = await ai_service.generate_content(
+            stage=stage,
+            context=context,
+            settings=settings,
+            custom_prompt=params.get("custom_prompt"),
+            temperature=params.get("temperature"),
+            max_tokens=params.get("max_tokens"),
+            use_cache=not params.get("bypass_cache", False),
+        )
+        return {
+            "model": ai_service.last_model,
+            "result_chars": len(content),
+            "tokens_used": ai_service.last_usage.total_tokens if ai_service.last_usage else None,
+        }
+
+    def _finish(self, db: Session, job_id: int, status: JobStatus, error: Optional[str] = None, **result):
+        job = db.get(GenerationJob, job_id)
+        if job.worker_id != self.worker_id:
+            return  # Re-queued as stale and claimed by another worker meanwhile
+        job.status = status
+        job.error = error[:1000] if error else None
+        job.finished_at = datetime.utcnow()
+        for key, value in result.items():
+            setattr(job, key, value)
+        db.commit()
+
+    def _requeue(
+        self,
+        db: Session,
+        job_id: int,
+        error: Optional[str] = None,
+        delay: float = 0.0,
+        attempts_used: bool = True,
+    ):
+        job = db.get(GenerationJob, job_id)
+        if job.worker_id != self.worker_id:
+            return
+        job.status = JobStatus.QUEUED
+        job.worker_id = None
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+        if error:
+            job.error = error[:1000]
+        if not attempts_used:
+            job.attempts = max(0, job.attempts - 1)
+        db.commit()
+
+
+job_workers = JobWorkerPool(
+    concurrency=app_settings.job_worker_count,
+    poll_interval=app_settings.job_poll_interval_seconds,
+    retry_base_delay=app_settings.job_retry_base_delay,
+    stale_after=app_settings.job_stale_after_seconds,
+)
@@ -0,0 +1,238 @@
+"""
+AI Story Backend - Multi-Stage Generation Pipeline
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncGenerator, Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings as app_settings
+from app.db.base import AsyncSessionLocal
+from app.db.session import AnySession, run_sync, split_session
+from app.models import Stage, StageType, STAGE_ORDER
+from app.models.enums import STAGE_DEPENDENCIES
+from app.services.ai_service import AIService
+from app.services.project_service import ProjectService
+
+logger = logging.getLogger(__name__)
+
+
+def plan_layers(stage_types: Iterable[StageType]) -> List[List[StageType]]:
+    """Group stages into layers whose members only depend on earlier layers."""
+    remaining = set(stage_types)
+    done: Set[StageType] = set()
+    layers = []
+    while remaining:
+        layer = [
+            s for s in STAGE_ORDER
+            if s in remaining and all(
+                dep in done or dep not in remaining for dep in STAGE_DEPENDENCIES[s]
+            )
+        ]
+        layers.append(layer)
+        done.update(layer)
+        remaining.difference_update(layer)
+    return layers
+
+
+class PipelineService:
+    """Generate several stages of a project, running independent stages concurrently.
+
+    A stage starts as soon as every stage it depends on (per
+    STAGE_DEPENDENCIES) has finished, with at most `max_concurrency`
+    generations in flight. Each stage runs in its own async DB session and
+    commits its StageVersion as soon as it completes.
+
+    Works with a Session or an AsyncSession; with an AsyncSession, use
+    `aresolve_stages`.
+    """
+
+    def __init__(
+        self,
+        db: AnySession,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
+        self.db, self.async_db = split_session(db)
+        self.session_factory = session_factory
+
+    def resolve_stages(
+        self,
+        project_id: int,
+        targets: Iterable[StageType],
+        include_missing_dependencies: bool = True,
+    ) -> List[StageType]:
+        """Targets plus, optionally, any upstream stage that has no content yet."""
+        stmt = select(Stage.stage_type, Stage.content).where(Stage.project_id == project_id)
+        has_content = {row.stage_type: bool(row.content) for row in self.db.execute(stmt)}
+
+        selected: Set[StageType] = set()
+        pending = list(targets)
+        while pending:
+            stage_type = pending.pop()
+            if stage_type in selected:
+                continue
+            selected.add(stage_type)
+            if include_missing_dependencies:
+                pending.extend(
+                    dep for dep in STAGE_DEPENDENCIES[stage_type] if not has_content.get(dep)
+                )
+        return [s for s in STAGE_ORDER if s in selected]
+
+    async def aresolve_stages(
+        self,
+        project_id: int,
+        targets: Iterable[StageType],
+        include_missing_dependencies: bool = True,
+    ) -> List[StageType]:
+        """Async version of resolve_stages."""
+        return await run_sync(
+            self.async_db, self.resolve_stages, project_id, targets, include_missing_dependencies
+        )
+
+    async def run(
+        self,
+        project_id: int,
+        stage_types: List[StageType],
+        settings_id: int,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        use_cache: bool = True,
+        max_concurrency: Optional[int] = None,
+    ) -> AsyncGenerator[dict, None]:
+        """Run the pipeline, yielding progress events as dicts."""
+        selected = set(stage_types)
+        waiting_on: Dict[StageType, Set[StageType]] = {
+            s: {dep for dep in STAGE_DEPENDENCIES[s] if dep in selected} for s in stage_types
+        }
+        semaphore = asyncio.Semaphore(max_concurrency or app_settings.pipeline_max_concurrency)
+        events: asyncio.Queue = asyncio.Queue()
+        tasks: Dict[StageType, asyncio.Task] = {}
+        failed: Set[StageType] = set()
+        skipped: Set[StageType] = set()
+        completed: Set[StageType] = set()
+        started = time.perf_counter()
+
+        async def run_stage(stage_type: StageType):
+            async with semaphore:
+                await events.put({"type": "stage_started", "stage_type": stage_type.value})
+                stage_started = time.perf_counter()
+                try:
+                    result = await self._generate_stage(
+                        project_id, stage_type, settings_id, temperature, max_tokens, use_cache
+                    )
+                except Exception as e:
+                    logger.warning(f"Pipeline stage {stage_type.value} failed: {e}")
+                    return {"type": "stage_failed", "stage_type": stage_type.value, "error": str(e)}
+                return {
+                    "type": "stage_completed",
+                    "stage_type": stage_type.value,
+                    "duration_ms": round((time.perf_counter() - stage_started) * 1000, 2),
+                    **result,
+                }
+
+        def start_ready():
+            for stage_type in stage_types:
+                if stage_type in tasks or stage_type in failed:
+                    continue
+                if not waiting_on[stage_type]:
+                    task = asyncio.create_task(run_stage(stage_type))
+                    task.add_done_callback(lambda t, s=stage_type: events.put_nowait((s, t)))
+                    tasks[stage_type] = task
+
+        yield {
+            "type": "plan",
+            "layers": [[s.value for s in layer] for layer in plan_layers(stage_types)],
+        }
+        try:
+            start_ready()
+            finished = 0
+            while finished < len(tasks):
+                item = await events.get()
+                if isinstance(item, dict):
+                    yield item
+                    continue
+                stage_type, task = item
+                finished += 1
+                event = task.result()
+                yield event
+                if event["type"] == "stage_completed":
+                    completed.add(stage_type)
+                    for deps in waiting_on.values():
+                        deps.discard(stage_type)
+                else:
+                    for dependent in self._dependents(stage_type, stage_types, failed):
+                        failed.add(dependent)
+                        skipped.add(dependent)
+                        yield {
+                            "type": "stage_skipped",
+                            "stage_type": dependent.value,
+                            "reason": f"depends on failed stage {stage_type.value}",
+                        }
+                    failed.add(stage_type)
+                start_ready()
+        finally:
+            # Stop anything still generating (e.g. the client went away)
+            for task in tasks.values():
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        yield {
+            "type": "done",
+            "completed": [s.value for s in stage_types if s in completed],
+            "failed": [s.value for s in stage_types if s in failed and s not in skipped],
+            "skipped": [s.value for s in stage_types if s in skipped],
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    @staticmethod
+    def _dependents(
+        stage_type: StageType, stage_types: List[StageType], exclude: Set[StageType]
+    ) -> List[StageType]:
+        """Selected stages that (transitively) depend on `stage_type`."""
+        blocked = {stage_type}
+        dependents = []
+        for candidate in stage_types:
+            if candidate in exclude or candidate in blocked:
+                continue
+            if any(dep in blocked for dep in STAGE_DEPENDENCIES[candidate]):
+                blocked.add(candidate)
+                dependents.append(candidate)
+        return dependents
+
+    async def _generate_stage(
+        self,
+        project_id: int,
+        stage_type: StageType,
+        settings_id: int,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        use_cache: bool,
+    ) -> dict:
+        """Generate and commit one stage in a dedicated session."""
+        async with self.session_factory() as db:
+            project_service = ProjectService(db)
+            ai_service = AIService(db)
+            stage = await project_service.aget_stage(project_id, stage_type)
+            settings = await ai_service.aget_settings(settings_id)
+            if not stage or not settings:
+                raise ValueError("Stage or AI settings not found")
+
+            context = await project_service.aget_stage_context(project_id, stage_type)
+            content = await ai_service.generate_content(
+                stage=stage,
+                context=context,
+                settings=settings,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                use_cache=use_cache,
+            )
+            return {
+                "model": ai_service.last_model,
+                "chars": len(content),
+                "tokens_used": ai_service.last_usage.total_tokens if ai_service.last_usage else None,
+                "cached": ai_service.last_cached,
+            }
@@ -1,21 +1,70 @@
 """
 AI Story Backend - Project Service
 """
+import base64
 import json
+import time
 from datetime import datetime
-from typing import Optional, List, Tuple
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import select, func
+from typing import Dict, Optional, List, Tuple
+from sqlalchemy.orm import joinedload
+from sqlalchemy import select, func, tuple_
 
-from app.models import Project, Stage, StageType, StageStatus, STAGE_ORDER
-from app.schemas import ProjectCreate, ProjectUpdate
+from app.core.config import settings
+from app.db.fts import PROJECTS_FTS, fts_query, search_index
+from app.db.session import AnySession, run_sync, split_session
+from app.models import Project, Stage, StageType, StageStatus, STAGE_ORDER, STAGE_DEPENDENCIES
+from app.schemas import ProjectCreate, ProjectUpdate, ProjectProgress, StageProgress
+from app.services.prompt_service import PromptService, template_placeholders
+
+
+# Recent project counts per search string: (monotonic time, total)
+_cached_totals: Dict[Optional[str], Tuple[float, int]] = {}
+
+
+def encode_cursor(project: Project) -> str:
+    """Opaque keyset cursor pointing just after `project` in the listing order."""
+    raw = json.dumps([project.updated_at.isoformat(), project.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(updated_at, id) of a cursor from encode_cursor; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, project_id = json.loads(raw)
+        return datetime.fromisoformat(updated_at), int(project_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 
 class ProjectService:
-    """Service for managing projects."""
+    """Service for managing projects.
+    
+    Works with a Session or an AsyncSession; with an AsyncSession, use the
+    `a`-prefixed async methods so queries go through the async driver.
+    """
+    
+    def __init__(self, db: AnySession):
+        self.db, self.async_db = split_session(db)
+    
+    async def aget_project(self, project_id: int) -> Optional[Project]:
+        """Async version of get_project."""
+        return await run_sync(self.async_db, self.get_project, project_id)
     
-    def __init__(self, db: Session):
-        self.db = db
+    async def aget_stage(self, project_id: int, stage_type: StageType) -> Optional[Stage]:
+        """Async version of get_stage."""
+        return await run_sync(self.async_db, self.get_stage, project_id, stage_type)
+    
+    async def aget_stage_context(
+        self,
+        project_id: int,
+        stage_type: StageType,
+        custom_prompt: Optional[str] = None
+    ) -> dict:
+        """Async version of get_stage_context."""
+        return await run_sync(
+            self.async_db, self.get_stage_context, project_id, stage_type, custom_prompt
+        )
     
     def create_project(self, data: ProjectCreate) -> Project:
         """Create a new project with all 8 stages initialized."""
@@ -41,6 +90,7 @@ class ProjectService:
             self.db.add(stage)
         
         self.db.commit()
+        _cached_totals.clear()
         self.db.refresh(project)
         return project
     
@@ -59,29 +109,95 @@ class ProjectService:
         self, 
         page: int = 1, 
         page_size: int = 20,
-        search: Optional[str] = None
-    ) -> Tuple[List[Project], int]:
-        """List projects with pagination."""
+        search: Optional[str] = None,
+        cursor: Optional[str] = None,
+        cached_total: bool = False,
+    ) -> Tuple[List[Project], int, Optional[str]]:
+        """List projects, most recently updated first.
+        
+        Pages by keyset when given a `cursor` (the next_cursor of the previous
+        page), otherwise by `page` offset. Returns the page, the total and the
+        cursor of the next page (None on the last one). With `cached_total`,
+        a count up to project_count_cache_seconds old is reused.
+        """
         query = select(Project).where(Project.is_deleted == False)
         
         if search:
+            query = query.where(self._search_filter(search))
+        
+        total = self._count(query, search, cached_total)
+        
+        # Keyset pagination walks the (updated_at, id) index instead of skipping rows
+        query = query.order_by(Project.updated_at.desc(), Project.id.desc())
+        if cursor:
+            updated_at, project_id = decode_cursor(cursor)
             query = query.where(
-                Project.name.ilike(f"%{search}%") |
-                Project.description.ilike(f"%{search}%")
+                tuple_(Project.updated_at, Project.id) < tuple_(updated_at, project_id)
             )
+        else:
+            query = query.offset((page - 1) * page_size)
         
-        # Get total count
-        count_query = select(func.count()).select_from(query.subquery())
-        total = self.db.execute(count_query).scalar() or 0
+        result = self.db.execute(query.limit(page_size + 1))
+        projects = list(result.scalars().all())
+        next_cursor = encode_cursor(projects[page_size - 1]) if len(projects) > page_size else None
         
-        # Apply pagination
-        query = query.order_by(Project.updated_at.desc())
-        query = query.offset((page - 1) * page_size).limit(page_size)
+        return projects[:page_size], total, next_cursor
+    
+    def get_stage_progress(self, project_ids: List[int]) -> Dict[int, ProjectProgress]:
+        """Per-stage status, content length and last AI model of each project.
         
-        result = self.db.execute(query)
-        projects = list(result.scalars().all())
+        One query over the stage rows of all the projects; content itself is
+        never loaded, only its length.
+        """
+        if not project_ids:
+            return {}
+        stmt = (
+            select(
+                Stage.project_id,
+                Stage.stage_type,
+                Stage.status,
+                func.coalesce(func.length(Stage.content), 0),
+                Stage.last_ai_model,
+            )
+            .where(Stage.project_id.in_(project_ids))
+        )
+        stages: Dict[int, List[StageProgress]] = {project_id: [] for project_id in project_ids}
+        for project_id, stage_type, status, chars, last_ai_model in self.db.execute(stmt):
+            stages[project_id].append(StageProgress(
+                stage_type=stage_type, status=status, chars=chars, last_ai_model=last_ai_model
+            ))
         
-        return projects, total
+        order = {stage_type: i for i, stage_type in enumerate(STAGE_ORDER)}
+        return {
+            project_id: ProjectProgress(
+                stages=sorted(items, key=lambda item: order[item.stage_type]),
+                completed=sum(item.status == StageStatus.COMPLETED for item in items),
+                total_chars=sum(item.chars for item in items),
+            )
+            for project_id, items in stages.items()
+        }
+    
+    def _search_filter(self, search: str):
+        """Match name/description through the FTS5 index, or LIKE without one."""
+        match = fts_query(search) if search_index.available else None
+        if match:
+            return Project.id.in_(PROJECTS_FTS.match_ids(match))
+        return (
+            Project.name.ilike(f"%{search}%") |
+            Project.description.ilike(f"%{search}%")
+        )
+    
+    def _count(self, query, search: Optional[str], cached: bool) -> int:
+        if cached:
+            entry = _cached_totals.get(search)
+            if entry and time.monotonic() - entry[0] < settings.project_count_cache_seconds:
+                return entry[1]
+        count_query = select(func.count()).select_from(query.subquery())
+        total = self.db.execute(count_query).scalar() or 0
+        if len(_cached_totals) >= 256:
+            _cached_totals.clear()
+        _cached_totals[search] = (time.monotonic(), total)
+        return total
     
     def update_project(self, project_id: int, data: ProjectUpdate) -> Optional[Project]:
         """Update a project."""
@@ -97,6 +213,7 @@ class ProjectService:
             setattr(project, key, value)
         
         self.db.commit()
+        _cached_totals.clear()
         self.db.refresh(project)
         return project
     
@@ -109,6 +226,7 @@ class ProjectService:
         project.is_deleted = True
         project.deleted_at = datetime.utcnow()
         self.db.commit()
+        _cached_totals.clear()
         return True
     
     def get_stage(self, project_id: int, stage_type: StageType) -> Optional[Stage]:
@@ -121,19 +239,54 @@ class ProjectService:
         result = self.db.execute(stmt)
         return result.scalar_one_or_none()
     
-    def get_stage_context(self, project_id: int, stage_type: StageType) -> dict:
-        """Get context from previous stages for AI generation."""
-        project = self.get_project(project_id)
-        if not project:
+    def get_stage_context(
+        self,
+        project_id: int,
+        stage_type: StageType,
+        custom_prompt: Optional[str] = None
+    ) -> dict:
+        """Get context from previous stages for AI generation.
+        
+        Only the stages whose placeholders appear in the active template are
+        loaded, with the project columns, in a single query.
+        """
+        needed = self.get_context_stages(stage_type, custom_prompt)
+        
+        stmt = select(Project.name, Project.description)
+        if needed:
+            stmt = stmt.add_columns(Stage.stage_type, Stage.content).outerjoin(
+                Stage,
+                (Stage.project_id == Project.id) & Stage.stage_type.in_(needed)
+            )
+        stmt = stmt.where(Project.id == project_id).where(Project.is_deleted == False)
+        rows = self.db.execute(stmt).all()
+        if not rows:
             return {}
         
         context = {
-            "project_name": project.name,
-            "project_description": project.description or ""
+            "project_name": rows[0].name,
+            "project_description": rows[0].description or ""
         }
         
-        for stage in project.stages:
-            if stage.content:
-                context[stage.stage_type.value] = stage.content
+        if needed:
+            for row in rows:
+                if row.content:
+                    context[row.stage_type.value] = row.content
         
         return context
+    
+    def get_context_stages(
+        self,
+        stage_type: StageType,
+        custom_prompt: Optional[str] = None
+    ) -> List[StageType]:
+        """Stages whose content the prompt for `stage_type` can use."""
+        try:
+            template = PromptService().get_template(stage_type, self.db, custom_prompt)
+        except ValueError:
+            template = ""
+        if template:
+            names = template_placeholders(template)
+            return [s for s in STAGE_ORDER if s.value in names]
+        # No template to inspect: the declared dependencies plus the stage's own input
+        return [stage_type] + list(STAGE_DEPENDENCIES.get(stage_type, []))
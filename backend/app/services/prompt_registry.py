@@ -0,0 +1,121 @@
+"""
+AI Story Backend - In-Memory System Prompt Registry
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models import PromptRegistryState, SystemPrompt, StageType
+
+logger = logging.getLogger(__name__)
+
+_STATE_ID = 1
+
+
+class PromptRegistry:
+    """Process-wide cache of the effective system prompt for each stage.
+
+    Loaded once at startup (DB overrides on top of the YAML defaults).
+    Edits go through `save`/`reset`, which write the DB and the cache
+    together and bump a version row; other workers compare that version at
+    most every `check_interval` seconds and reload when it moved.
+    """
+
+    def __init__(self, defaults: Dict[StageType, str], check_interval: float):
+        self.defaults = dict(defaults)
+        self.check_interval = check_interval
+        self.version: Optional[int] = None
+        self._templates: Dict[StageType, str] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    def load(self, db: Session):
+        """(Re)load every prompt and the current version from the DB."""
+        version = self._read_version(db)
+        overrides = {
+            row.stage: row.content
+            for row in db.execute(select(SystemPrompt.stage, SystemPrompt.content))
+        }
+        templates = dict(self.defaults)
+        for stage in StageType:
+            if overrides.get(stage.value):
+                templates[stage] = overrides[stage.value]
+        with self._lock:
+            self._templates = templates
+            self.version = version
+            self._checked_at = time.monotonic()
+        logger.info(f"Loaded {len(templates)} system prompts (version {version})")
+
+    def get(self, stage_type: StageType, db: Session) -> Optional[str]:
+        """Effective template for a stage; `db` is only used for the periodic version check."""
+        if not self.loaded:
+            self.load(db)
+        elif time.monotonic() - self._checked_at >= self.check_interval:
+            self._refresh_if_stale(db)
+        return self._templates.get(stage_type)
+
+    def save(self, db: Session, stage_type: StageType, content: str) -> SystemPrompt:
+        """Write-through update of a stage's prompt."""
+        stmt = select(SystemPrompt).where(SystemPrompt.stage == stage_type.value)
+        prompt = db.execute(stmt).scalar_one_or_none()
+        if prompt:
+            prompt.content = content
+        else:
+            prompt = SystemPrompt(stage=stage_type.value, content=content)
+            db.add(prompt)
+
+        new_version = self._bump_version(db)
+        db.commit()
+        db.refresh(prompt)
+
+        with self._lock:
+            missed_edits = self.version is None or new_version != self.version + 1
+            if not missed_edits:
+                self._templates[stage_type] = content
+                self.version = new_version
+        if missed_edits:
+            # Another worker edited prompts since our last check
+            self.load(db)
+        return prompt
+
+    def reset(self, db: Session, stage_type: StageType) -> SystemPrompt:
+        """Restore a stage's prompt to the YAML default (write-through)."""
+        return self.save(db, stage_type, self.defaults[stage_type])
+
+    def _refresh_if_stale(self, db: Session):
+        try:
+            version = self._read_version(db)
+        except Exception as e:
+            logger.warning(f"Prompt registry version check failed: {e}")
+            return
+        if version != self.version:
+            logger.info(f"System prompts changed (version {self.version} -> {version}); reloading")
+            self.load(db)
+        else:
+            self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _read_version(db: Session) -> int:
+        stmt = select(PromptRegistryState.version).where(PromptRegistryState.id == _STATE_ID)
+        return db.execute(stmt).scalar_one_or_none() or 0
+
+    @staticmethod
+    def _bump_version(db: Session) -> int:
+        result = db.execute(
+            update(PromptRegistryState)
+            .where(PromptRegistryState.id == _STATE_ID)
+            .values(version=PromptRegistryState.version + 1)
+        )
+        if result.rowcount == 0:
+            db.add(PromptRegistryState(id=_STATE_ID, version=1))
+            db.flush()
+            return 1
+        return PromptRegistry._read_version(db)
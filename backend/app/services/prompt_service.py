@@ -1,9 +1,13 @@
 """
 AI Story Backend - Prompt Service
 """
+import hashlib
 import os
+import re
+import threading
 import yaml
-from typing import Dict, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
 from app.models.enums import StageType, STAGE_NAMES, STAGE_DEPENDENCIES
 
 
@@ -33,10 +37,105 @@ def load_default_prompts() -> Dict[StageType, str]:
 # Load prompts from config file
 STAGE_PROMPTS = load_default_prompts()
 
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+# Substituted for context values that are None or empty
+MISSING_VALUE = "[未提供]"
+
+
+class CompiledTemplate:
+    """A prompt template split once into literal text and placeholder slots.
+    
+    Rendering is a single pass and one join, instead of one `str.replace`
+    (a full rescan and copy of the growing prompt) per context key.
+    Placeholders without a context value are left as written, like before.
+    """
+    
+    __slots__ = ("literals", "names", "placeholders")
+    
+    def __init__(self, template: str):
+        # literals[i] precedes slot names[i]; literals has one extra tail entry
+        self.literals: List[str] = []
+        self.names: List[str] = []
+        position = 0
+        for match in _PLACEHOLDER_RE.finditer(template):
+            self.literals.append(template[position:match.start()])
+            self.names.append(match.group(1))
+            position = match.end()
+        self.literals.append(template[position:])
+        self.placeholders: Set[str] = set(self.names)
+    
+    def render(self, context: Dict[str, Optional[str]]) -> str:
+        """Fill the slots from `context` in one pass."""
+        parts = []
+        for literal, name in zip(self.literals, self.names):
+            parts.append(literal)
+            if name in context:
+                parts.append(context[name] or MISSING_VALUE)
+            else:
+                parts.append("{" + name + "}")
+        parts.append(self.literals[-1])
+        return "".join(parts)
+    
+    def missing(self, context: Dict[str, Optional[str]]) -> Set[str]:
+        """Placeholders the context does not provide (left unfilled)."""
+        return {name for name in self.placeholders if name not in context}
+    
+    def unused(self, context: Dict[str, Optional[str]]) -> Set[str]:
+        """Context keys the template never references."""
+        return set(context) - self.placeholders
+
+
+class _TemplateCache:
+    """Bounded cache of compiled templates keyed by a hash of their text."""
+    
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, CompiledTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, template: str) -> CompiledTemplate:
+        key = hashlib.blake2b(template.encode(), digest_size=16).digest()
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return compiled
+        compiled = CompiledTemplate(template)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = compiled
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compiled
+
+
+_template_cache = _TemplateCache()
+
+
+def compile_template(template: str) -> CompiledTemplate:
+    """Compile (or fetch the cached compilation of) a template."""
+    return _template_cache.get(template)
+
+
+def template_placeholders(template: str) -> Set[str]:
+    """Names of the `{placeholder}` slots used by a template."""
+    return compile_template(template).placeholders
+
 
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from app.models.system_prompt import SystemPrompt
+from app.core.config import settings as app_settings
+from app.services.prompt_registry import PromptRegistry
+from app.utils.token_estimate import estimate_tokens, get_model_price
+
+_STAGE_KEYS = {stage.value for stage in StageType}
+
+# Effective system prompts, cached in memory (see PromptRegistry)
+prompt_registry = PromptRegistry(STAGE_PROMPTS, app_settings.prompt_registry_check_seconds)
 
 
 class PromptService:
@@ -50,34 +149,115 @@ class PromptService:
         custom_prompt: Optional[str] = None
     ) -> str:
         """Build a complete prompt for the given stage."""
+        template = self.get_template(stage_type, db, custom_prompt)
+        return self._format_prompt(template, context)
+    
+    def get_template(
+        self,
+        stage_type: StageType,
+        db: Session,
+        custom_prompt: Optional[str] = None
+    ) -> str:
+        """Get the template that will be used for a stage."""
         if custom_prompt:
-            return self._format_prompt(custom_prompt, context)
+            return custom_prompt
         
-        # Try to get from DB first
-        stmt = select(SystemPrompt).where(SystemPrompt.stage == stage_type.value)
-        db_prompt = db.execute(stmt).scalar_one_or_none()
+        # DB override or YAML default, served from memory
+        template = prompt_registry.get(stage_type, db)
         
-        template = ""
-        if db_prompt:
-            template = db_prompt.content
-        else:
-            # Fallback to hardcoded default
-            template = STAGE_PROMPTS.get(stage_type, "")
-            
         if not template:
             raise ValueError(f"No template found for stage: {stage_type}")
         
-        return self._format_prompt(template, context)
+        return template
     
     def _format_prompt(self, template: str, context: Dict[str, str]) -> str:
         """Format the template with context variables."""
-        # Replace placeholders with context values
-        formatted = template
-        for key, value in context.items():
-            placeholder = "{" + key + "}"
-            formatted = formatted.replace(placeholder, value or "[未提供]")
+        return compile_template(template).render(context)
+    
+    def render_report(
+        self,
+        template: str,
+        context: Dict[str, str]
+    ) -> Tuple[str, Set[str], Set[str]]:
+        """Render a template and report (prompt, missing placeholders, unused context keys)."""
+        compiled = compile_template(template)
+        return compiled.render(context), compiled.missing(context), compiled.unused(context)
+    
+    def prompt_sections(
+        self,
+        template: str,
+        context: Dict[str, str]
+    ) -> List[dict]:
+        """Size of each part of the rendered prompt: template text, then each placeholder."""
+        compiled = compile_template(template)
+        literal = "".join(compiled.literals)
+        sections = [{
+            "name": "template",
+            "label": "template",
+            "occurrences": 1,
+            "provided": True,
+            "chars": len(literal),
+            "tokens": estimate_tokens(literal),
+        }]
+        for name in sorted(compiled.placeholders, key=compiled.names.index):
+            occurrences = compiled.names.count(name)
+            if name in context:
+                value = context[name] or MISSING_VALUE
+            else:
+                value = "{" + name + "}"
+            try:
+                label = STAGE_NAMES[StageType(name)]
+            except ValueError:
+                label = name
+            sections.append({
+                "name": name,
+                "label": label,
+                "occurrences": occurrences,
+                "provided": bool(context.get(name)),
+                "chars": len(value) * occurrences,
+                "tokens": estimate_tokens(value) * occurrences,
+            })
+        return sections
+    
+    def context_budget(self, model: Optional[str], max_output_tokens: Optional[int]) -> int:
+        """Prompt tokens available for `model` after reserving the output budget."""
+        price = get_model_price(model)
+        window = (price or {}).get("context_window") or app_settings.context_default_window
+        budget = window - (max_output_tokens or 0)
+        if app_settings.context_max_prompt_tokens:
+            budget = min(budget, app_settings.context_max_prompt_tokens)
+        return budget
+    
+    def plan_compaction(
+        self,
+        template: str,
+        context: Dict[str, str],
+        budget_tokens: int,
+        summary_tokens: int
+    ) -> List[str]:
+        """Stage keys to replace by summaries, largest first, so the prompt fits the budget."""
+        compiled = compile_template(template)
+        total = estimate_tokens(compiled.render(context))
+        if total <= budget_tokens:
+            return []
+        
+        candidates = []
+        for name in compiled.placeholders:
+            if name in _STAGE_KEYS and context.get(name):
+                occurrences = compiled.names.count(name)
+                candidates.append((estimate_tokens(context[name]), occurrences, name))
+        candidates.sort(reverse=True)
         
-        return formatted
+        keys = []
+        for tokens, occurrences, name in candidates:
+            if total <= budget_tokens:
+                break
+            saving = (tokens - summary_tokens) * occurrences
+            if saving <= 0:
+                break
+            keys.append(name)
+            total -= saving
+        return keys
     
     def get_required_context(self, stage_type: StageType) -> list:
         """Get the required context keys for a stage."""
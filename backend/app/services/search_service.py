@@ -0,0 +1,200 @@
+"""
+AI Story Backend - Full-text Search over Stages and Versions
+"""
+import html
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.db.fts import FTSIndex, STAGES_FTS, STAGE_VERSIONS_FTS, fts_query, search_index
+from app.models import Project, Stage, StageType, StageVersion
+from app.schemas.search import SearchHit
+from app.utils.cjk import cjk_runs
+
+SearchScope = Literal["all", "stages", "versions"]
+
+SNIPPET_CONTEXT = 40  # Characters shown on each side of the first match
+
+
+def make_snippet(content: str, search: str, context: int = SNIPPET_CONTEXT) -> str:
+    """Excerpt of `content` around the first match of `search`.
+
+    The excerpt is HTML-escaped, with every match wrapped in <mark></mark>;
+    without a match it is the start of the content.
+    """
+    terms = sorted({cjk or word for cjk, word in cjk_runs(search)}, key=len, reverse=True)
+    pattern = re.compile("|".join(map(re.escape, terms)), re.IGNORECASE) if terms else None
+    first = pattern.search(content) if pattern else None
+    if first:
+        start = max(0, first.start() - context)
+        end = min(len(content), first.end() + context)
+    else:
+        start, end = 0, min(len(content), 2 * context)
+
+    excerpt = " ".join(content[start:end].split())
+    parts, last = [], 0
+    for match in pattern.finditer(excerpt) if pattern else ():
+        parts.append(html.escape(excerpt[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        last = match.end()
+    parts.append(html.escape(excerpt[last:]))
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(content) else "")
+
+
+@dataclass
+class _Ranked:
+    kind: str
+    id: int
+    score: float
+    updated_at: datetime
+
+
+class SearchService:
+    """Search the content of stages and their version history.
+
+    Uses the FTS5 indexes (ranked by bm25) when available and LIKE queries
+    (newest first) otherwise. Ranking reads ids and scores only; content is
+    loaded just for the returned page, to build its snippets.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def search(
+        self,
+        query: str,
+        project_id: Optional[int] = None,
+        stage_type: Optional[StageType] = None,
+        scope: SearchScope = "all",
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[SearchHit]:
+        """Best matches of `query`, optionally within one project and/or stage type."""
+        match = None
+        if search_index.available:
+            match = fts_query(query)
+            if match is None:
+                return []
+
+        window = offset + limit
+        ranked: List[_Ranked] = []
+        if scope in ("all", "stages"):
+            stmt = select(Stage.id, Stage.updated_at)
+            ranked += self._rank(
+                "stage", stmt, Stage.id, Stage.content, Stage.updated_at, STAGES_FTS,
+                query, match, project_id, stage_type, window,
+            )
+        if scope in ("all", "versions"):
+            stmt = (
+                select(StageVersion.id, StageVersion.created_at)
+                .join(Stage, Stage.id == StageVersion.stage_id)
+            )
+            ranked += self._rank(
+                "version", stmt, StageVersion.id, StageVersion.content,
+                StageVersion.created_at, STAGE_VERSIONS_FTS,
+                query, match, project_id, stage_type, window,
+            )
+
+        # bm25 first (all 0 without the index), then the most recent
+        ranked.sort(key=lambda r: (r.score, -r.updated_at.timestamp()))
+        return self._load_hits(ranked[offset:window], query)
+
+    def _rank(
+        self,
+        kind: str,
+        stmt: Select,
+        id_column,
+        content_column,
+        updated_column,
+        index: FTSIndex,
+        query: str,
+        match: Optional[str],
+        project_id: Optional[int],
+        stage_type: Optional[StageType],
+        limit: int,
+    ) -> List[_Ranked]:
+        stmt = (
+            stmt.join(Project, Project.id == Stage.project_id)
+            .where(Project.is_deleted == False)
+        )
+        if project_id is not None:
+            stmt = stmt.where(Stage.project_id == project_id)
+        if stage_type is not None:
+            stmt = stmt.where(Stage.stage_type == stage_type)
+
+        if match:
+            fts = index.table
+            stmt = (
+                stmt.add_columns(fts.c.rank)
+                .join(fts, fts.c.rowid == id_column)
+                .where(index.matches(match))
+                .order_by(fts.c.rank)
+            )
+        else:
+            stmt = (
+                stmt.add_columns(literal(0.0))
+                .where(content_column.ilike(f"%{query}%"))
+                .order_by(updated_column.desc())
+            )
+
+        rows = self.db.execute(stmt.limit(limit)).all()
+        return [_Ranked(kind, row_id, score, updated_at) for row_id, updated_at, score in rows]
+
+    def _load_hits(self, page: List[_Ranked], query: str) -> List[SearchHit]:
+        stage_ids = [r.id for r in page if r.kind == "stage"]
+        version_ids = [r.id for r in page if r.kind == "version"]
+
+        stages = {}
+        if stage_ids:
+            stmt = (
+                select(Stage, Project.name)
+                .join(Project, Project.id == Stage.project_id)
+                .where(Stage.id.in_(stage_ids))
+            )
+            stages = {stage.id: (stage, name) for stage, name in self.db.execute(stmt)}
+        versions = {}
+        if version_ids:
+            stmt = (
+                select(StageVersion, Stage, Project.name)
+                .join(Stage, Stage.id == StageVersion.stage_id)
+                .join(Project, Project.id == Stage.project_id)
+                .where(StageVersion.id.in_(version_ids))
+            )
+            versions = {
+                version.id: (version, stage, name)
+                for version, stage, name in self.db.execute(stmt)
+            }
+
+        hits = []
+        for ranked in page:
+            if ranked.kind == "stage":
+                if ranked.id not in stages:
+                    continue  # Deleted since it was ranked
+                stage, project_name = stages[ranked.id]
+                version = None
+                content = stage.content
+            else:
+                if ranked.id not in versions:
+                    continue
+                version, stage, project_name = versions[ranked.id]
+                content = version.content
+            hits.append(SearchHit(
+                kind=ranked.kind,
+                project_id=stage.project_id,
+                project_name=project_name,
+                stage_id=stage.id,
+                stage_type=stage.stage_type,
+                version_id=version.id if version else None,
+                version_number=version.version_number if version else None,
+                source=version.source if version else None,
+                label=version.label if version else None,
+                snippet=make_snippet(content or "", query),
+                score=ranked.score,
+                updated_at=ranked.updated_at,
+            ))
+        return hits
@@ -0,0 +1,133 @@
+"""
+AI Story Backend - Stage Summaries for Context Compaction
+"""
+import hashlib
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.write_queue import write_queue
+from app.models import AISettings, StageSummary, StageType, STAGE_NAMES
+from app.services.telemetry_service import GenerationTimer, TelemetryService
+from app.utils.ai_client import TokenUsage
+from app.utils.resilience import ResilientAIClient
+from app.utils.single_flight import generation_flights
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "請將以下「{stage_name}」內容濃縮成約 {target_chars} 字的摘要，"
+    "供後續創作階段參考。保留人物、關係、關鍵情節、場景與事件順序等必要資訊，"
+    "省略修辭與細節描寫，只輸出摘要本身：\n\n{content}"
+)
+
+
+def content_hash(content: str) -> str:
+    """Cache key of a text to summarize."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class SummaryService:
+    """Generate and cache summaries of stage content.
+
+    Summaries are stored in the database keyed by the content hash and the
+    target size, so each distinct stage text is summarized once and an edit
+    to the stage triggers a new summary on next use.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_cached(self, content: str, target_tokens: int) -> Optional[str]:
+        """Stored summary of `content`, if any."""
+        stmt = (
+            select(StageSummary.summary)
+            .where(StageSummary.content_hash == content_hash(content))
+            .where(StageSummary.target_tokens == target_tokens)
+        )
+        return self.db.execute(stmt).scalar_one_or_none()
+
+    async def generate(
+        self,
+        stage_type: StageType,
+        content: str,
+        target_tokens: int,
+        client_factory: Callable[[], ResilientAIClient],
+    ) -> str:
+        """Generate and store the summary of `content` (see get_cached for lookups)."""
+        # Stages generated concurrently often share a dependency; summarize it once
+        key = f"summary:{content_hash(content)}:{target_tokens}"
+        return await generation_flights.do(
+            key, lambda: self._generate(stage_type, content, target_tokens, client_factory)
+        )
+
+    async def _generate(
+        self,
+        stage_type: StageType,
+        content: str,
+        target_tokens: int,
+        client_factory: Callable[[], ResilientAIClient],
+    ) -> str:
+        client = client_factory()
+        prompt = SUMMARY_PROMPT.format(
+            stage_name=STAGE_NAMES.get(stage_type, stage_type.value),
+            target_chars=target_tokens,
+            content=content,
+        )
+        timer = GenerationTimer()
+        with timer.per_request():
+            result = await client.generate(
+                prompt, temperature=0.3, max_tokens=int(target_tokens * 1.5)
+            )
+        summary = result.content.strip()
+        settings = client.served_by
+        logger.info(
+            f"Summarized {stage_type.value} ({len(content)} -> {len(summary)} chars) "
+            f"with {settings.model if settings else 'unknown model'}"
+        )
+
+        # Short write transaction of its own; no connection is held during the call
+        await write_queue.submit(
+            self._store, stage_type, content, target_tokens, summary, settings, timer,
+            result.usage,
+        )
+        return summary
+
+    @staticmethod
+    def _store(
+        db: Session,
+        stage_type: StageType,
+        content: str,
+        target_tokens: int,
+        summary: str,
+        settings: Optional[AISettings],
+        timer: GenerationTimer,
+        usage: Optional[TokenUsage],
+    ):
+        db.add(StageSummary(
+            content_hash=content_hash(content),
+            target_tokens=target_tokens,
+            stage_type=stage_type.value,
+            source_chars=len(content),
+            summary=summary,
+            model=settings.model if settings else None,
+        ))
+        if settings:
+            TelemetryService(db).record(
+                project_id=None,
+                stage_type=stage_type,
+                settings=settings,
+                mode="summary",
+                timer=timer,
+                usage=usage,
+                output_chars=len(summary),
+                commit=False,
+            )
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker stored the same summary first
+            db.rollback()
@@ -0,0 +1,209 @@
+"""
+AI Story Backend - Generation Telemetry Service
+"""
+import logging
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import AISettings, GenerationTelemetry, StageType
+from app.utils.ai_client import TokenUsage
+from app.utils.provider_limiter import slot_acquired
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationTimer:
+    """Measures total latency and time to first token of one generation.
+
+    Inside `per_request`, both count from the provider request that
+    produced the result, leaving out time queued behind the provider
+    limiter and retry backoff.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.paused_seconds = 0.0
+
+    def restart(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.paused_seconds = 0.0
+
+    @contextmanager
+    def per_request(self) -> Iterator["GenerationTimer"]:
+        """Restart the timer each time a provider slot is acquired (every retry)."""
+        token = slot_acquired.set(self.restart)
+        try:
+            yield self
+        finally:
+            slot_acquired.reset(token)
+            self.stop()
+
+    @contextmanager
+    def paused(self) -> Iterator["GenerationTimer"]:
+        """Leave our own work done mid-stream (e.g. a checkpoint write) out of the latency."""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.paused_seconds += time.perf_counter() - start
+
+    def mark_first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def stop(self):
+        """End the measurement (before the result is saved)."""
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+
+    @property
+    def latency_ms(self) -> float:
+        end = self.finished_at or time.perf_counter()
+        return (end - self.started - self.paused_seconds) * 1000
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return (self.first_token_at - self.started) * 1000
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of a list (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return round(ordered[rank - 1], 2)
+
+
+class TelemetryService:
+    """Service for recording and aggregating generation telemetry."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record(
+        self,
+        project_id: Optional[int],
+        stage_type: StageType,
+        settings: AISettings,
+        mode: str,
+        timer: GenerationTimer,
+        usage: Optional[TokenUsage] = None,
+        output_chars: int = 0,
+        status: str = "success",
+        error: Optional[str] = None,
+        commit: bool = True,
+    ) -> GenerationTelemetry:
+        """Record one generation."""
+        latency_ms = timer.latency_ms
+        ttft_ms = timer.ttft_ms
+
+        tokens_per_sec = None
+        if usage and usage.completion_tokens:
+            # Decode speed: exclude the wait for the first token when known
+            generation_ms = latency_ms - (ttft_ms or 0)
+            if generation_ms > 0:
+                tokens_per_sec = round(usage.completion_tokens / (generation_ms / 1000), 2)
+
+        entry = GenerationTelemetry(
+            project_id=project_id,
+            stage_type=stage_type.value,
+            settings_id=settings.id,
+            model=settings.model,
+            mode=mode,
+            status=status,
+            error=error[:1000] if error else None,
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+            total_tokens=usage.total_tokens if usage else None,
+            ttft_ms=round(ttft_ms, 2) if ttft_ms is not None else None,
+            latency_ms=round(latency_ms, 2),
+            tokens_per_sec=tokens_per_sec,
+            output_chars=output_chars,
+        )
+        self.db.add(entry)
+        if commit:
+            self.db.commit()
+        return entry
+
+    def summarize(self, days: int = 7) -> List[dict]:
+        """p50/p95 latency and token spend grouped by model and stage.
+
+        Context summaries (mode "summary") get groups of their own, so their
+        short calls do not skew the percentiles of stage generation.
+        """
+        since = datetime.utcnow() - timedelta(days=days)
+        stmt = (
+            select(
+                GenerationTelemetry.model,
+                GenerationTelemetry.stage_type,
+                GenerationTelemetry.mode,
+                GenerationTelemetry.status,
+                GenerationTelemetry.latency_ms,
+                GenerationTelemetry.ttft_ms,
+                GenerationTelemetry.prompt_tokens,
+                GenerationTelemetry.completion_tokens,
+                GenerationTelemetry.tokens_per_sec,
+            )
+            .where(GenerationTelemetry.created_at >= since)
+        )
+
+        groups: Dict[Tuple[str, str, str], dict] = defaultdict(lambda: {
+            "count": 0,
+            "errors": 0,
+            "cancelled": 0,
+            "latency": [],
+            "ttft": [],
+            "tps": [],
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        })
+        for row in self.db.execute(stmt):
+            kind = "summary" if row.mode == "summary" else "generation"
+            group = groups[(row.model, row.stage_type, kind)]
+            group["count"] += 1
+            if row.status == "error":
+                group["errors"] += 1
+                continue
+            if row.status == "cancelled":
+                group["cancelled"] += 1
+            group["latency"].append(row.latency_ms)
+            if row.ttft_ms is not None:
+                group["ttft"].append(row.ttft_ms)
+            if row.tokens_per_sec is not None:
+                group["tps"].append(row.tokens_per_sec)
+            group["prompt_tokens"] += row.prompt_tokens or 0
+            group["completion_tokens"] += row.completion_tokens or 0
+
+        summary = []
+        for (model, stage_type, kind), group in sorted(groups.items()):
+            summary.append({
+                "model": model,
+                "stage_type": stage_type,
+                "kind": kind,
+                "count": group["count"],
+                "errors": group["errors"],
+                "cancelled": group["cancelled"],
+                "latency_p50_ms": percentile(group["latency"], 50),
+                "latency_p95_ms": percentile(group["latency"], 95),
+                "ttft_p50_ms": percentile(group["ttft"], 50),
+                "ttft_p95_ms": percentile(group["ttft"], 95),
+                "avg_tokens_per_sec": round(sum(group["tps"]) / len(group["tps"]), 2)
+                if group["tps"] else None,
+                "prompt_tokens": group["prompt_tokens"],
+                "completion_tokens": group["completion_tokens"],
+                "total_tokens": group["prompt_tokens"] + group["completion_tokens"],
+            })
+        return summary
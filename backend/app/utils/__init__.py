@@ -1,4 +1,28 @@
 """Utils module initialization."""
-from .ai_client import BaseAIClient, OpenAIClient, create_ai_client
+from .ai_client import (
+    AIClientError,
+    AnthropicClient,
+    BaseAIClient,
+    GenerationResult,
+    LocalOpenAIClient,
+    OpenAIClient,
+    TokenUsage,
+    create_ai_client,
+    register_client,
+)
+from .http_client import HTTPClientRegistry, http_clients, lease_http_client
 
-__all__ = ["BaseAIClient", "OpenAIClient", "create_ai_client"]
+__all__ = [
+    "AIClientError",
+    "AnthropicClient",
+    "BaseAIClient",
+    "GenerationResult",
+    "LocalOpenAIClient",
+    "OpenAIClient",
+    "TokenUsage",
+    "create_ai_client",
+    "register_client",
+    "HTTPClientRegistry",
+    "http_clients",
+    "lease_http_client",
+]
@@ -4,20 +4,105 @@ AI Story Backend - AI Client
 import json
 import logging
 from abc import ABC, abstractmethod
-from typing import Optional, AsyncGenerator, Dict, Any
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, AsyncGenerator, AsyncIterator, Callable, Dict, Any, List, Tuple, Type
+from urllib.parse import urlparse
 import httpx
 
 from app.models import AISettings
-from app.core.security import decrypt_api_key
+from app.core.config import settings as app_settings
+from app.core.credentials import get_client_config
+from app.utils.http_client import lease_http_client
 
 logger = logging.getLogger(__name__)
 
+# Status codes worth retrying (or failing over) instead of failing outright
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+
+class AIClientError(Exception):
+    """Error raised by AI clients, classified for retry/failover decisions."""
+    
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        retryable: Optional[bool] = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        if retryable is None:
+            retryable = status_code in RETRYABLE_STATUS_CODES
+        self.retryable = retryable
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_error(status_code: int, error_text: str, headers: httpx.Headers) -> AIClientError:
+    return AIClientError(
+        f"API returned {status_code}: {error_text}",
+        status_code=status_code,
+        retry_after=parse_retry_after(headers.get("retry-after")),
+    )
+
+
+@dataclass
+class TokenUsage:
+    """Token accounting reported by the provider."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0  # Prompt tokens served from the provider's prompt cache
+    
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+    
+    @classmethod
+    def from_openai(cls, usage: Optional[Dict[str, Any]]) -> Optional["TokenUsage"]:
+        if not usage:
+            return None
+        details = usage.get("prompt_tokens_details") or {}
+        return cls(
+            prompt_tokens=usage.get("prompt_tokens") or 0,
+            completion_tokens=usage.get("completion_tokens") or 0,
+            cached_tokens=details.get("cached_tokens") or 0,
+        )
+
+
+@dataclass
+class GenerationResult:
+    """Result of a blocking generation."""
+    content: str
+    model: str
+    usage: Optional[TokenUsage] = None
+    finish_reason: Optional[str] = None
+
 
 class BaseAIClient(ABC):
     """Abstract base class for AI clients."""
     
+    # Usage of the most recent call (set after a stream is exhausted)
+    last_usage: Optional[TokenUsage] = None
+    
     @abstractmethod
-    async def generate(self, prompt: str, **kwargs) -> str:
+    async def generate(self, prompt: str, **kwargs) -> GenerationResult:
         """Generate content from a prompt."""
         pass
     
@@ -27,30 +112,63 @@ class BaseAIClient(ABC):
         pass
 
 
+# Provider name (AISettings.provider) -> client class
+_CLIENT_REGISTRY: Dict[str, Type[BaseAIClient]] = {}
+
+
+def register_client(*providers: str) -> Callable[[Type[BaseAIClient]], Type[BaseAIClient]]:
+    """Class decorator registering an adapter for one or more provider names."""
+    def decorator(cls: Type[BaseAIClient]) -> Type[BaseAIClient]:
+        for provider in providers:
+            _CLIENT_REGISTRY[provider.lower()] = cls
+        return cls
+    return decorator
+
+
+def registered_providers() -> List[str]:
+    """Provider names that have an adapter."""
+    return sorted(_CLIENT_REGISTRY)
+
+
+async def iter_sse_events(response: httpx.Response) -> AsyncIterator[Tuple[str, str]]:
+    """Parse a Server-Sent Events body into (event, data) pairs."""
+    event = "message"
+    data_lines: List[str] = []
+    async for line in response.aiter_lines():
+        if not line:
+            if data_lines:
+                yield event, "\n".join(data_lines)
+            event = "message"
+            data_lines = []
+            continue
+        if line.startswith(":"):
+            continue  # Comment / keep-alive
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            event = value
+        elif field == "data":
+            data_lines.append(value)
+    if data_lines:
+        yield event, "\n".join(data_lines)
+
+
+@register_client("openai", "custom")
 class OpenAIClient(BaseAIClient):
     """OpenAI-compatible API client (works with OpenRouter, etc.)."""
     
     def __init__(self, settings: AISettings):
-        self.api_key = decrypt_api_key(settings.api_key_encrypted)
-        self.base_url = settings.base_url.rstrip("/")
-        self.model = settings.model
-        self.temperature = settings.temperature
-        self.top_p = settings.top_p
-        self.max_tokens = settings.max_tokens
-        self.provider = settings.provider
-    
-    async def generate(self, prompt: str, **kwargs) -> str:
-        """Generate content synchronously."""
-        messages = [{"role": "user", "content": prompt}]
-        
-        request_body = {
-            "model": kwargs.get("model", self.model),
-            "messages": messages,
-            "temperature": kwargs.get("temperature", self.temperature),
-            "top_p": self.top_p,
-            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-        }
-        
+        config = get_client_config(settings)
+        self.api_key = config.api_key
+        self.base_url = config.base_url
+        self.model = config.model
+        self.temperature = config.temperature
+        self.top_p = config.top_p
+        self.max_tokens = config.max_tokens
+        self.provider = config.provider
+    
+    def _headers(self) -> Dict[str, str]:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -60,115 +178,350 @@ class OpenAIClient(BaseAIClient):
         if "openrouter" in self.base_url.lower():
             headers["HTTP-Referer"] = "http://localhost:3000"
             headers["X-Title"] = "AI Story Tool"
+        return headers
+    
+    def _request_body(self, prompt: str, stream: bool, **kwargs) -> Dict[str, Any]:
+        request_body = {
+            "model": kwargs.get("model", self.model),
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": kwargs.get("temperature", self.temperature),
+            "top_p": self.top_p,
+            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
+        }
+        if stream:
+            request_body["stream"] = True
+            if app_settings.ai_stream_include_usage:
+                # Ask for a final usage chunk so streamed generations can be metered
+                request_body["stream_options"] = {"include_usage": True}
+        return request_body
+    
+    def _parse_usage(self, data: Dict[str, Any]) -> Optional[TokenUsage]:
+        return TokenUsage.from_openai(data.get("usage"))
+    
+    async def generate(self, prompt: str, **kwargs) -> GenerationResult:
+        """Generate content synchronously."""
+        request_body = self._request_body(prompt, stream=False, **kwargs)
         
-        logger.info(f"Generating content with model: {self.model}")
+        logger.info(f"Generating content with model: {request_body['model']}")
         logger.debug(f"Request URL: {self.base_url}/chat/completions")
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with lease_http_client(self.base_url, self.api_key) as client:
                 response = await client.post(
                     f"{self.base_url}/chat/completions",
-                    headers=headers,
+                    headers=self._headers(),
                     json=request_body,
                     timeout=180.0  # Longer timeout for long generations
                 )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"API Error {response.status_code}: {error_text}")
-                    raise Exception(f"API returned {response.status_code}: {error_text}")
-                
-                data = response.json()
-                
-                if "choices" not in data or len(data["choices"]) == 0:
-                    logger.error(f"Unexpected response format: {data}")
-                    raise Exception(f"Unexpected API response format")
-                
-                content = data["choices"][0]["message"]["content"]
-                logger.info(f"Generated {len(content)} characters")
-                return content
-                
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"API Error {response.status_code}: {error_text}")
+                raise _status_error(response.status_code, error_text, response.headers)
+            
+            data = response.json()
+            
+            if "choices" not in data or len(data["choices"]) == 0:
+                logger.error(f"Unexpected response format: {data}")
+                raise AIClientError("Unexpected API response format")
+            
+            choice = data["choices"][0]
+            content = choice["message"]["content"] or ""
+            self.last_usage = self._parse_usage(data)
+            logger.info(f"Generated {len(content)} characters")
+            return GenerationResult(
+                content=content,
+                model=data.get("model") or request_body["model"],
+                usage=self.last_usage,
+                finish_reason=choice.get("finish_reason"),
+            )
+            
         except httpx.TimeoutException as e:
             logger.error(f"Request timeout: {e}")
-            raise Exception("Request timed out. Please try again.")
+            raise AIClientError("Request timed out. Please try again.", retryable=True)
         except httpx.HTTPError as e:
             logger.error(f"HTTP Error: {e}")
-            raise Exception(f"HTTP Error: {str(e)}")
+            raise AIClientError(f"HTTP Error: {str(e)}", retryable=True)
         except json.JSONDecodeError as e:
             logger.error(f"JSON decode error: {e}")
-            raise Exception("Failed to parse API response")
+            raise AIClientError("Failed to parse API response")
     
     async def stream_generate(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
         """Generate content with streaming."""
-        messages = [{"role": "user", "content": prompt}]
+        request_body = self._request_body(prompt, stream=True, **kwargs)
         
+        self.last_usage = None
+        try:
+            async with (
+                lease_http_client(self.base_url, self.api_key) as client,
+                client.stream(
+                    "POST",
+                    f"{self.base_url}/chat/completions",
+                    headers=self._headers(),
+                    json=request_body,
+                    timeout=180.0
+                ) as response,
+            ):
+                if response.status_code != 200:
+                    error_text = await response.aread()
+                    raise _status_error(
+                        response.status_code, error_text.decode(), response.headers
+                    )
+                
+                async for _, data_str in iter_sse_events(response):
+                    if data_str.strip() == "[DONE]":
+                        break
+                    try:
+                        data = json.loads(data_str)
+                    except json.JSONDecodeError:
+                        continue
+                    if "error" in data:
+                        raise AIClientError(f"Stream error: {data['error']}", retryable=True)
+                    usage = self._parse_usage(data)
+                    if usage:
+                        self.last_usage = usage
+                    if not data.get("choices"):
+                        continue
+                    delta = data["choices"][0].get("delta") or {}
+                    if delta.get("content"):
+                        yield delta["content"]
+        except httpx.TimeoutException as e:
+            logger.error(f"Stream timeout: {e}")
+            raise AIClientError("Request timed out. Please try again.", retryable=True)
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP Error: {e}")
+            raise AIClientError(f"HTTP Error: {str(e)}", retryable=True)
+    
+    async def test_connection(self) -> tuple[bool, str]:
+        """Test the API connection."""
+        headers = self._headers()
+        headers.pop("Content-Type", None)
+        
+        try:
+            async with lease_http_client(self.base_url, self.api_key) as client:
+                # Try to list models as a connection test
+                response = await client.get(
+                    f"{self.base_url}/models",
+                    headers=headers,
+                    timeout=10.0
+                )
+            if response.status_code == 200:
+                return True, "連接成功"
+            else:
+                return False, f"API 返回 {response.status_code}"
+        except httpx.TimeoutException:
+            return False, "連接超時"
+        except Exception as e:
+            return False, str(e)
+
+
+@register_client("local", "ollama", "llamacpp")
+class LocalOpenAIClient(OpenAIClient):
+    """Local OpenAI-compatible server (llama.cpp server, Ollama, vLLM, LM Studio).
+    
+    No API key is required, and llama.cpp's `timings` block is used for
+    token counts when the server does not send an OpenAI `usage` block.
+    """
+    
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+    
+    def _parse_usage(self, data: Dict[str, Any]) -> Optional[TokenUsage]:
+        usage = TokenUsage.from_openai(data.get("usage"))
+        if usage:
+            return usage
+        timings = data.get("timings")
+        if timings:
+            return TokenUsage(
+                prompt_tokens=timings.get("prompt_n") or 0,
+                completion_tokens=timings.get("predicted_n") or 0,
+            )
+        return None
+
+
+# Anthropic error types that indicate a transient provider problem
+_ANTHROPIC_RETRYABLE_ERRORS = {"overloaded_error", "rate_limit_error", "api_error"}
+
+
+@register_client("anthropic")
+class AnthropicClient(BaseAIClient):
+    """Native Anthropic Messages API client with prompt caching."""
+    
+    def __init__(self, settings: AISettings):
+        config = get_client_config(settings)
+        self.api_key = config.api_key
+        self.base_url = config.base_url
+        self.model = config.model
+        self.temperature = config.temperature
+        self.top_p = config.top_p
+        self.max_tokens = config.max_tokens
+        self.provider = config.provider
+    
+    def _headers(self) -> Dict[str, str]:
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
+            "x-api-key": self.api_key,
+            "anthropic-version": app_settings.anthropic_version,
+            "content-type": "application/json",
         }
-        
-        # Add OpenRouter-specific headers
-        if "openrouter" in self.base_url.lower():
-            headers["HTTP-Referer"] = "http://localhost:3000"
-            headers["X-Title"] = "AI Story Tool"
-        
-        request_body = {
+        if app_settings.anthropic_beta:
+            headers["anthropic-beta"] = app_settings.anthropic_beta
+        return headers
+    
+    def _request_body(self, prompt: str, stream: bool, **kwargs) -> Dict[str, Any]:
+        content_block: Dict[str, Any] = {"type": "text", "text": prompt}
+        if app_settings.anthropic_prompt_caching:
+            # Regenerations resend the same prompt; let Anthropic reuse the prefix
+            content_block["cache_control"] = {"type": "ephemeral"}
+        request_body: Dict[str, Any] = {
             "model": kwargs.get("model", self.model),
-            "messages": messages,
-            "temperature": kwargs.get("temperature", self.temperature),
-            "top_p": self.top_p,
             "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-            "stream": True,
+            "messages": [{"role": "user", "content": [content_block]}],
+            "temperature": min(kwargs.get("temperature", self.temperature), 1.0),
         }
+        if self.top_p is not None and self.top_p < 1.0:
+            request_body["top_p"] = self.top_p
+        if stream:
+            request_body["stream"] = True
+        return request_body
+    
+    @staticmethod
+    def _parse_usage(usage: Optional[Dict[str, Any]]) -> Optional[TokenUsage]:
+        if not usage:
+            return None
+        cache_read = usage.get("cache_read_input_tokens") or 0
+        cache_write = usage.get("cache_creation_input_tokens") or 0
+        return TokenUsage(
+            prompt_tokens=(usage.get("input_tokens") or 0) + cache_read + cache_write,
+            completion_tokens=usage.get("output_tokens") or 0,
+            cached_tokens=cache_read,
+        )
+    
+    @staticmethod
+    def _error(status_code: Optional[int], body: str, headers: Optional[httpx.Headers] = None) -> AIClientError:
+        error_type = ""
+        message = body
+        try:
+            error = json.loads(body).get("error", {})
+            error_type = error.get("type", "")
+            message = error.get("message", body)
+        except (ValueError, AttributeError):
+            pass
+        retryable = None
+        if error_type in _ANTHROPIC_RETRYABLE_ERRORS:
+            retryable = True
+        return AIClientError(
+            f"Anthropic API returned {status_code or error_type}: {message}",
+            status_code=status_code,
+            retry_after=parse_retry_after(headers.get("retry-after")) if headers else None,
+            retryable=retryable,
+        )
+    
+    async def generate(self, prompt: str, **kwargs) -> GenerationResult:
+        """Generate content synchronously."""
+        request_body = self._request_body(prompt, stream=False, **kwargs)
+        logger.info(f"Generating content with Anthropic model: {request_body['model']}")
         
-        async with httpx.AsyncClient() as client:
-            async with client.stream(
-                "POST",
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=request_body,
-                timeout=180.0
-            ) as response:
+        try:
+            async with lease_http_client(self.base_url, self.api_key) as client:
+                response = await client.post(
+                    f"{self.base_url}/messages",
+                    headers=self._headers(),
+                    json=request_body,
+                    timeout=180.0
+                )
+            if response.status_code != 200:
+                logger.error(f"API Error {response.status_code}: {response.text}")
+                raise self._error(response.status_code, response.text, response.headers)
+            
+            data = response.json()
+            content = "".join(
+                block.get("text", "")
+                for block in data.get("content", [])
+                if block.get("type") == "text"
+            )
+            self.last_usage = self._parse_usage(data.get("usage"))
+            logger.info(f"Generated {len(content)} characters")
+            return GenerationResult(
+                content=content,
+                model=data.get("model") or request_body["model"],
+                usage=self.last_usage,
+                finish_reason=data.get("stop_reason"),
+            )
+        except httpx.TimeoutException as e:
+            logger.error(f"Request timeout: {e}")
+            raise AIClientError("Request timed out. Please try again.", retryable=True)
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP Error: {e}")
+            raise AIClientError(f"HTTP Error: {str(e)}", retryable=True)
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON decode error: {e}")
+            raise AIClientError("Failed to parse API response")
+    
+    async def stream_generate(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
+        """Generate content with streaming (Messages API SSE events)."""
+        request_body = self._request_body(prompt, stream=True, **kwargs)
+        
+        self.last_usage = None
+        input_usage: Dict[str, Any] = {}
+        try:
+            async with (
+                lease_http_client(self.base_url, self.api_key) as client,
+                client.stream(
+                    "POST",
+                    f"{self.base_url}/messages",
+                    headers=self._headers(),
+                    json=request_body,
+                    timeout=180.0
+                ) as response,
+            ):
                 if response.status_code != 200:
-                    error_text = await response.aread()
-                    raise Exception(f"API returned {response.status_code}: {error_text.decode()}")
+                    error_text = (await response.aread()).decode()
+                    raise self._error(response.status_code, error_text, response.headers)
                 
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        if data_str.strip() == "[DONE]":
-                            break
-                        try:
-                            data = json.loads(data_str)
-                            delta = data["choices"][0].get("delta", {})
-                            if "content" in delta:
-                                yield delta["content"]
-                        except json.JSONDecodeError:
-                            continue
+                async for event, data_str in iter_sse_events(response):
+                    try:
+                        data = json.loads(data_str)
+                    except json.JSONDecodeError:
+                        continue
+                    event = data.get("type", event)
+                    
+                    if event == "content_block_delta":
+                        delta = data.get("delta", {})
+                        if delta.get("type") == "text_delta" and delta.get("text"):
+                            yield delta["text"]
+                    elif event == "message_start":
+                        input_usage = data.get("message", {}).get("usage", {}) or {}
+                        self.last_usage = self._parse_usage(input_usage)
+                    elif event == "message_delta":
+                        # Output token count arrives with the final message_delta
+                        self.last_usage = self._parse_usage({**input_usage, **(data.get("usage") or {})})
+                    elif event == "message_stop":
+                        break
+                    elif event == "error":
+                        raise self._error(None, data_str)
+        except httpx.TimeoutException as e:
+            logger.error(f"Stream timeout: {e}")
+            raise AIClientError("Request timed out. Please try again.", retryable=True)
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP Error: {e}")
+            raise AIClientError(f"HTTP Error: {str(e)}", retryable=True)
     
     async def test_connection(self) -> tuple[bool, str]:
         """Test the API connection."""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-        }
-        
-        # Add OpenRouter-specific headers
-        if "openrouter" in self.base_url.lower():
-            headers["HTTP-Referer"] = "http://localhost:3000"
-            headers["X-Title"] = "AI Story Tool"
-        
         try:
-            async with httpx.AsyncClient() as client:
-                # Try to list models as a connection test
+            async with lease_http_client(self.base_url, self.api_key) as client:
                 response = await client.get(
                     f"{self.base_url}/models",
-                    headers=headers,
+                    headers=self._headers(),
                     timeout=10.0
                 )
-                if response.status_code == 200:
-                    return True, "連接成功"
-                else:
-                    return False, f"API 返回 {response.status_code}"
+            if response.status_code == 200:
+                return True, "連接成功"
+            else:
+                return False, f"API 返回 {response.status_code}"
         except httpx.TimeoutException:
             return False, "連接超時"
         except Exception as e:
@@ -176,5 +529,16 @@ class OpenAIClient(BaseAIClient):
 
 
 def create_ai_client(settings: AISettings) -> BaseAIClient:
-    """Factory function to create an AI client."""
-    return OpenAIClient(settings)
+    """Factory function to create the AI client registered for the provider."""
+    provider = (settings.provider or "openai").lower()
+    if provider == "claude":
+        # Saved "claude" settings predate the native adapter and may point at an
+        # OpenAI-compatible gateway; only Anthropic's own API gets the native client
+        host = urlparse(settings.base_url or "").hostname or ""
+        is_anthropic = host == "anthropic.com" or host.endswith(".anthropic.com")
+        provider = "anthropic" if is_anthropic else "openai"
+    client_class = _CLIENT_REGISTRY.get(provider)
+    if client_class is None:
+        logger.warning(f"No adapter for provider '{provider}', using OpenAI-compatible client")
+        client_class = OpenAIClient
+    return client_class(settings)
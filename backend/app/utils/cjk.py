@@ -0,0 +1,51 @@
+"""
+AI Story Backend - CJK Text Helpers
+"""
+import re
+from typing import List, Optional, Tuple
+
+# Ideographs, kana and hangul: the "letters" of CJK text, written without spaces
+CJK_LETTERS = (
+    "\u3040-\u30ff"  # hiragana, katakana
+    "\u3400-\u4dbf"  # CJK extension A
+    "\u4e00-\u9fff"  # CJK unified ideographs
+    "\uac00-\ud7af"  # hangul syllables
+    "\uf900-\ufaff"  # CJK compatibility ideographs
+)
+# Full-width punctuation and forms
+CJK_SYMBOLS = (
+    "\u3000-\u303f"  # CJK symbols and punctuation
+    "\uff00-\uffef"  # half/full-width forms
+)
+
+# A run of CJK letters, or a run of other word characters
+_RUN_RE = re.compile(rf"([{CJK_LETTERS}]+)|([^\W_{CJK_LETTERS}]+)")
+
+
+def cjk_runs(text: Optional[str]) -> List[Tuple[str, str]]:
+    """(cjk, word) pairs for each run of CJK letters / other word characters."""
+    return _RUN_RE.findall(text) if text else []
+
+
+def bigrams(run: str) -> List[str]:
+    """Overlapping character bigrams of a CJK run, followed by its last character.
+
+    '台北故事' -> ['台北', '北故', '故事', '事']. The trailing character lets a
+    one-character search find the run as a prefix match.
+    """
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def cjk_bigrams(text: Optional[str]) -> str:
+    """Space-separated search terms: bigrams for CJK runs, other words as they are.
+
+    Full-text tokenizers split on spaces, which CJK text does not have; this
+    turns '台北的故事 2024' into '台北 北的 的故 故事 事 2024'.
+    """
+    terms = []
+    for cjk, word in cjk_runs(text):
+        if cjk:
+            terms.extend(bigrams(cjk))
+        else:
+            terms.append(word)
+    return " ".join(terms)
@@ -0,0 +1,206 @@
+"""
+AI Story Backend - Content-addressed Generation Cache
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(
+    prompt: str,
+    model: str,
+    temperature: float,
+    top_p: float,
+    max_tokens: int,
+    base_url: str = "",
+) -> str:
+    """Hash the fully built prompt together with every sampling parameter."""
+    payload = json.dumps(
+        {
+            "prompt": prompt,
+            "model": model,
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+            "base_url": base_url.rstrip("/"),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """On-disk LRU cache of generated content with size and TTL eviction.
+
+    Backed by a standalone SQLite file so it survives restarts and never
+    touches the application database.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 500,
+        max_bytes: int = 50 * 1024 * 1024,
+        ttl_seconds: int = 7 * 24 * 3600,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation_cache ("
+                " key TEXT PRIMARY KEY,"
+                " content TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_generation_cache_last_access"
+                " ON generation_cache (last_access)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Return cached content, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT content, created_at FROM generation_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl_seconds:
+                conn.execute(
+                    "UPDATE generation_cache SET last_access = ? WHERE key = ?", (now, key)
+                )
+                conn.commit()
+                self.hits += 1
+                return row[0]
+            if row:
+                conn.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                conn.commit()
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def set(self, key: str, content: str):
+        """Store content and evict expired / least recently used entries."""
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO generation_cache"
+                " (key, content, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, content, size, now, now),
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        cursor = conn.execute(
+            "DELETE FROM generation_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        self.evictions += cursor.rowcount
+
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generation_cache"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # Drop least recently used rows until both limits are satisfied
+        doomed = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM generation_cache ORDER BY last_access ASC"
+        ):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM generation_cache WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, content: str):
+        await asyncio.to_thread(self.set, key, content)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM generation_cache")
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generation_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "entries": count,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[GenerationCache] = None
+
+
+def get_generation_cache() -> Optional[GenerationCache]:
+    """Get the process-wide cache, or None when caching is disabled."""
+    global _cache
+    if not settings.generation_cache_enabled:
+        return None
+    if _cache is None:
+        _cache = GenerationCache(
+            settings.generation_cache_path,
+            max_entries=settings.generation_cache_max_entries,
+            max_bytes=settings.generation_cache_max_bytes,
+            ttl_seconds=settings.generation_cache_ttl_seconds,
+        )
+    return _cache
+
+
+def close_generation_cache():
+    """Close the cache file handle (called on application shutdown)."""
+    if _cache is not None:
+        _cache.close()
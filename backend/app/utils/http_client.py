@@ -0,0 +1,124 @@
+"""
+AI Story Backend - Pooled HTTP Clients
+"""
+import asyncio
+import hashlib
+import importlib.util
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Set, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (httpx[http2])."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class HTTPClientRegistry:
+    """Long-lived, pooled `httpx.AsyncClient` instances keyed by endpoint and key.
+
+    Reusing one client per provider keeps TCP/TLS connections alive between
+    generations instead of paying a new handshake on every request. At most
+    `max_clients` are kept; the least recently used one is dropped beyond
+    that. Callers borrow clients through `lease`, and a dropped client is
+    closed only once its last lease is returned, so eviction never cuts off
+    a request or stream in flight.
+    """
+
+    def __init__(self, max_clients: int = 64):
+        self.max_clients = max(1, max_clients)
+        self._clients: "OrderedDict[Tuple[str, str], httpx.AsyncClient]" = OrderedDict()
+        self._leases: Dict[httpx.AsyncClient, int] = {}  # Client -> requests using it
+        self._retired: Set[httpx.AsyncClient] = set()  # Evicted, still leased
+        self._closing: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _key(base_url: str, api_key: str) -> Tuple[str, str]:
+        # Never keep the raw key around as a dict key
+        fingerprint = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        return base_url.rstrip("/"), fingerprint
+
+    def get(self, base_url: str, api_key: str = "") -> httpx.AsyncClient:
+        """Get (or lazily create) the pooled client for an endpoint."""
+        key = self._key(base_url, api_key)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = self._create_client()
+            self._clients[key] = client
+            logger.info(f"Opened pooled HTTP client for {key[0]}")
+            self._evict()
+        else:
+            self._clients.move_to_end(key)
+        return client
+
+    @asynccontextmanager
+    async def lease(self, base_url: str, api_key: str = "") -> AsyncIterator[httpx.AsyncClient]:
+        """Borrow the pooled client for an endpoint for one request or stream."""
+        client = self.get(base_url, api_key)
+        self._leases[client] = self._leases.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            self._leases[client] -= 1
+            if not self._leases[client]:
+                del self._leases[client]
+                if client in self._retired:
+                    self._retired.discard(client)
+                    self._close_later(client)
+
+    def _evict(self):
+        while len(self._clients) > self.max_clients:
+            (base_url, _), client = self._clients.popitem(last=False)
+            logger.info(f"Closing least recently used HTTP client for {base_url}")
+            if client in self._leases:
+                self._retired.add(client)  # Closed when its last lease is returned
+            else:
+                self._close_later(client)
+
+    def _close_later(self, client: httpx.AsyncClient):
+        task = asyncio.get_running_loop().create_task(client.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _create_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        )
+        return httpx.AsyncClient(
+            limits=limits,
+            http2=settings.http2_enabled and _http2_available(),
+            timeout=httpx.Timeout(180.0, connect=10.0),
+        )
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    async def aclose(self):
+        """Close every pooled client (called on application shutdown)."""
+        clients = [*self._clients.values(), *self._retired]
+        self._clients.clear()
+        self._retired.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP client: {e}")
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+
+# Process-wide registry, closed by the FastAPI lifespan
+http_clients = HTTPClientRegistry(max_clients=settings.http_max_clients)
+
+
+def lease_http_client(base_url: str, api_key: str = ""):
+    """Borrow the shared pooled client for a provider endpoint (`async with`)."""
+    return http_clients.lease(base_url, api_key)
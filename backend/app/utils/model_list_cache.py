@@ -0,0 +1,149 @@
+"""
+AI Story Backend - Provider Model List Cache
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ModelList = List[dict]
+Fetcher = Callable[[], Awaitable[ModelList]]
+
+
+@dataclass
+class CachedModelList:
+    """A model list and when it was fetched."""
+    models: ModelList
+    fetched_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class ModelListCache:
+    """Stale-while-revalidate cache of provider `/models` responses.
+
+    Entries younger than `ttl` are served directly. Older entries (up to
+    `max_stale`) are still served immediately while one background task
+    refreshes them. Only a cold or explicitly refreshed key waits for the
+    provider, and concurrent waiters for the same key share one upstream call.
+    """
+
+    def __init__(self, ttl: float, max_stale: float, max_entries: int):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Tuple[str, str], CachedModelList]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+
+    @staticmethod
+    def key(base_url: str, api_key: str) -> Tuple[str, str]:
+        fingerprint = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        return base_url.rstrip("/"), fingerprint
+
+    async def get(
+        self,
+        base_url: str,
+        api_key: str,
+        fetcher: Fetcher,
+        refresh: bool = False,
+    ) -> Tuple[CachedModelList, bool]:
+        """Return (entry, served_from_cache), fetching through `fetcher` when needed."""
+        key = self.key(base_url, api_key)
+        entry = self._entries.get(key)
+
+        if entry and not refresh:
+            age = entry.age
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry, True
+            if age < self.ttl + self.max_stale:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._revalidate(key, fetcher)
+                return entry, True
+
+        self.misses += 1
+        return await self._fetch(key, fetcher), False
+
+    def invalidate(self, base_url: Optional[str] = None):
+        """Drop cached lists for one base URL, or everything."""
+        if base_url is None:
+            self._entries.clear()
+            return
+        base_url = base_url.rstrip("/")
+        for key in [k for k in self._entries if k[0] == base_url]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "upstream_calls": self.upstream_calls,
+            "refreshing": len(self._inflight),
+        }
+
+    async def aclose(self):
+        """Cancel pending background refreshes (app shutdown)."""
+        for task in list(self._background):
+            task.cancel()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    async def _fetch(self, key: Tuple[str, str], fetcher: Fetcher) -> CachedModelList:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key, fetcher))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller disconnecting does not cancel the shared fetch
+        return await asyncio.shield(future)
+
+    async def _load(self, key: Tuple[str, str], fetcher: Fetcher) -> CachedModelList:
+        self.upstream_calls += 1
+        entry = CachedModelList(models=await fetcher(), fetched_at=time.time())
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def _revalidate(self, key: Tuple[str, str], fetcher: Fetcher):
+        if key in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                await self._fetch(key, fetcher)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep serving the stale list; the next request tries again
+                logger.warning(f"Background model list refresh for {key[0]} failed: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+
+model_list_cache = ModelListCache(
+    ttl=settings.model_list_cache_ttl_seconds,
+    max_stale=settings.model_list_cache_max_stale_seconds,
+    max_entries=settings.model_list_cache_max_entries,
+)
@@ -0,0 +1,184 @@
+"""
+AI Story Backend - Outbound Rate Limiting for AI Providers
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, Optional
+
+from app.core.config import settings as app_settings
+from app.utils.ai_client import AIClientError, BaseAIClient, GenerationResult, TokenUsage
+
+logger = logging.getLogger(__name__)
+
+# Called whenever a slot is acquired in the current context, i.e. just before
+# a request goes out (see GenerationTimer.per_request)
+slot_acquired: ContextVar[Optional[Callable[[], None]]] = ContextVar(
+    "slot_acquired", default=None
+)
+
+
+class AsyncTokenBucket:
+    """Token bucket refilled at `rate_per_minute`, holding at most `capacity` tokens.
+
+    Waiters are served strictly in arrival order: the lock is held while a
+    caller sleeps for its token, so later callers queue behind it.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class ProviderLimiter:
+    """Request rate plus concurrency cap for one AI provider endpoint."""
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        max_concurrent: int,
+        max_wait: float,
+    ):
+        self.bucket = AsyncTokenBucket(rate_per_minute, burst)
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.queued = 0
+        self.active = 0
+        self.total_requests = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Queue for a concurrency slot and a rate token, then hold the slot."""
+        start = time.monotonic()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AIClientError(
+                "AI provider is busy, please try again later.",
+                status_code=429,
+                retryable=False,
+            )
+        finally:
+            self.queued -= 1
+
+        waited = time.monotonic() - start
+        self.total_requests += 1
+        self.total_wait += waited
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+        self.active += 1
+        callback = slot_acquired.get()
+        if callback is not None:
+            callback()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def _acquire(self):
+        await self._semaphore.acquire()
+        try:
+            await self.bucket.acquire()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queued,
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "tokens_available": round(self.bucket.available, 2),
+            "requests": self.total_requests,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.total_wait / self.total_requests, 3)
+            if self.total_requests else 0.0,
+            "max_wait_seconds": round(self.max_wait_seen, 3),
+        }
+
+
+# One limiter per AISettings row, shared across requests
+_limiters: Dict[int, ProviderLimiter] = {}
+
+
+def get_provider_limiter(settings_id: int) -> ProviderLimiter:
+    """Get the outbound limiter for an AISettings endpoint."""
+    limiter = _limiters.get(settings_id)
+    if limiter is None:
+        limiter = ProviderLimiter(
+            rate_per_minute=app_settings.ai_rate_limit_per_minute,
+            burst=app_settings.ai_rate_limit_burst,
+            max_concurrent=app_settings.ai_max_concurrent_per_provider,
+            max_wait=app_settings.ai_limiter_max_wait_seconds,
+        )
+        _limiters[settings_id] = limiter
+    return limiter
+
+
+def limiter_stats() -> Dict[int, dict]:
+    """Queue depth, wait time and throughput per AISettings id."""
+    return {settings_id: limiter.stats() for settings_id, limiter in _limiters.items()}
+
+
+class RateLimitedClient(BaseAIClient):
+    """Run every call of an inner client through a ProviderLimiter.
+
+    Streams hold their concurrency slot until the stream is exhausted or closed.
+    """
+
+    def __init__(self, client: BaseAIClient, limiter: ProviderLimiter):
+        self.client = client
+        self.limiter = limiter
+
+    @property
+    def last_usage(self) -> Optional[TokenUsage]:
+        return self.client.last_usage
+
+    async def generate(self, prompt: str, **kwargs) -> GenerationResult:
+        async with self.limiter.slot():
+            return await self.client.generate(prompt, **kwargs)
+
+    async def stream_generate(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
+        async with self.limiter.slot():
+            stream = self.client.stream_generate(prompt, **kwargs)
+            try:
+                async for token in stream:
+                    yield token
+            finally:
+                await stream.aclose()
+
+    async def test_connection(self) -> tuple[bool, str]:
+        return await self.client.test_connection()
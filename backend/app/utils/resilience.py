@@ -0,0 +1,299 @@
+"""
+AI Story Backend - Retry, Circuit Breaker and Failover for AI Clients
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from app.core.config import settings as app_settings
+from app.models import AISettings
+from app.utils.ai_client import (
+    AIClientError,
+    BaseAIClient,
+    GenerationResult,
+    TokenUsage,
+    create_ai_client,
+)
+from app.utils.provider_limiter import RateLimitedClient, get_provider_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter that honors Retry-After."""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry number `attempt + 1`."""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """Per-endpoint breaker: closed -> open after repeated failures -> half-open probe."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a request may be sent through this endpoint now."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+
+    def release_probe(self):
+        """Let another request probe a half-open endpoint (e.g. after a cancel)."""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                logger.warning(f"Circuit opened after {self.failures} failures")
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+# One breaker per AISettings row, shared across requests
+_breakers: Dict[int, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(settings_id: int) -> CircuitBreaker:
+    """Get the breaker guarding an AISettings endpoint."""
+    breaker = _breakers.get(settings_id)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            failure_threshold=app_settings.ai_circuit_failure_threshold,
+            reset_timeout=app_settings.ai_circuit_reset_seconds,
+        )
+        _breakers[settings_id] = breaker
+    return breaker
+
+
+def circuit_states() -> Dict[int, dict]:
+    """Snapshot of every breaker, for monitoring."""
+    return {
+        settings_id: {"state": breaker.state, "failures": breaker.failures}
+        for settings_id, breaker in _breakers.items()
+    }
+
+
+@dataclass
+class Endpoint:
+    """An AI endpoint participating in failover."""
+    settings: AISettings
+    client: BaseAIClient
+    breaker: CircuitBreaker
+
+
+class ResilientAIClient(BaseAIClient):
+    """Wrap an ordered list of endpoints with retries, breakers, failover and hedging.
+
+    Endpoints are tried in order; each gets up to `policy.max_attempts`
+    attempts for retryable errors. With `hedge_after` set, the next endpoint
+    is started in parallel when the current one has not answered (or, when
+    streaming, produced its first token) within that many seconds, and the
+    first success wins. Streams are only retried before their first token.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[Endpoint],
+        policy: Optional[RetryPolicy] = None,
+        hedge_after: float = 0.0,
+    ):
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+        self.endpoints = list(endpoints)
+        self.policy = policy or RetryPolicy()
+        self.hedge_after = hedge_after
+        self._served: Optional[Endpoint] = None  # Endpoint that answered last
+
+    @property
+    def served_by(self) -> Optional[AISettings]:
+        return self._served.settings if self._served else None
+
+    @property
+    def last_usage(self) -> Optional[TokenUsage]:
+        return self._served.client.last_usage if self._served else None
+
+    async def generate(self, prompt: str, **kwargs) -> GenerationResult:
+        async def call(client: BaseAIClient) -> GenerationResult:
+            return await client.generate(prompt, **kwargs)
+
+        return await self._execute(call)
+
+    async def stream_generate(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
+        async def open_stream(client: BaseAIClient):
+            stream = client.stream_generate(prompt, **kwargs)
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+            except BaseException:
+                await stream.aclose()
+                raise
+            return stream, first
+
+        async def discard(result):
+            await result[0].aclose()
+
+        stream, first = await self._execute(open_stream, discard)
+        try:
+            if first is None:
+                return
+            yield first
+            async for token in stream:
+                yield token
+        finally:
+            await stream.aclose()
+
+    async def test_connection(self) -> tuple[bool, str]:
+        return await self.endpoints[0].client.test_connection()
+
+    async def _attempt(
+        self, endpoint: Endpoint, call: Callable[[BaseAIClient], Awaitable[Any]]
+    ) -> Any:
+        """Call one endpoint, retrying retryable errors with backoff."""
+        for attempt in range(self.policy.max_attempts):
+            if not endpoint.breaker.allow():
+                raise AIClientError(
+                    f"Circuit open for endpoint '{endpoint.settings.name}'", retryable=True
+                )
+            try:
+                result = await call(endpoint.client)
+            except asyncio.CancelledError:
+                endpoint.breaker.release_probe()
+                raise
+            except AIClientError as e:
+                if not e.retryable:
+                    # The endpoint answered; the error is specific to this request
+                    endpoint.breaker.record_success()
+                    raise
+                endpoint.breaker.record_failure()
+                if attempt == self.policy.max_attempts - 1:
+                    raise
+                delay = self.policy.delay(attempt, e.retry_after)
+                logger.warning(
+                    f"Endpoint '{endpoint.settings.name}' failed ({e}); "
+                    f"retry {attempt + 1} in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                # Unexpected errors count too, and free a half-open probe slot
+                endpoint.breaker.record_failure()
+                raise
+            endpoint.breaker.record_success()
+            return result
+
+    async def _execute(
+        self,
+        call: Callable[[BaseAIClient], Awaitable[Any]],
+        discard: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> Any:
+        """Run `call` against endpoints in failover order, hedging if configured."""
+        last_error: Optional[BaseException] = None
+        index = 0
+        while index < len(self.endpoints):
+            pending: Dict[asyncio.Task, Endpoint] = {}
+            endpoint = self.endpoints[index]
+            index += 1
+            pending[asyncio.create_task(self._attempt(endpoint, call))] = endpoint
+
+            if self.hedge_after > 0 and index < len(self.endpoints):
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_after)
+                if not done:
+                    hedge = self.endpoints[index]
+                    index += 1
+                    logger.info(f"Hedging request to endpoint '{hedge.settings.name}'")
+                    pending[asyncio.create_task(self._attempt(hedge, call))] = hedge
+
+            try:
+                while pending:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    winner = None
+                    for task in done:
+                        served = pending.pop(task)
+                        if task.exception() is not None:
+                            last_error = task.exception()
+                            logger.warning(f"Endpoint '{served.settings.name}' failed: {last_error}")
+                        elif winner is None:
+                            winner = (task.result(), served)
+                        elif discard:
+                            await discard(task.result())
+                    if winner:
+                        self._served = winner[1]
+                        return winner[0]
+            finally:
+                # Stop the losing hedge; release anything it managed to open
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    results = await asyncio.gather(*pending, return_exceptions=True)
+                    for result in results:
+                        if discard and not isinstance(result, BaseException):
+                            await discard(result)
+
+        raise last_error or AIClientError("No AI endpoint available")
+
+
+def create_resilient_client(settings_list: List[AISettings]) -> ResilientAIClient:
+    """Wrap `create_ai_client` for each AISettings, in failover order.
+
+    Each endpoint is also routed through its outbound rate limiter.
+    """
+    endpoints = [
+        Endpoint(
+            settings=s,
+            client=RateLimitedClient(create_ai_client(s), get_provider_limiter(s.id)),
+            breaker=get_circuit_breaker(s.id),
+        )
+        for s in settings_list
+    ]
+    policy = RetryPolicy(
+        max_attempts=app_settings.ai_retry_max_attempts,
+        base_delay=app_settings.ai_retry_base_delay,
+        max_delay=app_settings.ai_retry_max_delay,
+    )
+    return ResilientAIClient(endpoints, policy, hedge_after=app_settings.ai_hedge_after_seconds)
@@ -0,0 +1,169 @@
+"""
+AI Story Backend - Single-flight Deduplication
+"""
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class _Flight:
+    """One in-flight generation shared by every caller with the same key."""
+
+    def __init__(self, streaming: bool):
+        self.streaming = streaming
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.tokens: List[str] = []
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.waiters = 0
+        self.task: Optional[asyncio.Task] = None
+        # Content of a blocking flight's result, for streaming callers that join it
+        self.text: Callable[[Any], str] = str
+
+    def broadcast(self, item: Any):
+        for queue in self.subscribers:
+            queue.put_nowait(item)
+
+
+class SingleFlight:
+    """Collapse identical concurrent generations into one upstream call.
+
+    The first caller for a key starts the work in a background task; later
+    callers attach to it. Blocking callers (`do`) wait for the final result,
+    streaming callers (`stream`) replay the tokens produced so far and then
+    follow the live stream. A flight is cancelled once nobody is waiting for
+    it any more, so cancelling the last caller stops the generation.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.deduplicated = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._flights
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "deduplicated": self.deduplicated,
+        }
+
+    def _attach(self, key: str, streaming: bool) -> tuple[_Flight, bool]:
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.deduplicated += 1
+            logger.info(f"Joined in-flight generation {key[:24]}")
+            return flight, False
+        flight = _Flight(streaming)
+        self._flights[key] = flight
+        self.started += 1
+        return flight, True
+
+    def _finish(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _abandon(self, key: str, flight: _Flight):
+        """Cancel `flight` if its last caller has left before it finished."""
+        if not flight.subscribers and not flight.waiters and not flight.future.done():
+            # Later callers for the key start a new flight instead of joining this one
+            self._finish(key, flight)
+            flight.task.cancel()
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        text: Callable[[Any], str] = str,
+    ) -> Any:
+        """Run `fn` once per key; concurrent callers share its result.
+
+        `text` extracts the generated content from the result, for streaming
+        callers that join the flight. A caller joining a streaming flight
+        receives the streamed content as a str.
+        """
+        flight, leader = self._attach(key, streaming=False)
+        if leader:
+            flight.text = text
+            flight.task = asyncio.create_task(self._run(key, flight, fn))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.future)
+        finally:
+            flight.waiters -= 1
+            self._abandon(key, flight)
+
+    async def _run(self, key: str, flight: _Flight, fn: Callable[[], Awaitable[Any]]):
+        try:
+            flight.future.set_result(await fn())
+        except asyncio.CancelledError:
+            flight.future.cancel()
+            raise
+        except BaseException as e:
+            flight.future.set_exception(e)
+        finally:
+            self._finish(key, flight)
+
+    async def stream(
+        self, key: str, factory: Callable[[], AsyncIterator[str]]
+    ) -> AsyncGenerator[str, None]:
+        """Stream tokens from the shared generation for `key`."""
+        flight, leader = self._attach(key, streaming=True)
+        if leader:
+            flight.task = asyncio.create_task(self._pump(key, flight, factory))
+
+        if not flight.streaming:
+            # Attached to a blocking generation: deliver the result in one piece
+            flight.waiters += 1
+            try:
+                yield flight.text(await asyncio.shield(flight.future))
+            finally:
+                flight.waiters -= 1
+                self._abandon(key, flight)
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        replay = list(flight.tokens)
+        flight.subscribers.add(queue)
+        try:
+            for token in replay:
+                yield token
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            flight.subscribers.discard(queue)
+            self._abandon(key, flight)
+
+    async def _pump(self, key: str, flight: _Flight, factory: Callable[[], AsyncIterator[str]]):
+        try:
+            async for token in factory():
+                flight.tokens.append(token)
+                flight.broadcast(token)
+            flight.future.set_result("".join(flight.tokens))
+            flight.broadcast(_DONE)
+        except asyncio.CancelledError:
+            flight.future.cancel()
+            flight.broadcast(asyncio.CancelledError())
+            raise
+        except Exception as e:
+            flight.future.set_exception(e)
+            flight.broadcast(e)
+        finally:
+            self._finish(key, flight)
+        # Nobody may await the future of a finished stream; mark it retrieved
+        if flight.future.done() and not flight.future.cancelled():
+            flight.future.exception()
+
+
+# Process-wide registry of in-flight AI generations
+generation_flights = SingleFlight()
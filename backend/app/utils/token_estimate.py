@@ -0,0 +1,91 @@
+"""
+AI Story Backend - Offline Token and Cost Estimates
+"""
+import logging
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Optional
+
+import yaml
+
+from app.utils.cjk import CJK_LETTERS, CJK_SYMBOLS
+
+logger = logging.getLogger(__name__)
+
+# CJK ideographs, kana, hangul and full-width punctuation: roughly one token
+# per character in current BPE vocabularies (a little less for the newest
+# OpenAI ones, a little more for Claude), so they are counted one by one.
+_CJK = CJK_LETTERS + CJK_SYMBOLS
+_SEGMENT_RE = re.compile(rf"([{_CJK}])|([^\W\d_]+)|(\d+)|(\S)")
+
+# Average characters per token inside a Latin word / a run of digits
+_LETTERS_PER_TOKEN = 5
+_DIGITS_PER_TOKEN = 3
+
+_PRICES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "config", "model_prices.yaml"
+)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Estimate the token count of mixed CJK/Latin text without a tokenizer."""
+    if not text:
+        return 0
+    tokens = 0
+    for cjk, word, digits, _symbol in _SEGMENT_RE.findall(text):
+        if cjk:
+            tokens += 1
+        elif word:
+            tokens += math.ceil(len(word) / _LETTERS_PER_TOKEN)
+        elif digits:
+            tokens += math.ceil(len(digits) / _DIGITS_PER_TOKEN)
+        else:
+            tokens += 1
+    return tokens
+
+
+@lru_cache(maxsize=1)
+def load_model_prices() -> Dict[str, dict]:
+    """Load the per-model price table (USD per million tokens)."""
+    try:
+        with open(_PRICES_PATH, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        logger.warning(f"Model price table not found at {_PRICES_PATH}")
+        return {}
+    except Exception as e:
+        logger.warning(f"Failed to load model price table: {e}")
+        return {}
+    return {str(name).lower(): entry or {} for name, entry in data.items()}
+
+
+def get_model_price(model: Optional[str]) -> Optional[dict]:
+    """Price entry for a model name: the longest table key it starts with."""
+    if not model:
+        return None
+    prices = load_model_prices()
+    # "openai/gpt-4o" (OpenRouter style) prices like "gpt-4o"
+    name = model.lower().rsplit("/", 1)[-1]
+    matches = [key for key in prices if name.startswith(key)]
+    if not matches:
+        return None
+    key = max(matches, key=len)
+    return {"key": key, **prices[key]}
+
+
+def estimate_cost(model: Optional[str], input_tokens: int, output_tokens: int) -> Optional[dict]:
+    """Projected USD cost of a call, or None when the model is not in the table."""
+    price = get_model_price(model)
+    if not price:
+        return None
+    input_cost = input_tokens * float(price.get("input", 0)) / 1_000_000
+    output_cost = output_tokens * float(price.get("output", 0)) / 1_000_000
+    return {
+        "price_key": price["key"],
+        "context_window": price.get("context_window"),
+        "input_cost": round(input_cost, 6),
+        "output_cost": round(output_cost, 6),
+        "total_cost": round(input_cost + output_cost, 6),
+    }
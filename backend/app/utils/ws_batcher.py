@@ -0,0 +1,91 @@
+"""
+AI Story Backend - WebSocket Token Frame Batcher
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SendFunc = Callable[[Any], Awaitable[None]]
+
+
+class TokenFrameBatcher:
+    """Coalesce streamed token deltas into fewer `{"type": "token"}` frames.
+
+    Deltas are buffered and sent as one frame when either the flush interval
+    elapses or the buffered size reaches `max_bytes`. `close()` flushes
+    immediately so the final tokens always precede a done/error frame.
+    """
+
+    def __init__(
+        self,
+        send: SendFunc,
+        flush_interval: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self._send = send
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else settings.ws_token_flush_interval_ms / 1000
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else settings.ws_token_flush_bytes
+        self._buffer: List[str] = []
+        self._size = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.frames_sent = 0
+        self.tokens_received = 0
+
+    async def add(self, token: str):
+        """Buffer a token delta, flushing if the byte threshold is reached."""
+        if not token:
+            return
+        self.tokens_received += 1
+        self._buffer.append(token)
+        self._size += len(token.encode("utf-8"))
+
+        if self._size >= self.max_bytes or self.flush_interval <= 0:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.flush_interval)
+        except asyncio.CancelledError:
+            return
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # The owning stream notices a dead socket on its next send
+            logger.debug(f"Deferred token flush failed: {e}")
+
+    async def flush(self):
+        """Send buffered deltas as a single token frame."""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._buffer:
+                return
+            content = "".join(self._buffer)
+            self._buffer.clear()
+            self._size = 0
+            self.frames_sent += 1
+            await self._send({"type": "token", "content": content})
+
+    async def close(self):
+        """Flush whatever is left; call before sending done/error."""
+        await self.flush()
+
+    async def __aenter__(self) -> "TokenFrameBatcher":
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
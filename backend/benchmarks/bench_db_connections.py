@@ -0,0 +1,97 @@
+"""
+AI Story Backend - Database connections held during generation
+
+Usage:
+    python -m benchmarks.bench_db_connections --generations 12 --latency-ms 1000
+
+Starts that many concurrent POST /ai/generate requests against a stub
+provider with fixed latency, samples the number of checked-out database
+connections while the provider is "thinking", and times CRUD requests
+(GET /projects) made during the same window. Uses a throwaway SQLite
+database and lifts the rate limits.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/bench.db"
+os.environ["DEBUG"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["AI_RATE_LIMIT_PER_MINUTE"] = "100000"
+os.environ["AI_RATE_LIMIT_BURST"] = "100"
+os.environ["AI_MAX_CONCURRENT_PER_PROVIDER"] = "100"
+
+import httpx  # noqa: E402
+
+from app.db.base import Base, dispose_async_engine, engine, get_async_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.utils.http_client import http_clients  # noqa: E402
+from benchmarks.stub_server import StubServer  # noqa: E402
+
+
+def _checked_out() -> int:
+    return get_async_engine().pool.checkedout() + engine.pool.checkedout()
+
+
+async def main(generations: int, latency_ms: float):
+    Base.metadata.create_all(bind=engine)
+    transport = httpx.ASGITransport(app=app)
+    async with StubServer(response_delay=latency_ms / 1000) as server, httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await client.post("/api/v1/settings/ai", json={
+            "name": "bench",
+            "api_key": "bench-key",
+            "base_url": server.base_url,
+            "model": "stub-model",
+            "is_default": True,
+        })
+        project_ids = []
+        for i in range(generations):
+            response = await client.post("/api/v1/projects", json={"name": f"bench {i}"})
+            project_ids.append(response.json()["id"])
+
+        async def generate(project_id: int) -> int:
+            response = await client.post("/api/v1/ai/generate", json={
+                "project_id": project_id, "stage_type": "idea", "bypass_cache": True,
+            })
+            return response.status_code
+
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(generate(pid)) for pid in project_ids]
+        # Sample once every request is waiting on the provider
+        while server.requests < generations:
+            await asyncio.sleep(0.005)
+        waiting_since = time.perf_counter()
+        held, crud_ms = [], []
+        while time.perf_counter() - waiting_since < latency_ms / 1000 * 0.75:
+            held.append(_checked_out())
+            crud_start = time.perf_counter()
+            await client.get("/api/v1/projects")
+            crud_ms.append((time.perf_counter() - crud_start) * 1000)
+        statuses = await asyncio.gather(*tasks)
+        elapsed = (time.perf_counter() - start) * 1000
+
+    await http_clients.aclose()
+    await dispose_async_engine()
+    print(f"generations        {statuses.count(200)}/{generations} ok in {elapsed:.0f}ms")
+    print(
+        f"connections held   p50 {statistics.median(held):.0f}  max {max(held)}  "
+        f"while waiting on the provider"
+    )
+    print(
+        f"GET /projects      p50 {statistics.median(crud_ms):.1f}ms  "
+        f"max {max(crud_ms):.1f}ms  ({len(crud_ms)} requests)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--generations", type=int, default=12)
+    parser.add_argument("--latency-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.generations, args.latency_ms))
@@ -0,0 +1,86 @@
+"""
+AI Story Backend - Failover / hedging benchmark against degraded stub servers
+
+Usage:
+    python -m benchmarks.bench_failover --requests 50 --slow-ms 1500 --hedge-ms 200
+
+Runs generations through ResilientAIClient with a primary endpoint that is
+slow (and optionally erroring) and a healthy secondary, with and without
+hedging, and prints the latency distribution and which endpoint served.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+from app.core.security import encrypt_api_key
+from app.models import AISettings
+from app.utils.ai_client import create_ai_client
+from app.utils.http_client import http_clients
+from app.utils.resilience import CircuitBreaker, Endpoint, ResilientAIClient, RetryPolicy
+from benchmarks.stub_server import StubServer
+
+
+def _settings(settings_id: int, name: str, base_url: str) -> AISettings:
+    return AISettings(
+        id=settings_id,
+        name=name,
+        provider="openai",
+        api_key_encrypted=encrypt_api_key("bench-key"),
+        base_url=base_url,
+        model=f"{name}-model",
+        temperature=0.7,
+        top_p=1.0,
+        max_tokens=128,
+    )
+
+
+async def _run(label: str, client: ResilientAIClient, count: int):
+    latencies = []
+    served = Counter()
+    for _ in range(count):
+        start = time.perf_counter()
+        await client.generate("ping")
+        latencies.append((time.perf_counter() - start) * 1000)
+        served[client.served_by.name] += 1
+    latencies.sort()
+    print(
+        f"{label:<10} p50={latencies[len(latencies) // 2]:8.2f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:8.2f}ms "
+        f"max={max(latencies):8.2f}ms mean={statistics.mean(latencies):8.2f}ms "
+        f"served={dict(served)}"
+    )
+
+
+async def main(count: int, slow_ms: float, hedge_ms: float, error_rate_every: int):
+    primary = StubServer(response_delay=slow_ms / 1000)
+    secondary = StubServer()
+    async with primary, secondary:
+        if error_rate_every:
+            primary.fail_first = count // error_rate_every
+
+        def build(hedge_after: float) -> ResilientAIClient:
+            endpoints = []
+            for i, (name, server) in enumerate([("primary", primary), ("secondary", secondary)]):
+                settings = _settings(i + 1, name, server.base_url)
+                endpoints.append(Endpoint(settings, create_ai_client(settings), CircuitBreaker()))
+            return ResilientAIClient(endpoints, RetryPolicy(base_delay=0.05), hedge_after)
+
+        await _run("no-hedge", build(0.0), count)
+        primary.failures = 0
+        await _run("hedged", build(hedge_ms / 1000), count)
+        await http_clients.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--slow-ms", type=float, default=1500.0)
+    parser.add_argument("--hedge-ms", type=float, default=200.0)
+    parser.add_argument(
+        "--error-every", type=int, default=0,
+        help="inject 503s into the first 1/N of primary requests",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.slow_ms, args.hedge_ms, args.error_every))
@@ -0,0 +1,81 @@
+"""
+AI Story Backend - Pooled vs per-request HTTP client benchmark
+
+Usage:
+    python -m benchmarks.bench_http_pool --requests 200 --handshake-ms 30
+
+Compares a fresh `httpx.AsyncClient` per generation (the old behaviour) with
+the pooled registry used by `OpenAIClient`, against a local stub server that
+charges `--handshake-ms` for every new connection.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.core.security import encrypt_api_key
+from app.models import AISettings
+from app.utils.ai_client import OpenAIClient
+from app.utils.http_client import http_clients
+from benchmarks.stub_server import StubServer
+
+
+def _settings(base_url: str) -> AISettings:
+    return AISettings(
+        name="bench",
+        provider="openai",
+        api_key_encrypted=encrypt_api_key("bench-key"),
+        base_url=base_url,
+        model="stub-model",
+        temperature=0.7,
+        top_p=1.0,
+        max_tokens=128,
+    )
+
+
+async def _fresh_client_call(base_url: str):
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            f"{base_url}/chat/completions",
+            headers={"Authorization": "Bearer bench-key"},
+            json={"model": "stub-model", "messages": []},
+        )
+        response.raise_for_status()
+
+
+async def _run(label: str, call, count: int) -> list:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(
+        f"{label:<10} mean={statistics.mean(latencies):7.2f}ms "
+        f"p50={latencies[len(latencies) // 2]:7.2f}ms "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1]:7.2f}ms"
+    )
+    return latencies
+
+
+async def main(count: int, handshake_ms: float):
+    async with StubServer(handshake_delay=handshake_ms / 1000) as server:
+        await _run("fresh", lambda: _fresh_client_call(server.base_url), count)
+        fresh_connections = server.connections
+
+        client = OpenAIClient(_settings(server.base_url))
+        await _run("pooled", lambda: client.generate("ping"), count)
+        pooled_connections = server.connections - fresh_connections
+        await http_clients.aclose()
+
+    print(f"connections: fresh={fresh_connections} pooled={pooled_connections}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=30.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.handshake_ms))
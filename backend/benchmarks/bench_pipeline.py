@@ -0,0 +1,78 @@
+"""
+AI Story Backend - Multi-stage pipeline benchmark against a stub provider
+
+Usage:
+    python -m benchmarks.bench_pipeline --latency-ms 500 --concurrency 3
+
+Generates every stage of a fresh project through PipelineService twice,
+once with concurrency 1 (equivalent to one request per stage) and once with
+the given concurrency, against a stub server with fixed response latency.
+Uses a throwaway SQLite database and lifts the outbound rate limit.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/bench.db"
+os.environ["DEBUG"] = "false"
+os.environ["AI_RATE_LIMIT_PER_MINUTE"] = "100000"
+os.environ["AI_RATE_LIMIT_BURST"] = "100"
+
+from app.db.base import Base, SessionLocal, engine  # noqa: E402
+from app.models import STAGE_ORDER  # noqa: E402
+from app.schemas import ProjectCreate  # noqa: E402
+from app.services import PipelineService, ProjectService, SettingsService  # noqa: E402
+from app.utils.http_client import http_clients  # noqa: E402
+from benchmarks.stub_server import StubServer  # noqa: E402
+
+
+async def _run(label: str, settings_id: int, concurrency: int):
+    db = SessionLocal()
+    try:
+        project = ProjectService(db).create_project(ProjectCreate(name=label, description="bench"))
+        pipeline = PipelineService(db)
+        start = time.perf_counter()
+        async for event in pipeline.run(
+            project.id, list(STAGE_ORDER), settings_id,
+            use_cache=False, max_concurrency=concurrency,
+        ):
+            if event["type"] == "plan":
+                layers = event["layers"]
+            elif event["type"] == "stage_failed":
+                print(f"  {event['stage_type']} failed: {event['error']}")
+        elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        db.close()
+    print(f"{label:<14} {elapsed:9.2f}ms  layers={len(layers)}")
+    return elapsed
+
+
+async def main(latency_ms: float, concurrency: int):
+    Base.metadata.create_all(bind=engine)
+    async with StubServer(response_delay=latency_ms / 1000) as server:
+        db = SessionLocal()
+        settings = SettingsService(db).create_settings({
+            "name": "bench",
+            "api_key": "bench-key",
+            "base_url": server.base_url,
+            "model": "stub-model",
+            "is_default": True,
+        })
+        settings_id = settings.id
+        db.close()
+
+        sequential = await _run("sequential", settings_id, 1)
+        parallel = await _run(f"concurrency={concurrency}", settings_id, concurrency)
+        print(f"speedup: {sequential / parallel:.2f}x")
+        await http_clients.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--concurrency", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.latency_ms, args.concurrency))
@@ -0,0 +1,116 @@
+"""
+AI Story Backend - Full-text search over stage versions
+
+Usage:
+    python -m benchmarks.bench_search --versions 30000 --chars 600
+
+Fills a throwaway SQLite database with random Traditional Chinese stage
+versions (bulk inserted, then indexed with `search_index.rebuild`), then times
+SearchService queries - a rare name, a common word, filtered and unfiltered -
+with the FTS5 index and with the LIKE fallback.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/bench.db"
+os.environ["DEBUG"] = "false"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.db.base import Base, SessionLocal, engine  # noqa: E402
+from app.db.fts import search_index  # noqa: E402
+from app.models import Project, Stage, StageVersion, StageType, STAGE_ORDER  # noqa: E402
+from app.services.search_service import SearchService  # noqa: E402
+
+COMMON = "的一是在不了有和人這中大為上個國我以要他時來用們生到作地於出就分對成會可主發年動同工也能下過子說產種面而方後多定行學法所民得經十三之進著等部度家電力裡如水化高自二理起小物現實加量都兩體制機當使點從業本去把性好應開它合還因由其些然前外天政四日那社義事平形相全表間樣與關各重新線內數正心反你明看原又麼利比或但質氣第向道命此變條只沒結解問意建月公無系軍很情者最立代想已通並提直題黨程展五果料象員革位入常文總次品式活設及管特件長求老頭基資邊流路級少圖山統接知較將組見計別她手角期根論運農指幾九區強放決西被幹做必戰先回則任取據處隊南給色光門即保治北造百規熱領七海口東導器壓志世金增爭濟階油思術極交受聯什認六共權收證改清己美再採轉更單風切打白教速花帶安場身車例真務具萬每目至達走積示議聲報鬥完類八離華名確才科張信馬節話米整空元況今集溫傳土許步群廣石記需段研界拉林律叫且究觀越織裝影算低持音眾書布复容兒須際商非驗連斷深難近礦千週委素技備半辦青省列習響約支般史感勞便團往酸歷市克何除消構府稱太準精值號率族維劃選標寫存候毛親快效斯院查江型眼王按格養易置派層片始卻專狀育廠京識適屬圓包火住調滿縣局照參紅細引聽該鐵價嚴"
+NAMES = ["林雨晴", "陳子昂", "白夜行", "江心月"]
+
+
+def _paragraph(chars: int) -> str:
+    text = "".join(random.choices(COMMON, k=chars))
+    # A character name in about 1% of versions
+    if random.random() < 0.01:
+        at = random.randrange(chars)
+        text = text[:at] + random.choice(NAMES) + text[at:]
+    return text
+
+
+def fill(versions: int, chars: int) -> float:
+    Base.metadata.create_all(bind=engine)
+    search_index.ensure(engine)
+    per_stage = 10
+    stages_needed = versions // per_stage
+    projects = max(1, stages_needed // len(STAGE_ORDER))
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        db.execute(insert(Project), [
+            {"name": f"專案 {i}", "description": "", "category": "", "tags": "[]"}
+            for i in range(projects)
+        ])
+        db.execute(insert(Stage), [
+            {"project_id": p + 1, "stage_type": stage_type, "content": _paragraph(chars)}
+            for p in range(projects) for stage_type in STAGE_ORDER
+        ])
+        stage_count = projects * len(STAGE_ORDER)
+        batch = []
+        for i in range(versions):
+            batch.append({
+                "stage_id": i % stage_count + 1,
+                "version_number": i // stage_count + 1,
+                "content": _paragraph(chars),
+                "source": "ai",
+            })
+            if len(batch) == 2000:
+                db.execute(insert(StageVersion), batch)
+                batch.clear()
+        if batch:
+            db.execute(insert(StageVersion), batch)
+        db.commit()
+    # Core bulk inserts bypass the ORM events that keep the indexes in sync
+    search_index.rebuild(engine)
+    return time.perf_counter() - start
+
+
+def time_queries(label: str, repeats: int):
+    cases = [
+        ("rare name", {"query": "林雨晴"}),
+        ("bigram", {"query": "發展"}),
+        ("common chars", {"query": "的 是"}),
+        ("+ stage_type", {"query": "的", "stage_type": StageType.STORY}),
+        ("+ project", {"query": "的", "project_id": 1}),
+    ]
+    with SessionLocal() as db:
+        service = SearchService(db)
+        for name, kwargs in cases:
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                hits = service.search(**kwargs)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(
+                f"{label:<6}{name:<14}p50 {statistics.median(timings):8.2f}ms  "
+                f"max {max(timings):8.2f}ms  ({len(hits)} hits)"
+            )
+
+
+def main(versions: int, chars: int, repeats: int):
+    random.seed(7)
+    elapsed = fill(versions, chars)
+    print(f"indexed {versions} versions of ~{chars} chars in {elapsed:.1f}s")
+    time_queries("fts", repeats)
+    search_index.available = False
+    time_queries("like", max(1, repeats // 5))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--versions", type=int, default=30000)
+    parser.add_argument("--chars", type=int, default=600)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    main(args.versions, args.chars, args.repeats)
@@ -0,0 +1,114 @@
+"""
+AI Story Backend - SQLite write concurrency (default vs production profile)
+
+Usage:
+    python -m benchmarks.bench_sqlite_writes --clients 32 --requests 50
+
+Each client autosaves its own stage (PUT /projects/{id}/stages/idea) and
+reads it back every few saves, all clients at once, against a throwaway
+SQLite file. Runs once with the default settings and once with
+SQLITE_PRODUCTION=true, each in a fresh process, and reports throughput,
+latency percentiles and failed requests ("database is locked" surfaces as
+500s). SQL echo is off in both runs so only the database setup differs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+READS_EVERY = 4  # One GET after every few PUTs
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(clients: int, requests: int) -> dict:
+    import httpx
+
+    from app.db.base import Base, engine
+    from app.db.write_queue import write_queue
+    from app.main import app
+
+    Base.metadata.create_all(bind=engine)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        project_ids = []
+        for i in range(clients):
+            response = await client.post("/api/v1/projects", json={"name": f"bench {i}"})
+            project_ids.append(response.json()["id"])
+
+        latencies, failures = [], 0
+
+        async def autosave(project_id: int):
+            nonlocal failures
+            url = f"/api/v1/projects/{project_id}/stages/idea"
+            for i in range(requests):
+                start = time.perf_counter()
+                if i % READS_EVERY == READS_EVERY - 1:
+                    response = await client.get(url)
+                else:
+                    response = await client.put(url, json={"content": f"draft {i} " * 50})
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(autosave(pid) for pid in project_ids))
+        elapsed = time.perf_counter() - start
+    await write_queue.close()
+    return {
+        "requests": len(latencies),
+        "failures": failures,
+        "throughput": len(latencies) / elapsed,
+        "p50": _percentile(latencies, 50),
+        "p99": _percentile(latencies, 99),
+        "batches": write_queue.batches,
+        "writes": write_queue.writes,
+    }
+
+
+def _run_profile(production: bool, clients: int, requests: int) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/bench.db",
+        "DEBUG": "false",
+        "RATE_LIMIT_ENABLED": "false",
+        "SQLITE_PRODUCTION": "true" if production else "false",
+    }
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_sqlite_writes",
+         "--clients", str(clients), "--requests", str(requests), "--child"],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(clients: int, requests: int):
+    print(f"{clients} clients x {requests} requests (1 in {READS_EVERY} a read)")
+    print(f"{'profile':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'failed':>8}")
+    for name, production in (("default", False), ("production", True)):
+        result = _run_profile(production, clients, requests)
+        print(
+            f"{name:<12}{result['throughput']:>10.0f}{result['p50']:>10.1f}"
+            f"{result['p99']:>10.1f}{result['failures']:>8}"
+        )
+        if production:
+            print(f"write queue: {result['writes']} writes in {result['batches']} commits")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(run(args.clients, args.requests))))
+    else:
+        main(args.clients, args.requests)
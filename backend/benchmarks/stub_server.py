@@ -0,0 +1,224 @@
+"""
+AI Story Backend - Local OpenAI-compatible stub server for benchmarks
+
+A tiny asyncio HTTP/1.1 server (keep-alive aware) that answers
+`POST /chat/completions` (blocking or SSE streaming), the Anthropic-style
+`POST /messages` (blocking or SSE streaming) and `GET /models` without any
+network access.
+`handshake_delay` is paid once per new TCP connection to model the cost of a
+TLS handshake against a real provider; `fail_first`/`fail_status` and the
+delay knobs inject errors and latency for resilience testing.
+"""
+import asyncio
+import json
+from http import HTTPStatus
+from typing import Optional, Tuple
+
+
+class StubServer:
+    """OpenAI- and Anthropic-compatible stub used by the benchmark scripts."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        handshake_delay: float = 0.0,
+        response_delay: float = 0.0,
+        content: str = "stub completion",
+        token_delay: float = 0.0,
+        fail_first: int = 0,
+        fail_status: int = 503,
+        retry_after: Optional[float] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.handshake_delay = handshake_delay
+        self.response_delay = response_delay
+        self.content = content
+        self.token_delay = token_delay
+        # Error injection: the first `fail_first` completions get `fail_status`
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.failures = 0
+        self.connections = 0
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self) -> "StubServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, dict, bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode().split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0"))
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                self.requests += 1
+                if self.response_delay:
+                    await asyncio.sleep(self.response_delay)
+                request_json = json.loads(body or b"{}")
+                is_completion = path.endswith(("/chat/completions", "/messages"))
+                if is_completion and self.failures < self.fail_first:
+                    self.failures += 1
+                    await self._write_json(
+                        writer, self.fail_status, {"error": "injected failure"},
+                        {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {},
+                    )
+                    continue
+                if path.endswith("/messages") and request_json.get("stream"):
+                    await self._stream_messages(writer)
+                    continue
+                if path.endswith("/chat/completions") and request_json.get("stream"):
+                    include_usage = request_json.get("stream_options", {}).get("include_usage", False)
+                    await self._stream(writer, include_usage)
+                    continue
+                status, payload = self.respond(method, path, body)
+                await self._write_json(writer, status, payload)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write_json(
+        self, writer: asyncio.StreamWriter, status: int, payload: dict, headers: dict = None
+    ):
+        data = json.dumps(payload).encode()
+        try:
+            phrase = HTTPStatus(status).phrase
+        except ValueError:
+            phrase = "Error"  # Provider-specific codes such as 529
+        extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        writer.write(
+            f"HTTP/1.1 {status} {phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"{extra}"
+            "Connection: keep-alive\r\n\r\n".encode() + data
+        )
+        await writer.drain()
+
+    async def _stream(self, writer: asyncio.StreamWriter, include_usage: bool = False):
+        """Answer a streaming completion with chunked SSE, one token per event."""
+        events = [
+            {"choices": [{"delta": {"content": token}}]} for token in self.tokens()
+        ]
+        if include_usage:
+            # OpenAI sends usage in a final chunk with an empty choices list
+            events.append({
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": 10,
+                    "completion_tokens": len(events),
+                    "total_tokens": 10 + len(events),
+                },
+            })
+        lines = [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]
+        await self._write_chunks(writer, lines)
+
+    async def _stream_messages(self, writer: asyncio.StreamWriter):
+        """Answer a streaming Anthropic Messages request with typed SSE events."""
+        tokens = self.tokens()
+        events = [
+            ("message_start", {"type": "message_start", "message": {
+                "model": "stub-model",
+                "usage": {"input_tokens": 4, "cache_read_input_tokens": 6, "output_tokens": 1},
+            }}),
+            ("content_block_start", {"type": "content_block_start", "index": 0,
+                                     "content_block": {"type": "text", "text": ""}}),
+            ("ping", {"type": "ping"}),
+        ]
+        events += [
+            ("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                     "delta": {"type": "text_delta", "text": token}})
+            for token in tokens
+        ]
+        events += [
+            ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+            ("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                               "usage": {"output_tokens": len(tokens)}}),
+            ("message_stop", {"type": "message_stop"}),
+        ]
+        lines = [f"event: {name}\ndata: {json.dumps(event)}\n\n" for name, event in events]
+        await self._write_chunks(writer, lines)
+
+    async def _write_chunks(self, writer: asyncio.StreamWriter, lines: list):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        for line in lines:
+            data = line.encode()
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def tokens(self) -> list:
+        """Split the canned content into stream deltas."""
+        words = self.content.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def respond(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        """Build the JSON response for a request."""
+        if path.endswith("/models"):
+            return 200, {"data": [{"id": "stub-model"}]}
+        if path.endswith("/chat/completions"):
+            return 200, {
+                "choices": [{"message": {"role": "assistant", "content": self.content}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+            }
+        if path.endswith("/messages"):
+            return 200, {
+                "type": "message",
+                "model": "stub-model",
+                "content": [{"type": "text", "text": self.content}],
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": 4, "cache_read_input_tokens": 6, "output_tokens": 3},
+            }
+        return 404, {"error": "not found"}
@@ -0,0 +1,142 @@
+"""
+AI Story Backend - Test Fixtures
+"""
+import asyncio
+import json
+import os
+import tempfile
+
+# Configure a throwaway database before the app reads its settings
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ["DEBUG"] = "false"
+os.environ["JOB_WORKER_COUNT"] = "0"
+os.environ["GENERATION_CACHE_ENABLED"] = "false"
+os.environ["AI_RATE_LIMIT_PER_MINUTE"] = "0"
+os.environ["AI_RETRY_BASE_DELAY"] = "0"
+os.environ["AI_HEDGE_AFTER_SECONDS"] = "0"
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from app.db.base import Base, SessionLocal, dispose_async_engine, engine  # noqa: E402
+from app.db.fts import search_index  # noqa: E402
+from app.models import Stage, StageStatus  # noqa: E402
+from app.schemas import ProjectCreate  # noqa: E402
+from app.services import ProjectService, SettingsService  # noqa: E402
+from app.utils import provider_limiter, resilience  # noqa: E402
+from app.utils.http_client import http_clients  # noqa: E402
+from app.utils.single_flight import generation_flights  # noqa: E402
+
+
+class FakeProvider:
+    """OpenAI-compatible provider served through httpx.MockTransport.
+
+    `delay` (seconds, or a callable of the request) holds each completion;
+    `fail` (a callable of the request returning a status code or None)
+    injects errors. Every request is kept in `requests`.
+    """
+
+    def __init__(self, content: str = "generated text"):
+        self.content = content
+        self.delay = 0.0
+        self.fail = None
+        self.requests = []
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        delay = self.delay(request) if callable(self.delay) else self.delay
+        if delay:
+            await asyncio.sleep(delay)
+        status = self.fail(request) if self.fail else None
+        if status:
+            return httpx.Response(status, json={"error": "injected failure"})
+        return httpx.Response(200, json={
+            "id": "fake",
+            "model": json.loads(request.content or b"{}").get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 3},
+        })
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    Base.metadata.create_all(bind=engine)
+    search_index.ensure(engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def fresh_process_state():
+    """Per-process registries hold asyncio objects bound to one event loop."""
+    provider_limiter._limiters.clear()
+    resilience._breakers.clear()
+    generation_flights._flights.clear()
+    http_clients._clients.clear()
+    yield
+    http_clients._clients.clear()
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a new event loop, closing async DB connections after."""
+    def runner(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await dispose_async_engine()
+        return asyncio.run(main())
+    return runner
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def fake_provider(monkeypatch) -> FakeProvider:
+    """Route every pooled outbound HTTP client to a FakeProvider."""
+    provider = FakeProvider()
+    monkeypatch.setattr(
+        http_clients, "_create_client",
+        lambda: httpx.AsyncClient(transport=provider.transport()),
+    )
+    return provider
+
+
+@pytest.fixture
+def ai_settings(db):
+    """Default AI settings pointing at the fake provider."""
+    return SettingsService(db).create_settings({
+        "name": "fake",
+        "provider": "openai",
+        "api_key": "test-key",
+        "base_url": "http://fake-provider/v1",
+        "model": "fake-model",
+        "is_default": True,
+    })
+
+
+@pytest.fixture
+def project(db):
+    """A new project whose idea, story and script stages already have content."""
+    service = ProjectService(db)
+    project = service.create_project(ProjectCreate(name="Test project", description="d"))
+    for stage in db.query(Stage).filter(Stage.project_id == project.id):
+        if stage.stage_type.value in ("idea", "story", "script"):
+            stage.content = f"{stage.stage_type.value} content"
+            stage.status = StageStatus.COMPLETED
+    db.commit()
+    return project
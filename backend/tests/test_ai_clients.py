@@ -0,0 +1,180 @@
+"""
+AI Story Backend - Provider Adapter Tests
+"""
+import json
+
+import httpx
+import pytest
+
+from app.services import SettingsService
+from app.utils.ai_client import (
+    AIClientError,
+    AnthropicClient,
+    LocalOpenAIClient,
+    OpenAIClient,
+    create_ai_client,
+)
+from app.utils.http_client import http_clients
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Serve outbound requests with `provider.respond(request)`; keep the requests."""
+    class Provider:
+        respond = None
+        requests = []
+
+        def handle(self, request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return self.respond(request)
+
+    stub = Provider()
+    monkeypatch.setattr(
+        http_clients, "_create_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(stub.handle)),
+    )
+    return stub
+
+
+def make_settings(db, provider: str, base_url: str, api_key: str = "test-key", **extra):
+    return SettingsService(db).create_settings({
+        "name": f"{provider} adapter",
+        "provider": provider,
+        "api_key": api_key,
+        "base_url": base_url,
+        "model": f"{provider}-model",
+        **extra,
+    })
+
+
+def sse(*events) -> bytes:
+    return "".join(
+        f"event: {event}\ndata: {json.dumps(data)}\n\n" for event, data in events
+    ).encode()
+
+
+def collect(run, stream):
+    async def consume():
+        return [token async for token in stream]
+    return run(consume())
+
+
+def test_claude_settings_route_by_endpoint(db):
+    assert isinstance(
+        create_ai_client(make_settings(db, "claude", "https://api.anthropic.com/v1")),
+        AnthropicClient,
+    )
+    assert isinstance(
+        create_ai_client(make_settings(db, "anthropic", "https://api.anthropic.com/v1")),
+        AnthropicClient,
+    )
+    # Older "claude" settings may point at an OpenAI-compatible gateway
+    gateway = create_ai_client(make_settings(db, "claude", "https://openrouter.ai/api/v1"))
+    assert type(gateway) is OpenAIClient
+    assert isinstance(
+        create_ai_client(make_settings(db, "ollama", "http://localhost:11434/v1")),
+        LocalOpenAIClient,
+    )
+
+
+def test_anthropic_generate_sends_the_prompt_as_a_cached_user_block(db, provider, run):
+    provider.respond = lambda request: httpx.Response(200, json={
+        "model": "claude-test",
+        "content": [{"type": "text", "text": "Once "}, {"type": "text", "text": "upon"}],
+        "stop_reason": "end_turn",
+        "usage": {
+            "input_tokens": 5, "cache_read_input_tokens": 3,
+            "cache_creation_input_tokens": 2, "output_tokens": 7,
+        },
+    })
+    client = create_ai_client(
+        make_settings(db, "anthropic", "https://api.anthropic.com/v1", temperature=1.5)
+    )
+    result = run(client.generate("Write the idea.\nStory: a lighthouse"))
+
+    assert result.content == "Once upon"
+    assert result.model == "claude-test"
+    assert (result.usage.prompt_tokens, result.usage.completion_tokens) == (10, 7)
+    assert result.usage.cached_tokens == 3
+
+    request = provider.requests[-1]
+    assert request.url == "https://api.anthropic.com/v1/messages"
+    assert request.headers["x-api-key"] == "test-key"
+    assert "authorization" not in request.headers
+    assert request.headers["anthropic-version"]
+    body = json.loads(request.content)
+    # The rendered stage prompt (system instructions included) is one user
+    # message; the Messages API rejects OpenAI-style system-role messages
+    assert [m["role"] for m in body["messages"]] == ["user"]
+    block = body["messages"][0]["content"][0]
+    assert block["text"] == "Write the idea.\nStory: a lighthouse"
+    assert block["cache_control"] == {"type": "ephemeral"}
+    assert body["temperature"] == 1.0  # Anthropic's maximum
+    assert "stream" not in body
+
+
+def test_anthropic_stream_yields_text_deltas_and_usage(db, provider, run):
+    provider.respond = lambda request: httpx.Response(200, content=sse(
+        ("message_start", {"type": "message_start",
+                           "message": {"usage": {"input_tokens": 4, "output_tokens": 1}}}),
+        ("ping", {"type": "ping"}),
+        ("content_block_delta", {"type": "content_block_delta",
+                                 "delta": {"type": "text_delta", "text": "Hel"}}),
+        ("content_block_delta", {"type": "content_block_delta",
+                                 "delta": {"type": "input_json_delta", "partial_json": "{}"}}),
+        ("content_block_delta", {"type": "content_block_delta",
+                                 "delta": {"type": "text_delta", "text": "lo"}}),
+        ("message_delta", {"type": "message_delta", "usage": {"output_tokens": 6}}),
+        ("message_stop", {"type": "message_stop"}),
+    ), headers={"content-type": "text/event-stream"})
+    client = create_ai_client(make_settings(db, "anthropic", "https://api.anthropic.com/v1"))
+
+    assert collect(run, client.stream_generate("prompt")) == ["Hel", "lo"]
+    assert (client.last_usage.prompt_tokens, client.last_usage.completion_tokens) == (4, 6)
+    assert json.loads(provider.requests[-1].content)["stream"] is True
+
+
+def test_anthropic_overloaded_errors_are_retryable(db, provider, run):
+    provider.respond = lambda request: httpx.Response(529, json={
+        "type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"},
+    })
+    client = create_ai_client(make_settings(db, "anthropic", "https://api.anthropic.com/v1"))
+    with pytest.raises(AIClientError) as error:
+        run(client.generate("prompt"))
+    assert error.value.retryable
+    assert error.value.status_code == 529
+
+
+def test_local_server_without_key_reports_llama_cpp_timings(db, provider, run):
+    provider.respond = lambda request: httpx.Response(200, json={
+        "model": "llama",
+        "choices": [{"message": {"content": "local text"}, "finish_reason": "stop"}],
+        "timings": {"prompt_n": 12, "predicted_n": 4},
+    })
+    client = create_ai_client(make_settings(db, "local", "http://localhost:8080/v1", api_key=""))
+    result = run(client.generate("prompt"))
+
+    assert result.content == "local text"
+    assert (result.usage.prompt_tokens, result.usage.completion_tokens) == (12, 4)
+    request = provider.requests[-1]
+    assert request.url == "http://localhost:8080/v1/chat/completions"
+    assert "authorization" not in request.headers
+
+
+def test_local_stream_yields_deltas_and_final_usage(db, provider, run):
+    chunks = [
+        {"choices": [{"delta": {"role": "assistant"}}]},
+        {"choices": [{"delta": {"content": "lo"}}]},
+        {"choices": [{"delta": {"content": "cal"}}]},
+        {"choices": [{"delta": {}, "finish_reason": "stop"}],
+         "timings": {"prompt_n": 9, "predicted_n": 2}},
+    ]
+    body = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+    provider.respond = lambda request: httpx.Response(
+        200, content=body.encode(), headers={"content-type": "text/event-stream"}
+    )
+    client = create_ai_client(make_settings(db, "ollama", "http://localhost:11434/v1"))
+
+    assert collect(run, client.stream_generate("prompt")) == ["lo", "cal"]
+    assert (client.last_usage.prompt_tokens, client.last_usage.completion_tokens) == (9, 2)
+    assert provider.requests[-1].headers["authorization"] == "Bearer test-key"
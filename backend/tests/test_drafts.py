@@ -0,0 +1,50 @@
+"""
+AI Story Backend - Streamed Draft Checkpoint Tests
+"""
+import time
+from datetime import datetime, timedelta
+
+from app.models import Stage, StageVersion
+from app.services.ai_service import AIService, StageRef
+from app.services.telemetry_service import GenerationTimer
+
+
+def first_stage(db, project) -> StageRef:
+    stage = db.query(Stage).filter(Stage.project_id == project.id).first()
+    return StageRef(stage.id, stage.project_id, stage.stage_type)
+
+
+def test_only_drafts_without_recent_checkpoints_are_finalized(db, project, ai_settings):
+    service = AIService(db)
+    stage = first_stage(db, project)
+    stale_id = service._checkpoint(db, stage, None, "left by a dead worker", ai_settings)
+    live_id = service._checkpoint(db, stage, None, "still streaming", ai_settings)
+    db.get(StageVersion, stale_id).updated_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+
+    assert service.finalize_stale_drafts() == 1
+    db.expire_all()
+    assert db.get(StageVersion, stale_id).source == "partial"
+    assert db.get(StageVersion, live_id).source == "draft"
+
+
+def test_failed_checkpoint_keeps_the_previous_draft(db, project, ai_settings, monkeypatch):
+    service = AIService(db)
+    stage = first_stage(db, project)
+    draft_id = service._checkpoint(db, stage, None, "first", ai_settings)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(service, "_update_version", fail)
+    assert service._checkpoint(db, stage, draft_id, "first second", ai_settings) == draft_id
+    db.expire_all()
+    assert db.get(StageVersion, draft_id).content == "first"
+
+
+def test_paused_time_is_left_out_of_latency():
+    timer = GenerationTimer()
+    with timer.paused():
+        time.sleep(0.2)
+    timer.stop()
+    assert timer.latency_ms < 100
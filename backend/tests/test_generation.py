@@ -0,0 +1,42 @@
+"""
+AI Story Backend - Generation API Tests
+"""
+import httpx
+from sqlalchemy import select
+
+from app.main import app
+from app.models import AISettings, GenerationTelemetry
+from app.services import SettingsService
+
+
+def test_generate_reports_the_model_that_served_a_failover(db, project, ai_settings,
+                                                           fake_provider, run):
+    db.query(AISettings).filter(AISettings.id != ai_settings.id).update({"is_active": False})
+    backup = SettingsService(db).create_settings({
+        "name": "backup",
+        "provider": "openai",
+        "api_key": "test-key",
+        "base_url": "http://backup/v1",
+        "model": "backup-model",
+    })
+    fake_provider.fail = lambda request: 503 if request.url.host == "fake-provider" else None
+
+    async def generate():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/v1/ai/generate", json={
+                "project_id": project.id, "stage_type": "character", "bypass_cache": True,
+            })
+
+    response = run(generate())
+    assert response.status_code == 200
+    assert response.json()["model"] == "backup-model"
+
+    db.expire_all()
+    stmt = (
+        select(GenerationTelemetry)
+        .where(GenerationTelemetry.project_id == project.id)
+        .where(GenerationTelemetry.status == "success")
+    )
+    telemetry = db.execute(stmt).scalars().one()
+    assert (telemetry.settings_id, telemetry.model) == (backup.id, "backup-model")
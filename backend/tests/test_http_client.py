@@ -0,0 +1,41 @@
+"""
+AI Story Backend - Pooled HTTP Client Tests
+"""
+import asyncio
+
+from app.utils.http_client import HTTPClientRegistry
+
+
+def test_evicted_client_stays_open_until_its_last_lease_ends(run):
+    registry = HTTPClientRegistry(max_clients=1)
+
+    async def scenario():
+        async with registry.lease("http://a") as a:
+            async with registry.lease("http://a") as same:
+                assert same is a
+                registry.get("http://b")  # Evicts a while two requests use it
+                await asyncio.sleep(0)
+                assert not a.is_closed
+            await asyncio.sleep(0)
+            assert not a.is_closed
+        await asyncio.sleep(0.01)
+        assert a.is_closed
+
+        async with registry.lease("http://a") as fresh:
+            assert fresh is not a and not fresh.is_closed
+        await registry.aclose()
+
+    run(scenario())
+
+
+def test_unleased_clients_are_closed_on_eviction(run):
+    registry = HTTPClientRegistry(max_clients=1)
+
+    async def scenario():
+        a = registry.get("http://a")
+        registry.get("http://b")
+        await asyncio.sleep(0.01)
+        assert a.is_closed
+        await registry.aclose()
+
+    run(scenario())
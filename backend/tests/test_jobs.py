@@ -0,0 +1,71 @@
+"""
+AI Story Backend - Background Generation Job Tests
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.base import AsyncSessionLocal
+from app.models import GenerationJob, JobStatus, StageType
+from app.services.job_service import JobService, JobWorkerPool
+
+
+@pytest.fixture(autouse=True)
+def empty_queue(db):
+    """Workers claim the oldest queued job; leave none from other tests."""
+    db.query(GenerationJob).update({GenerationJob.status: JobStatus.CANCELLED})
+    db.commit()
+
+
+def make_pool() -> JobWorkerPool:
+    return JobWorkerPool(concurrency=1, poll_interval=0.05, retry_base_delay=0, stale_after=60)
+
+
+async def claim_and_run(pool: JobWorkerPool):
+    async with AsyncSessionLocal() as db:
+        job = await db.run_sync(lambda session: JobService(session).claim_next(pool.worker_id))
+        await pool._run_job(db, job)
+        return job.id
+
+
+def test_only_jobs_with_a_stale_heartbeat_are_requeued(db, project):
+    service = JobService(db)
+    live = service.create_job(project.id, StageType.CHARACTER)
+    dead = service.create_job(project.id, StageType.SCENE)
+    assert service.claim_next("other-process").id == live.id
+    assert service.claim_next("dead-process").id == dead.id
+    dead.heartbeat_at = datetime.utcnow() - timedelta(minutes=5)
+    db.commit()
+
+    assert service.requeue_interrupted(stale_after=60) == 1
+    db.expire_all()
+    assert live.status == JobStatus.RUNNING and live.worker_id == "other-process"
+    assert dead.status == JobStatus.QUEUED and dead.worker_id is None
+    # The worker that lost its job can no longer heartbeat it
+    assert service.heartbeat(dead.id, "dead-process") is None
+    assert service.heartbeat(live.id, "other-process") is False
+
+
+def test_transient_provider_errors_are_retried(db, project, ai_settings, fake_provider, run):
+    fake_provider.fail = lambda request: 503
+    job = JobService(db).create_job(project.id, StageType.CHARACTER)
+    run(claim_and_run(make_pool()))
+
+    db.expire_all()
+    job = db.get(GenerationJob, job.id)
+    assert job.status == JobStatus.QUEUED
+    assert job.attempts == 1
+
+
+def test_permanent_errors_fail_the_job_at_once(db, project, ai_settings, fake_provider, run):
+    fake_provider.fail = lambda request: 400
+    rejected = JobService(db).create_job(project.id, StageType.CHARACTER)
+    run(claim_and_run(make_pool()))
+    missing = JobService(db).create_job(project.id, StageType.SCENE, settings_id=10**6)
+    run(claim_and_run(make_pool()))
+
+    db.expire_all()
+    for job_id in (rejected.id, missing.id):
+        job = db.get(GenerationJob, job_id)
+        assert job.status == JobStatus.FAILED
+        assert job.attempts == 1
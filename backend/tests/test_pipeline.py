@@ -0,0 +1,61 @@
+"""
+AI Story Backend - Pipeline Tests
+"""
+import random
+
+from app.models import Stage, StageStatus, StageType
+from app.services.ai_service import AIService, StageRef
+from app.services.pipeline_service import PipelineService
+
+# Stages that depend on story and script only, so a pipeline runs them together
+LAYER = [StageType.CHARACTER, StageType.SCENE, StageType.STORYBOARD]
+
+
+def _stages(db, project_id):
+    db.expire_all()
+    return {s.stage_type: s for s in db.query(Stage).filter(Stage.project_id == project_id)}
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+def test_unlock_only_touches_a_locked_next_stage(db, project):
+    stages = _stages(db, project.id)
+    scene = stages[StageType.SCENE]
+    stages[StageType.STORYBOARD].status = StageStatus.IN_PROGRESS
+    stages[StageType.IMAGE_PROMPT].status = StageStatus.LOCKED
+    db.commit()
+
+    service = AIService(db)
+    service._unlock_next_stage(db, StageRef(scene.id, project.id, StageType.SCENE))
+    storyboard = stages[StageType.STORYBOARD]
+    service._unlock_next_stage(db, StageRef(storyboard.id, project.id, StageType.STORYBOARD))
+    db.commit()
+
+    stages = _stages(db, project.id)
+    assert stages[StageType.STORYBOARD].status == StageStatus.IN_PROGRESS
+    assert stages[StageType.IMAGE_PROMPT].status == StageStatus.UNLOCKED
+
+
+def test_parallel_stages_of_one_layer_keep_their_status(
+    db, project, ai_settings, fake_provider, run
+):
+    # Random response times make the stages finish in a different order each round
+    fake_provider.delay = lambda request: random.uniform(0, 0.05)
+    for _ in range(10):
+        for stage_type, stage in _stages(db, project.id).items():
+            if stage_type in LAYER:
+                stage.content = ""
+                stage.status = StageStatus.LOCKED
+        db.commit()
+
+        events = run(_collect(PipelineService(db).run(
+            project.id, LAYER, ai_settings.id, use_cache=False, max_concurrency=3,
+        )))
+
+        assert events[-1]["completed"] == [s.value for s in LAYER]
+        stages = _stages(db, project.id)
+        for stage_type in LAYER:
+            assert stages[stage_type].content == fake_provider.content
+            assert stages[stage_type].status == StageStatus.IN_PROGRESS
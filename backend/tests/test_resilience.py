@@ -0,0 +1,110 @@
+"""
+AI Story Backend - Retry, Circuit Breaker and Failover Tests
+"""
+import time
+
+import pytest
+
+from app.models import AISettings
+from app.services import SettingsService
+from app.utils.ai_client import BaseAIClient
+from app.utils.resilience import (
+    CircuitBreaker,
+    Endpoint,
+    ResilientAIClient,
+    RetryPolicy,
+    create_resilient_client,
+)
+
+
+def endpoint_settings(db, name: str) -> AISettings:
+    return SettingsService(db).create_settings({
+        "name": name,
+        "provider": "openai",
+        "api_key": "test-key",
+        "base_url": f"http://{name}/v1",
+        "model": f"{name}-model",
+    })
+
+
+class BrokenClient(BaseAIClient):
+    """A client failing with an error that is not an AIClientError."""
+
+    def __init__(self):
+        pass
+
+    async def generate(self, prompt: str, **kwargs):
+        raise RuntimeError("adapter bug")
+
+    async def stream_generate(self, prompt: str, **kwargs):
+        raise RuntimeError("adapter bug")
+        yield
+
+    async def test_connection(self):
+        return False, "broken"
+
+
+def test_breaker_opens_then_probes_once_half_open():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # One probe at a time
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_unexpected_errors_release_the_half_open_probe(run):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    client = ResilientAIClient(
+        [Endpoint(AISettings(name="broken"), BrokenClient(), breaker)],
+        RetryPolicy(max_attempts=1),
+    )
+    with pytest.raises(RuntimeError):
+        run(client.generate("prompt"))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()  # The failed probe did not keep the slot
+
+
+def test_failover_to_the_next_endpoint(db, fake_provider, run):
+    primary, secondary = endpoint_settings(db, "primary"), endpoint_settings(db, "secondary")
+    fake_provider.fail = lambda request: 503 if request.url.host == "primary" else None
+    client = create_resilient_client([primary, secondary])
+
+    result = run(client.generate("prompt"))
+    assert result.content == "generated text"
+    assert client.served_by.id == secondary.id
+    hosts = [request.url.host for request in fake_provider.requests]
+    assert hosts == ["primary"] * client.policy.max_attempts + ["secondary"]
+    assert client.endpoints[0].breaker.failures == client.policy.max_attempts
+
+
+def test_hedged_request_wins_over_a_slow_endpoint(db, fake_provider, run):
+    primary, secondary = endpoint_settings(db, "primary"), endpoint_settings(db, "secondary")
+    fake_provider.delay = lambda request: 2.0 if request.url.host == "primary" else 0.0
+    client = create_resilient_client([primary, secondary])
+    client.hedge_after = 0.05
+
+    async def timed():
+        start = time.perf_counter()
+        result = await client.generate("prompt")
+        return result, time.perf_counter() - start
+
+    result, elapsed = run(timed())
+    assert result.content == "generated text"
+    assert client.served_by.id == secondary.id
+    assert elapsed < 1.0  # The slow primary was cancelled, not awaited
@@ -0,0 +1,90 @@
+"""
+AI Story Backend - Full-Text Search Index Tests
+"""
+import sqlite3
+
+from app.db.base import engine
+from app.db.fts import search_index
+from app.models import Stage, StageVersion
+from app.schemas import ProjectCreate, ProjectUpdate
+from app.services import ProjectService, SearchService
+
+
+def raw_connection() -> sqlite3.Connection:
+    """A plain sqlite3 connection, as used by the CLI, migrations or backup tools."""
+    return sqlite3.connect(engine.url.database)
+
+
+def search(db, text: str):
+    db.expire_all()
+    projects, _, _ = ProjectService(db).list_projects(search=text, page_size=100)
+    return {p.id for p in projects}
+
+
+def test_schema_writes_need_no_app_functions(project):
+    with raw_connection() as conn:
+        conn.execute(
+            "UPDATE projects SET name = ?, description = ? WHERE id = ?",
+            ("外部改名", "edited elsewhere", project.id),
+        )
+        names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master")]
+    assert not any(name.startswith("projects_fts_a") for name in names)
+
+
+def test_app_writes_keep_the_project_index_in_sync(db):
+    assert search_index.available
+    service = ProjectService(db)
+    project = service.create_project(ProjectCreate(name="龍與地下城", description="quest"))
+    assert project.id in search(db, "地下")
+    assert project.id in search(db, "ques")
+
+    service.update_project(project.id, ProjectUpdate(name="星際旅行"))
+    assert project.id not in search(db, "地下")
+    assert project.id in search(db, "星際")
+    assert project.id in search(db, "quest")
+
+
+def test_rebuild_indexes_rows_written_outside_the_app(db, project):
+    with raw_connection() as conn:
+        conn.execute("UPDATE projects SET name = ? WHERE id = ?", ("海底兩萬里", project.id))
+    assert project.id not in search(db, "海底")
+
+    search_index.rebuild(engine)
+    assert project.id in search(db, "海底")
+
+
+def content_hits(db, text: str):
+    db.expire_all()
+    return {(hit.kind, hit.version_id or hit.stage_id) for hit in SearchService(db).search(text)}
+
+
+def test_stage_and_version_writes_need_no_app_functions(db, project):
+    stage = db.query(Stage).filter(Stage.project_id == project.id).first()
+    version = StageVersion(stage_id=stage.id, version_number=1, content="初稿", source="manual")
+    db.add(version)
+    db.commit()
+    with raw_connection() as conn:
+        conn.execute("UPDATE stages SET content = ? WHERE id = ?", ("外部", stage.id))
+        conn.execute("UPDATE stage_versions SET content = ? WHERE id = ?", ("外部", version.id))
+        conn.execute("INSERT INTO stage_versions (stage_id, version_number, content, source, "
+                     "created_at) VALUES (?, 2, '外部', 'manual', CURRENT_TIMESTAMP)", (stage.id,))
+        conn.execute("DELETE FROM stage_versions WHERE id = ?", (version.id,))
+
+
+def test_app_writes_keep_the_content_indexes_in_sync(db, project):
+    stage = db.query(Stage).filter(Stage.project_id == project.id).first()
+    stage.content = "颱風夜的燈塔"
+    version = StageVersion(stage_id=stage.id, version_number=1, content="燈塔守護者", source="ai")
+    db.add(version)
+    db.commit()
+    assert content_hits(db, "燈塔") == {("stage", stage.id), ("version", version.id)}
+
+    stage.content = "晴朗的港口"
+    version.label = "renamed"  # Not indexed: the version stays as it was
+    db.commit()
+    assert content_hits(db, "燈塔") == {("version", version.id)}
+    assert content_hits(db, "港口") == {("stage", stage.id)}
+
+    db.delete(version)
+    db.commit()
+    assert content_hits(db, "燈塔") == set()